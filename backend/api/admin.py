@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import SavedStrategy, UserProfile, TeacherStats, StrategyInteraction
+from .models import SavedStrategy, UserProfile, TeacherStats, StrategyInteraction, IndexJob
 
 @admin.register(SavedStrategy)
 class SavedStrategyAdmin(admin.ModelAdmin):
@@ -16,3 +16,9 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 admin.site.register(TeacherStats)
 admin.site.register(StrategyInteraction)
+
+@admin.register(IndexJob)
+class IndexJobAdmin(admin.ModelAdmin):
+    list_display = ('source_name', 'status', 'pages_done', 'chunks_embedded', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('source_name', 'pdf_path')
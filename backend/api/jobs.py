@@ -0,0 +1,209 @@
+"""
+Shiksha Saathi - Background Jobs
+Thread-based runner for long admin tasks (PDF indexing), with state in the DB.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import IndexJob
+
+logger = logging.getLogger(__name__)
+
+
+class IndexJobRunner:
+    """
+    Runs IndexJob rows on a small local thread pool.
+
+    Jobs run one at a time by default (they all write the same collection).
+    Progress and the final result are written to the job row, so the status
+    endpoint works from any worker process; cancellation is requested through
+    the row as well and picked up between pages. While a job runs, a watcher
+    thread heartbeats its row, so a job busy in one long step is not mistaken
+    for an abandoned one. Jobs left queued or running by a worker that died
+    are marked failed when a runner starts and whenever job status is read.
+
+    Usage:
+        job = IndexJob.objects.create(pdf_path=path, source_name='NCF Document')
+        get_index_job_runner().submit(job)
+    """
+
+    # Poll the DB for cancel requests at most this often
+    CANCEL_POLL_SECONDS = 1.0
+    # Touch a running job's updated_at at least this often
+    HEARTBEAT_SECONDS = 30.0
+    # Sweep for abandoned jobs at most this often per process
+    SWEEP_INTERVAL_SECONDS = 30.0
+
+    def __init__(self, max_workers: int = 1, stale_seconds: float = 900.0):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='index-job')
+        self.stale_seconds = stale_seconds
+        self._swept_at = float('-inf')
+        self.sweep_stale_jobs()
+
+    def sweep_stale_jobs(self) -> int:
+        """
+        fail_stale_jobs() at most once per SWEEP_INTERVAL_SECONDS; never raises.
+
+        Called when the runner starts and from the job status endpoints, so
+        abandoned jobs are resolved after a restart even if nothing new is
+        submitted.
+        """
+        now = time.monotonic()
+        if now - self._swept_at < self.SWEEP_INTERVAL_SECONDS:
+            return 0
+        self._swept_at = now
+        try:
+            return self.fail_stale_jobs()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not check for stale index jobs: {type(e).__name__}: {e}")
+            return 0
+
+    def fail_stale_jobs(self) -> int:
+        """
+        Mark queued/running jobs abandoned by a dead worker as failed.
+
+        Jobs only live in the executor of the process that queued them, so a
+        restart or crash leaves their rows unfinished forever. A running job
+        heartbeats every HEARTBEAT_SECONDS; one silent for stale_seconds is
+        given up on. Queued jobs are only failed while nothing is running,
+        since a live worker's queue does not touch its rows.
+
+        Returns:
+            Number of jobs marked failed
+        """
+        cutoff = timezone.now() - timedelta(seconds=self.stale_seconds)
+        unfinished = IndexJob.objects.filter(status__in=('queued', 'running'))
+        stale = unfinished.filter(updated_at__lt=cutoff)
+        if unfinished.filter(status='running', updated_at__gte=cutoff).exists():
+            stale = stale.filter(status='running')
+
+        now = timezone.now()
+        count = stale.update(
+            status='failed',
+            error='Abandoned: the worker running this job stopped before it finished',
+            finished_at=now,
+            updated_at=now,
+        )
+        if count:
+            logger.warning(f"🧹 Marked {count} stale index job(s) as failed")
+        return count
+
+    def submit(self, job: IndexJob):
+        """Queue a job for execution"""
+        self._executor.submit(self._run, job.pk)
+        logger.info(f"📥 Queued index job {job.pk} ({job.source_name})")
+
+    def _run(self, job_id):
+        close_old_connections()
+        try:
+            job = IndexJob.objects.get(pk=job_id)
+            if job.status != 'queued':
+                # Resolved while it waited, e.g. failed by a stale-job sweep
+                logger.info(f"Skipping index job {job_id}: already {job.status}")
+                return
+            if job.cancel_requested:
+                self._finish(job_id, 'cancelled')
+                return
+
+            now = timezone.now()
+            IndexJob.objects.filter(pk=job_id).update(status='running', started_at=now, updated_at=now)
+            logger.info(f"⚙️ Running index job {job_id}: {job.pdf_path}")
+
+            from rag.manager import get_rag_manager
+            stop = threading.Event()
+            cancelled = threading.Event()
+            watcher = threading.Thread(
+                target=self._watch, args=(job_id, stop, cancelled),
+                name=f"index-job-watch-{job_id}", daemon=True,
+            )
+            watcher.start()
+            try:
+                result = get_rag_manager().index_pdf(
+                    job.pdf_path,
+                    source_name=job.source_name,
+                    force_reindex=job.force_reindex,
+                    staged=True,
+                    progress_callback=lambda progress: self._record_progress(job_id, progress),
+                    should_cancel=cancelled.is_set,
+                )
+            finally:
+                stop.set()
+                watcher.join()
+
+            if result.get('status') == 'cancelled':
+                self._finish(job_id, 'cancelled', result=result)
+            elif result.get('status') == 'error':
+                self._finish(job_id, 'failed', result=result, error=result.get('reason', 'indexing failed'))
+            else:
+                self._finish(job_id, 'succeeded', result=result)
+
+        except Exception as e:
+            logger.error(f"❌ Index job {job_id} failed: {type(e).__name__}: {e}")
+            self._finish(job_id, 'failed', error=f"{type(e).__name__}: {e}")
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _record_progress(job_id, progress):
+        elapsed = progress.get('elapsed_s') or 0
+        IndexJob.objects.filter(pk=job_id).update(
+            pages_done=progress.get('pages_processed', 0),
+            chunks_embedded=progress.get('chunks_indexed', 0),
+            chunks_per_second=progress.get('chunks_indexed', 0) / elapsed if elapsed else 0.0,
+            updated_at=timezone.now(),
+        )
+
+    def _watch(self, job_id, stop: threading.Event, cancelled: threading.Event):
+        """
+        Cancel-poll loop run beside a job: picks up cancel requests and heartbeats
+        the row, independently of how long a single page or batch takes.
+        """
+        beat_at = time.monotonic()
+        try:
+            while not stop.wait(self.CANCEL_POLL_SECONDS):
+                try:
+                    if not cancelled.is_set() and IndexJob.objects.filter(pk=job_id, cancel_requested=True).exists():
+                        cancelled.set()
+                    if time.monotonic() - beat_at >= self.HEARTBEAT_SECONDS:
+                        IndexJob.objects.filter(pk=job_id, status='running').update(updated_at=timezone.now())
+                        beat_at = time.monotonic()
+                except Exception as e:
+                    logger.warning(f"⚠️ Index job {job_id} watcher: {type(e).__name__}: {e}")
+        finally:
+            # This thread's own DB connection
+            connection.close()
+
+    @staticmethod
+    def _finish(job_id, status, result=None, error=''):
+        IndexJob.objects.filter(pk=job_id).update(
+            status=status,
+            result=result,
+            error=error,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        logger.info(f"🏁 Index job {job_id} {status}")
+
+
+# Singleton runner instance
+_runner_instance = None
+_runner_lock = threading.Lock()
+
+
+def get_index_job_runner() -> IndexJobRunner:
+    """Get singleton index job runner"""
+    global _runner_instance
+    if _runner_instance is None:
+        with _runner_lock:
+            if _runner_instance is None:
+                _runner_instance = IndexJobRunner(
+                    stale_seconds=getattr(settings, 'INDEX_JOB_STALE_SECONDS', 900),
+                )
+    return _runner_instance
@@ -0,0 +1,110 @@
+"""
+Benchmark indexing dedup: index a PDF with and without header/footer stripping
+and near-duplicate removal into throwaway directories, and compare index size,
+retrieval latency and how many top-k hits near-duplicate a higher-ranked hit.
+
+Usage:
+    python manage.py benchmark_dedup ../NCF-FS_2022EN.pdf --top-k 5 --repeat 20
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_retrieval import DEFAULT_QUERIES, _percentile
+from rag.dedup import NearDuplicateIndex, dedup_options
+from rag.embeddings import get_embedding_service
+from rag.manager import RAGManager
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+
+class Command(BaseCommand):
+    help = 'Compare index size and retrieval with and without indexing dedup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'pdf_path', nargs='?', default=None,
+            help='PDF to index (defaults to settings.NCF_PDF_PATH)',
+        )
+        parser.add_argument('--queries', default=None, help='Text file with one query per line')
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20, help='Passes over the query set')
+
+    def handle(self, *args, **options):
+        pdf_path = options['pdf_path'] or settings.NCF_PDF_PATH
+        if options['queries']:
+            with open(options['queries'], 'r', encoding='utf-8') as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = DEFAULT_QUERIES
+        if not queries:
+            raise CommandError("No queries to benchmark")
+
+        dedup = dedup_options() or {
+            'max_distance': 3, 'shingle_size': 3, 'boilerplate_min_pages': 3, 'boilerplate_min_fraction': 0.3,
+        }
+        top_k = options['top_k']
+        embedder = get_embedding_service()
+        query_embeddings = [[float(x) for x in vector] for vector in embedder.encode(queries)]
+
+        self.stdout.write(f"Benchmarking dedup on {pdf_path}: {len(queries)} queries x {options['repeat']} passes, top_k={top_k}")
+        self.stdout.write(
+            f"{'variant':>8} {'chunks':>7} {'chars':>9} {'disk_MB':>8} {'index_s':>8} "
+            f"{'p50_ms':>8} {'p99_ms':>8} {'dup@k':>6}"
+        )
+
+        results = {}
+        for label, variant in (('off', None), ('on', dedup)):
+            with tempfile.TemporaryDirectory(prefix='dedup-bench-') as persist_directory:
+                manager = RAGManager(persist_directory=persist_directory, collection_name=f"benchmark_dedup_{label}")
+                manager.dedup = variant
+
+                start = time.perf_counter()
+                indexed = manager.index_pdf(pdf_path, source_name='benchmark', force_reindex=True)
+                index_s = time.perf_counter() - start
+                if indexed.get('status') != 'success':
+                    raise CommandError(f"Indexing failed: {indexed}")
+
+                documents = manager.store.get()['documents']
+                latencies = []
+                redundant = []
+                for _ in range(options['repeat']):
+                    for embedding in query_embeddings:
+                        start = time.perf_counter()
+                        hits = manager.store.query(embedding, top_k)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        # Share of the top-k that repeats a better-ranked hit
+                        seen = NearDuplicateIndex(dedup['max_distance'], dedup['shingle_size'])
+                        repeats = sum(1 for hit in hits if seen.add(hit['id'], hit['text']) is not None)
+                        redundant.append(repeats / max(1, len(hits)))
+
+                results[label] = {
+                    'chunks': len(documents),
+                    'chars': sum(len(text) for text in documents),
+                    'bytes': _directory_bytes(persist_directory),
+                    'p50': _percentile(latencies, 50),
+                }
+                self.stdout.write(
+                    f"{label:>8} {len(documents):>7} {results[label]['chars']:>9} "
+                    f"{results[label]['bytes'] / 1024 / 1024:>8.2f} {index_s:>8.2f} "
+                    f"{_percentile(latencies, 50):>8.3f} {_percentile(latencies, 99):>8.3f} {np.mean(redundant):>6.3f}"
+                )
+                if variant:
+                    self.stdout.write(
+                        f"         {indexed['boilerplate_lines_removed']} header/footer lines stripped, "
+                        f"{indexed['near_duplicates']} near-duplicate chunks dropped"
+                    )
+                manager.store.drop()
+
+        off, on = results['off'], results['on']
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Dedup: {1 - on['chunks'] / max(1, off['chunks']):.1%} fewer chunks, "
+            f"{1 - on['bytes'] / max(1, off['bytes']):.1%} smaller on disk, "
+            f"p50 query latency {on['p50'] - off['p50']:+.3f}ms."
+        ))
@@ -0,0 +1,76 @@
+"""
+Benchmark streaming PDF indexing: wall time, throughput and peak Python memory
+per batch size, against a throwaway vector store directory.
+
+Usage:
+    python manage.py benchmark_indexing ../NCF-FS_2022EN.pdf --batch-sizes 32,64,256,all
+"""
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rag.embeddings import get_embedding_service
+from rag.manager import RAGManager
+
+
+class Command(BaseCommand):
+    help = 'Benchmark RAGManager.index_pdf memory and throughput for several batch sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'pdf_path', nargs='?', default=None,
+            help='PDF to index (defaults to settings.NCF_PDF_PATH)',
+        )
+        parser.add_argument(
+            '--batch-sizes', default='32,64,256,all',
+            help="Comma-separated batch sizes; 'all' embeds the whole document in one batch (old behaviour)",
+        )
+
+    def handle(self, *args, **options):
+        pdf_path = options['pdf_path'] or settings.NCF_PDF_PATH
+        try:
+            batch_sizes = [
+                sys.maxsize if value.strip() == 'all' else int(value)
+                for value in options['batch_sizes'].split(',')
+            ]
+        except ValueError:
+            raise CommandError("--batch-sizes must be integers or 'all'")
+
+        # Load the model before measuring so it does not count towards the first run
+        get_embedding_service()
+
+        self.stdout.write(f"Benchmarking indexing of {pdf_path}")
+        self.stdout.write(f"{'batch':>8} {'pages':>6} {'chunks':>7} {'time_s':>8} {'chunks/s':>9} {'peak_MB':>8}")
+
+        with tempfile.TemporaryDirectory(prefix='index-bench-') as persist_directory:
+            for batch_size in batch_sizes:
+                label = 'all' if batch_size == sys.maxsize else str(batch_size)
+                manager = RAGManager(
+                    persist_directory=persist_directory,
+                    collection_name=f"benchmark_index_{label}",
+                )
+
+                tracemalloc.start()
+                start = time.perf_counter()
+                result = manager.index_pdf(pdf_path, source_name='benchmark', force_reindex=True, batch_size=batch_size)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                if result.get('status') != 'success':
+                    raise CommandError(f"Indexing failed: {result}")
+
+                manager.store.drop()
+                self.stdout.write(
+                    f"{label:>8} {result['pages']:>6} {result['chunks_count']:>7} {elapsed:>8.2f} "
+                    f"{result['chunks_count'] / elapsed:>9.1f} {peak / 1024 / 1024:>8.1f}"
+                )
+
+        # ru_maxrss is KB on Linux; covers the whole process including the model
+        max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(f"Done. Process peak RSS: {max_rss_mb:.0f} MB"))
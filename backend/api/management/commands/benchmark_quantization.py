@@ -0,0 +1,92 @@
+"""
+Benchmark quantized NumPy index storage: scanned/stored memory, search latency
+and recall@k against exact float32 search, for several rerank depths.
+
+Usage:
+    python manage.py benchmark_quantization --top-k 5 --rerank 10,50,200
+"""
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_retrieval import DEFAULT_QUERIES, _percentile
+from rag.manager import get_rag_manager
+from rag.numpy_index import NumpyVectorIndex
+
+
+class Command(BaseCommand):
+    help = 'Compare float32, float16 and int8 (with exact rerank) NumPy index storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--rerank', default='10,50,200', help='int8 rerank candidate counts to test')
+        parser.add_argument('--sample', type=int, default=200, help='Stored chunks reused as extra queries')
+        parser.add_argument('--repeat', type=int, default=5, help='Passes over the query set')
+
+    def handle(self, *args, **options):
+        try:
+            rerank_depths = [int(value) for value in options['rerank'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError("--rerank must be a comma-separated list of integers")
+
+        manager = get_rag_manager()
+        store = manager.store
+        total = store.count()
+        if total == 0:
+            raise CommandError("Collection is empty - index the NCF PDF first")
+
+        top_k = options['top_k']
+
+        with tempfile.TemporaryDirectory(prefix='quantization-bench-') as persist_directory:
+            exact = NumpyVectorIndex(persist_directory, 'float32', dtype='float32')
+            exact.build_from_store(store, embedding_model=manager.embedder.model_name)
+
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(exact.count, size=min(options['sample'], exact.count), replace=False))
+            queries = np.vstack([manager.embedder.encode(DEFAULT_QUERIES), exact.embeddings[sample]])
+
+            self.stdout.write(f"{total} chunks, {len(queries)} queries x {options['repeat']} passes, top_k={top_k}")
+            self.stdout.write(
+                f"{'storage':>14} {'scan_MB':>8} {'disk_MB':>8} {'mean_ms':>8} {'p50_ms':>8} {'p99_ms':>8} {'recall@k':>9}"
+            )
+            truth = [{hit['id'] for hit in exact.query(query, top_k)} for query in queries]
+
+            variants = [('float32', exact), ('float16', None)]
+            variants += [(f"int8/r{depth}", depth) for depth in rerank_depths]
+
+            int8_index = None
+            for label, variant in variants:
+                if label == 'float16':
+                    index = NumpyVectorIndex(persist_directory, 'float16', dtype='float16')
+                    index.build_from_store(store, embedding_model=manager.embedder.model_name)
+                elif label.startswith('int8'):
+                    if int8_index is None:
+                        int8_index = NumpyVectorIndex(persist_directory, 'int8', dtype='int8')
+                        int8_index.build_from_store(store, embedding_model=manager.embedder.model_name)
+                    index = int8_index
+                    index.rerank_candidates = variant
+                else:
+                    index = variant
+
+                latencies = []
+                recalls = []
+                for _ in range(options['repeat']):
+                    for query, expected in zip(queries, truth):
+                        start = time.perf_counter()
+                        hits = index.query(query, top_k)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        recalls.append(len(expected & {hit['id'] for hit in hits}) / max(1, len(expected)))
+
+                stats = index.get_stats()
+                self.stdout.write(
+                    f"{label:>14} {stats['scan_bytes'] / 1024 / 1024:>8.2f} {stats['file_bytes'] / 1024 / 1024:>8.2f} "
+                    f"{np.mean(latencies):>8.3f} {_percentile(latencies, 50):>8.3f} "
+                    f"{_percentile(latencies, 99):>8.3f} {np.mean(recalls):>9.3f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            "Done. scan_MB is read by every query (and resident in every worker's page cache); "
+            "int8 reads the float32 file only for its rerank candidates."
+        ))
@@ -0,0 +1,132 @@
+"""
+Benchmark the cross-encoder rerank stage: added latency per query, how often
+it fits its budget, and how much it changes (or, with labels, improves) the
+top-k against plain vector order.
+
+Usage:
+    python manage.py benchmark_rerank --candidates 30 --top-k 3
+    python manage.py benchmark_rerank --labels labels.jsonl --budget-ms 500
+
+A labels file has one JSON object per line: {"query": "...", "pages": [12, 13]};
+a hit counts as relevant when its page is listed.
+"""
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_retrieval import DEFAULT_QUERIES, _percentile
+from rag.manager import get_rag_manager
+from rag.reranker import get_reranker
+
+
+def _page(hit):
+    return hit['metadata'].get('page', hit['metadata'].get('page_number'))
+
+
+def _reciprocal_rank(hits, pages):
+    for rank, hit in enumerate(hits, start=1):
+        if _page(hit) in pages:
+            return 1.0 / rank
+    return 0.0
+
+
+class Command(BaseCommand):
+    help = 'Measure cross-encoder rerank latency and its effect on the top-k'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', default=None, help='Text file with one query per line')
+        parser.add_argument('--labels', default=None, help='JSONL file of {"query", "pages"} for hit@k / MRR')
+        parser.add_argument('--model', default=None, help='Cross-encoder (defaults to RAG_RERANK_MODEL)')
+        parser.add_argument('--candidates', type=int, default=30, help='Vector hits handed to the reranker')
+        parser.add_argument('--top-k', type=int, default=3)
+        parser.add_argument('--budget-ms', type=float, default=None, help='Rerank budget (defaults to RAG_RERANK_BUDGET_MS)')
+        parser.add_argument('--repeat', type=int, default=5, help='Passes over the query set')
+
+    def handle(self, *args, **options):
+        labels = {}
+        if options['labels']:
+            with open(options['labels'], 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        labels[item['query']] = set(item['pages'])
+            queries = list(labels)
+        elif options['queries']:
+            with open(options['queries'], 'r', encoding='utf-8') as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = DEFAULT_QUERIES
+        if not queries:
+            raise CommandError("No queries to benchmark")
+
+        manager = get_rag_manager()
+        if manager.store.count() == 0:
+            raise CommandError("Collection is empty - index the NCF PDF first")
+        reranker = get_reranker(options['model'])
+        top_k = options['top_k']
+        budget_ms = options['budget_ms'] or reranker.budget_ms
+
+        # Warm-up: the first predict call pays one-off model setup
+        reranker.score(queries[0], ["warm-up"])
+
+        embeddings = manager.embedder.encode(queries)
+        candidates = {
+            query: manager.store.query(embedding, options['candidates'])
+            for query, embedding in zip(queries, embeddings)
+        }
+
+        unbounded_ms, bounded_ms = [], []
+        fallbacks = 0
+        overlaps, promoted = [], []
+        vector_mrr, rerank_mrr, vector_hit, rerank_hit = [], [], [], []
+        for _ in range(options['repeat']):
+            for query in queries:
+                hits = candidates[query]
+                vector_top = hits[:top_k]
+
+                start = time.perf_counter()
+                scores = reranker.score(query, [hit['text'] for hit in hits])
+                unbounded_ms.append((time.perf_counter() - start) * 1000)
+                order = np.argsort(-scores, kind='stable')[:top_k]
+
+                start = time.perf_counter()
+                bounded = reranker.rerank(query, hits, top_k, budget_ms=budget_ms)
+                bounded_ms.append((time.perf_counter() - start) * 1000)
+                fallbacks += not any('rerank_score' in hit for hit in bounded)
+
+                vector_ids = {hit['id'] for hit in vector_top}
+                overlaps.append(len(vector_ids & {hits[i]['id'] for i in order}) / max(1, len(vector_top)))
+                promoted.append(sum(1 for i in order if i >= top_k))
+
+                if query in labels:
+                    reranked_top = [hits[i] for i in order]
+                    vector_mrr.append(_reciprocal_rank(vector_top, labels[query]))
+                    rerank_mrr.append(_reciprocal_rank(reranked_top, labels[query]))
+                    vector_hit.append(float(vector_mrr[-1] > 0))
+                    rerank_hit.append(float(rerank_mrr[-1] > 0))
+
+        runs = len(unbounded_ms)
+        self.stdout.write(
+            f"{len(queries)} queries x {options['repeat']} passes, {options['candidates']} candidates -> top {top_k}, "
+            f"model {reranker.model_name}"
+        )
+        self.stdout.write(
+            f"score (unbounded): mean {np.mean(unbounded_ms):.1f}ms  p50 {_percentile(unbounded_ms, 50):.1f}ms  "
+            f"p99 {_percentile(unbounded_ms, 99):.1f}ms"
+        )
+        self.stdout.write(
+            f"rerank ({budget_ms:.0f}ms budget): p50 {_percentile(bounded_ms, 50):.1f}ms  "
+            f"p99 {_percentile(bounded_ms, 99):.1f}ms  fell back to vector order {fallbacks}/{runs}"
+        )
+        self.stdout.write(
+            f"top-{top_k} overlap with vector order {np.mean(overlaps):.3f}, "
+            f"{np.mean(promoted):.2f} hits/query promoted from beyond rank {top_k}"
+        )
+        if vector_mrr:
+            self.stdout.write(
+                f"labelled: hit@{top_k} {np.mean(vector_hit):.3f} -> {np.mean(rerank_hit):.3f}  "
+                f"MRR@{top_k} {np.mean(vector_mrr):.3f} -> {np.mean(rerank_mrr):.3f}"
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,133 @@
+"""
+Benchmark retrieval: the vector store query used by RAGManager.search against the
+in-process NumPy index, on the same collection and the same query embeddings.
+
+Usage:
+    python manage.py benchmark_retrieval --top-k 3 --repeat 50
+    python manage.py benchmark_retrieval --queries queries.txt --dtypes float32,int8
+"""
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rag.manager import get_rag_manager
+from rag.numpy_index import NumpyVectorIndex
+
+DEFAULT_QUERIES = [
+    "Students are not paying attention during the lesson",
+    "How to teach fractions to class 4 students",
+    "Children cannot read simple words in Hindi",
+    "Play-based learning activities for the foundational stage",
+    "Managing a multigrade classroom with limited materials",
+    "Assessment without exams for young children",
+    "Students struggle with place value and carrying in addition",
+    "Using local language in the classroom",
+]
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc), in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0.0
+    return resident_pages * resource.getpagesize() / 1024 / 1024
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Compare vector store and NumPy index retrieval latency, memory and top-k agreement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', default=None, help='Text file with one query per line')
+        parser.add_argument('--top-k', type=int, default=3, help='Results per query (RAGManager.search default: 3)')
+        parser.add_argument('--repeat', type=int, default=20, help='Passes over the query set')
+        parser.add_argument('--dtypes', default='float32,float16,int8', help='NumPy index storage dtypes to test')
+
+    def handle(self, *args, **options):
+        if options['queries']:
+            with open(options['queries'], 'r', encoding='utf-8') as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = DEFAULT_QUERIES
+
+        manager = get_rag_manager()
+        store = manager.store
+        if store.count() == 0:
+            raise CommandError("Collection is empty - index the NCF PDF first")
+
+        top_k = options['top_k']
+        repeat = options['repeat']
+        # Encode once so both backends time only the search itself
+        query_embeddings = [[float(x) for x in vector] for vector in manager.embedder.encode(queries)]
+
+        self.stdout.write(
+            f"{store.count()} chunks, {len(queries)} queries x {repeat} passes, top_k={top_k}"
+        )
+        self.stdout.write(
+            f"{'backend':>14} {'mean_ms':>8} {'p50_ms':>8} {'p99_ms':>8} {'qps':>8} "
+            f"{'rss_+MB':>8} {'heap_MB':>8} {'file_MB':>8} {'agree':>6}"
+        )
+
+        # Vector store (ChromaDB or FAISS, per VECTOR_STORE_BACKEND)
+        rss_before = _rss_mb()
+        reference = {}
+        latencies = []
+        tracemalloc.start()
+        for _ in range(repeat):
+            for i, embedding in enumerate(query_embeddings):
+                start = time.perf_counter()
+                hits = store.query(embedding, top_k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                reference[i] = [hit['id'] for hit in hits]
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self._report(store.backend, latencies, _rss_mb() - rss_before, heap_peak, 0, 1.0)
+
+        # NumPy index, built from the same collection into a throwaway directory
+        with tempfile.TemporaryDirectory(prefix='retrieval-bench-') as persist_directory:
+            for dtype in [value.strip() for value in options['dtypes'].split(',') if value.strip()]:
+                index = NumpyVectorIndex(persist_directory, f"{manager.collection_name}_{dtype}", dtype=dtype)
+                info = index.build_from_store(store, embedding_model=manager.embedder.model_name)
+
+                rss_before = _rss_mb()
+                latencies = []
+                overlap = []
+                tracemalloc.start()
+                for _ in range(repeat):
+                    for i, embedding in enumerate(query_embeddings):
+                        start = time.perf_counter()
+                        hits = index.query(embedding, top_k)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        expected = set(reference[i])
+                        overlap.append(len(expected & {hit['id'] for hit in hits}) / max(1, len(expected)))
+                _, heap_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                file_bytes = index.get_stats()['file_bytes']
+                self._report(
+                    f"numpy-{info['dtype']}", latencies, _rss_mb() - rss_before, heap_peak,
+                    file_bytes, statistics.mean(overlap),
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            "Done. 'agree' is the share of the vector store's top-k also returned by the NumPy index "
+            "(HNSW/IVF stores are approximate, NumPy search is exact)."
+        ))
+
+    def _report(self, name, latencies, rss_delta_mb, heap_peak, file_bytes, agreement):
+        mean_ms = statistics.mean(latencies)
+        self.stdout.write(
+            f"{name:>14} {mean_ms:>8.3f} {_percentile(latencies, 50):>8.3f} {_percentile(latencies, 99):>8.3f} "
+            f"{1000 / mean_ms if mean_ms else 0:>8.0f} {rss_delta_mb:>8.1f} {heap_peak / 1024 / 1024:>8.2f} "
+            f"{file_bytes / 1024 / 1024:>8.2f} {agreement:>6.2f}"
+        )
@@ -0,0 +1,110 @@
+"""
+Benchmark vector store backends on the indexed corpus: build time, recall@k
+against exact search, and p50/p99 query latency.
+
+Usage:
+    python manage.py benchmark_vector_stores --top-k 5
+    python manage.py benchmark_vector_stores --backends faiss-flat,faiss-hnsw --sample 500
+"""
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_retrieval import DEFAULT_QUERIES, _percentile
+from rag.manager import get_rag_manager
+from rag.vector_store import open_vector_store
+
+# Backend label -> (backend, FAISS index type)
+BACKENDS = {
+    'chroma': ('chroma', None),
+    'faiss-flat': ('faiss', 'flat'),
+    'faiss-ivf': ('faiss', 'ivf'),
+    'faiss-hnsw': ('faiss', 'hnsw'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Report recall@k and p50/p99 latency of each vector store backend on the indexed corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default=','.join(BACKENDS), help=f"Any of: {', '.join(BACKENDS)}")
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--sample', type=int, default=200, help='Stored chunks reused as extra queries')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        labels = [label.strip() for label in options['backends'].split(',') if label.strip()]
+        unknown = [label for label in labels if label not in BACKENDS]
+        if unknown:
+            raise CommandError(f"Unknown backends: {', '.join(unknown)}")
+
+        manager = get_rag_manager()
+        total = manager.store.count()
+        if total == 0:
+            raise CommandError("Collection is empty - index the NCF PDF first")
+
+        # Copy the corpus out of the live store once
+        ids, documents, metadatas, vectors = [], [], [], []
+        for offset in range(0, total, options['batch_size']):
+            page = manager.store.get(limit=options['batch_size'], offset=offset, include_embeddings=True)
+            ids.extend(page['ids'])
+            documents.extend(page['documents'])
+            metadatas.extend(page['metadatas'])
+            vectors.append(np.asarray(page['embeddings'], dtype=np.float32))
+        corpus = np.vstack(vectors)
+        corpus /= np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(corpus), size=min(options['sample'], len(corpus)), replace=False)
+        queries = np.vstack([manager.embedder.encode(DEFAULT_QUERIES), corpus[sample]])
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        # Ground truth: exact top-k by cosine similarity
+        top_k = min(options['top_k'], len(corpus))
+        truth = [set(ids[i] for i in np.argsort(-(corpus @ query))[:top_k]) for query in queries]
+
+        self.stdout.write(f"{len(corpus)} chunks, {len(queries)} queries, top_k={top_k}")
+        self.stdout.write(f"{'backend':>11} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p99_ms':>8} {'mean_ms':>8}")
+
+        with tempfile.TemporaryDirectory(prefix='vector-store-bench-') as persist_directory:
+            for label in labels:
+                backend, index_type = BACKENDS[label]
+                backend_options = {'index_type': index_type} if index_type else {}
+                try:
+                    store = open_vector_store(
+                        f"benchmark_{label.replace('-', '_')}",
+                        persist_directory,
+                        manager.embedder,
+                        backend=backend,
+                        recreate=True,
+                        **backend_options,
+                    )
+                except ImportError as e:
+                    self.stdout.write(self.style.WARNING(f"{label:>11} skipped: {e}"))
+                    continue
+
+                start = time.perf_counter()
+                for i in range(0, len(corpus), options['batch_size']):
+                    end = i + options['batch_size']
+                    store.add(ids[i:end], corpus[i:end], documents[i:end], metadatas[i:end])
+                # The first query builds lazily-constructed indexes; count it as build time
+                store.query(queries[0], top_k)
+                build_s = time.perf_counter() - start
+
+                latencies = []
+                recalls = []
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    hits = store.query(query, top_k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    recalls.append(len(expected & {hit['id'] for hit in hits}) / top_k)
+
+                self.stdout.write(
+                    f"{label:>11} {build_s:>8.2f} {np.mean(recalls):>9.3f} {_percentile(latencies, 50):>8.3f} "
+                    f"{_percentile(latencies, 99):>8.3f} {np.mean(latencies):>8.3f}"
+                )
+                store.drop()
+
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,108 @@
+"""
+Index a corpus of PDFs (NCF-FS, NCERT guides, DIET material, ...) into the vector store.
+
+Usage:
+    python manage.py index_corpus /data/pdfs --workers 4
+    python manage.py index_corpus corpus.json --restart
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rag.cache import SemanticAnswerCache
+from rag.corpus import CorpusIndexer, discover_corpus
+from rag.numpy_index import NumpyVectorIndex
+from rag.partitions import LanguagePartitions
+
+
+class Command(BaseCommand):
+    help = 'Index a directory or JSON manifest of PDFs in parallel, resuming from the last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory of PDFs, or JSON manifest [{"path": ..., "source": ...}]')
+        parser.add_argument('--collection', default='ncf_documents', help='Target collection')
+        parser.add_argument('--workers', type=int, default=None, help='Extraction processes (default: CPUs - 1)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Chunks per embedding batch')
+        parser.add_argument('--checkpoint', default=None, help='Checkpoint file (default: <persist_dir>/checkpoints/<collection>.json)')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and process every PDF again')
+
+    def handle(self, *args, **options):
+        try:
+            entries = discover_corpus(options['path'])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read corpus {options['path']}: {e}")
+
+        if not entries:
+            raise CommandError(f"No PDFs found in {options['path']}")
+
+        indexer = CorpusIndexer(
+            collection_name=options['collection'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            checkpoint_path=options['checkpoint'],
+        )
+        if options['restart']:
+            indexer.reset_checkpoint()
+
+        self.stdout.write(f"Indexing {len(entries)} PDFs into '{options['collection']}' with {indexer.workers} workers")
+
+        def report(progress):
+            done = progress['indexed'] + progress['skipped'] + progress['failed']
+            self.stdout.write(
+                f"  [{done}/{progress['total']}] +{progress['chunks_added']} chunks, "
+                f"{progress['failed']} failed, {progress['elapsed_s']}s"
+            )
+
+        summary = indexer.run(entries, resume=not options['restart'], progress_callback=report)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {summary['indexed']} indexed, {summary['skipped']} unchanged, "
+            f"{len(summary['failed'])} failed; +{summary['chunks_added']}/-{summary['chunks_deleted']} chunks "
+            f"in {summary['elapsed_s']}s"
+        ))
+        if summary['chunks_retagged']:
+            self.stdout.write(f"Retagged {summary['chunks_retagged']} chunks indexed by an older classifier")
+        if indexer.dedup:
+            self.stdout.write(
+                f"Dedup: {summary['near_duplicates']} near-duplicate chunks dropped, "
+                f"{summary['boilerplate_lines_removed']} header/footer lines stripped"
+            )
+        for failure in summary['failed']:
+            self.stdout.write(self.style.ERROR(f"  {failure['path']}: {failure['error']}"))
+
+        # Cached SOS answers were built from the old context; running servers share this cache file
+        answer_cache = SemanticAnswerCache(getattr(
+            settings, 'RAG_CACHE_PATH', str(Path(indexer.persist_directory).parent / 'cache' / 'rag_cache.sqlite3'),
+        ))
+        self.stdout.write(f"Invalidated {answer_cache.clear()} cached SOS answers")
+
+        changed = summary['chunks_added'] or summary['chunks_deleted'] or summary['chunks_retagged']
+        numpy_options = None
+        if getattr(settings, 'RAG_RETRIEVAL_BACKEND', 'chroma') == 'numpy':
+            numpy_options = {
+                'dtype': getattr(settings, 'RAG_NUMPY_INDEX_DTYPE', 'float32'),
+                'rerank_candidates': getattr(settings, 'RAG_NUMPY_RERANK_CANDIDATES', 50),
+            }
+        if numpy_options and changed:
+            # Running servers pick up the new export on their next staleness check
+            index = NumpyVectorIndex(indexer.persist_directory, options['collection'], **numpy_options)
+            info = index.build_from_store(indexer.store, embedding_model=indexer.embedder.model_name)
+            self.stdout.write(f"Rebuilt NumPy index: {info['count']} x {info['dimension']} {info['dtype']}")
+
+        languages = getattr(settings, 'RAG_LANGUAGE_PARTITIONS', [])
+        if languages and changed:
+            partitions = LanguagePartitions(
+                indexer.persist_directory,
+                options['collection'],
+                languages,
+                indexer.embedder,
+                models=getattr(settings, 'RAG_PARTITION_EMBEDDING_MODELS', {}),
+                numpy_index=numpy_options,
+            )
+            synced = partitions.sync(indexer.store)
+            self.stdout.write("Synced language partitions: " + ", ".join(
+                f"{language} {synced[language]['chunks']} "
+                f"(+{synced[language]['added']}/~{synced[language]['updated']}/-{synced[language]['deleted']})"
+                for language in languages
+            ))
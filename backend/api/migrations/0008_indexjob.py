@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:19
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_alter_savedstrategy_resource_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IndexJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("pdf_path", models.CharField(max_length=1024)),
+                ("source_name", models.CharField(max_length=255)),
+                ("force_reindex", models.BooleanField(default=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("running", "Running"),
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                    ),
+                ),
+                ("cancel_requested", models.BooleanField(default=False)),
+                ("pages_done", models.PositiveIntegerField(default=0)),
+                ("chunks_embedded", models.PositiveIntegerField(default=0)),
+                ("chunks_per_second", models.FloatField(default=0.0)),
+                (
+                    "result",
+                    models.JSONField(
+                        blank=True,
+                        help_text="index_pdf statistics once finished",
+                        null=True,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "index_jobs",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
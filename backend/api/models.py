@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -209,3 +211,71 @@ class StrategyInteraction(models.Model):
         db_table = 'strategy_interactions'
         unique_together = ('user', 'strategy')
 
+
+
+class IndexJob(models.Model):
+    """
+    Background PDF indexing job started from the admin index endpoint.
+    Progress is written here by the job runner so any worker can report it.
+    """
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    pdf_path = models.CharField(max_length=1024)
+    source_name = models.CharField(max_length=255)
+    force_reindex = models.BooleanField(default=False)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    cancel_requested = models.BooleanField(default=False)
+    
+    # Progress
+    pages_done = models.PositiveIntegerField(default=0)
+    chunks_embedded = models.PositiveIntegerField(default=0)
+    chunks_per_second = models.FloatField(default=0.0)
+    
+    result = models.JSONField(blank=True, null=True, help_text="index_pdf statistics once finished")
+    error = models.TextField(blank=True, default='')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'index_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Index {self.source_name} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+    
+    def to_dict(self):
+        """Convert job to dictionary for API responses"""
+        return {
+            'job_id': str(self.id),
+            'pdf_path': self.pdf_path,
+            'source_name': self.source_name,
+            'force_reindex': self.force_reindex,
+            'status': self.status,
+            'cancel_requested': self.cancel_requested,
+            'progress': {
+                'pages_done': self.pages_done,
+                'chunks_embedded': self.chunks_embedded,
+                'chunks_per_second': round(self.chunks_per_second, 1),
+            },
+            'result': self.result,
+            'error': self.error or None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -73,6 +73,9 @@ class SOSResponseSerializer(serializers.Serializer):
     ncf_used = serializers.BooleanField(default=False)
     confidence_score = serializers.FloatField(default=0.0)
     offline_available = serializers.BooleanField(default=False)
+    timings = serializers.DictField(required=False)
+    cache = serializers.DictField(required=False)
+    degraded = serializers.ListField(child=serializers.CharField(), required=False)
 
 
 class FeedbackRequestSerializer(serializers.Serializer):
@@ -98,6 +101,8 @@ class HealthCheckSerializer(serializers.Serializer):
     rag_indexed = serializers.BooleanField()
     documents_count = serializers.IntegerField()
     gemini_configured = serializers.BooleanField()
+    gemini_rate_limiter = serializers.DictField(required=False)
+    gemini_circuit_breaker = serializers.DictField(required=False)
 
 class SavedStrategySerializer(serializers.ModelSerializer):
     """Serializer for saved strategies linked to model"""
@@ -1,3 +1,559 @@
-from django.test import TestCase
+"""
+Shiksha Saathi - Tests
+Unit tests for the RAG helpers (run with: python manage.py test api).
+"""
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from api.jobs import IndexJobRunner
+from api.models import IndexJob
+from rag.cache import SemanticAnswerCache
+from rag.concurrency import SingleFlight, run_branches
+from rag.embeddings import EmbeddingBatcher
+from rag.sparse_index import BM25Index
+from rag.streaming import StrategyStreamParser
+from rag.vector_store import FaissVectorStore
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+def wait_until(predicate, timeout: float = 2.0):
+    """Poll until predicate() is true (fails the test after timeout seconds)"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.005)
+
+
+def start_thread(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Leader/follower coalescing in rag.concurrency.SingleFlight"""
+
+    def setUp(self):
+        self.flight = SingleFlight('test')
+        self.release = threading.Event()
+        self.calls = 0
+
+    def blocking(self, value):
+        """fn that counts its calls and returns 'value' once released"""
+        def fn():
+            self.calls += 1
+            self.release.wait(5)
+            return value
+        return fn
+
+    def start_leader(self, fn, results, key='k'):
+        thread = start_thread(lambda: results.append(self.flight.do(key, fn)))
+        wait_until(lambda: self.flight.get_stats()['in_flight'] == 1)
+        return thread
+
+    def start_followers(self, count, fn, results, key='k', **kwargs):
+        threads = [start_thread(lambda: results.append(self.flight.do(key, fn, **kwargs))) for _ in range(count)]
+        wait_until(lambda: self.flight.get_stats()['coalesced'] == count)
+        return threads
+
+    def test_followers_share_leader_result(self):
+        leader_results, follower_results = [], []
+        value = {'strategies': [{'title': 'Roti fractions'}]}
+        leader = self.start_leader(self.blocking(value), leader_results)
+        followers = self.start_followers(3, self.blocking({'other': True}), follower_results)
+
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(leader_results, [(value, False)])
+        self.assertEqual(len(follower_results), 3)
+        for result, shared in follower_results:
+            self.assertTrue(shared)
+            self.assertEqual(result, value)
+
+        # Every caller owns its copy: mutating one result does not leak into another
+        leader_results[0][0]['strategies'].clear()
+        follower_results[0][0]['strategies'].append({'title': 'extra'})
+        self.assertEqual(follower_results[1][0], {'strategies': [{'title': 'Roti fractions'}]})
+        self.assertIsNot(follower_results[1][0], follower_results[2][0])
+
+        stats = self.flight.get_stats()
+        self.assertEqual((stats['in_flight'], stats['leaders'], stats['coalesced']), (0, 1, 3))
+
+    def test_leader_exception_reaches_followers(self):
+        errors = []
+
+        def failing():
+            self.release.wait(5)
+            raise ValueError("Gemini exploded")
+
+        def call():
+            try:
+                self.flight.do('k', failing)
+            except ValueError as e:
+                errors.append(str(e))
+
+        leader = start_thread(call)
+        wait_until(lambda: self.flight.get_stats()['in_flight'] == 1)
+        followers = [start_thread(call) for _ in range(2)]
+        wait_until(lambda: self.flight.get_stats()['coalesced'] == 2)
+
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(errors, ["Gemini exploded"] * 3)
+        # The failed call is not remembered: the next caller leads a fresh computation
+        self.assertEqual(self.flight.do('k', lambda: 'fresh'), ('fresh', False))
+
+    def test_follower_timeout_uses_on_timeout(self):
+        leader_results = []
+        leader = self.start_leader(self.blocking('slow'), leader_results)
+
+        start = time.perf_counter()
+        result = self.flight.do('k', self.blocking('never'), wait_timeout=0.1, on_timeout=lambda: 'degraded')
+        waited = time.perf_counter() - start
+
+        self.assertEqual(result, ('degraded', False))
+        self.assertLess(waited, 1.0)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.get_stats()['follower_timeouts'], 1)
+
+        self.release.set()
+        leader.join(5)
+        self.assertEqual(leader_results, [('slow', False)])
+
+    def test_follower_timeout_without_on_timeout_computes_alone(self):
+        leader_results = []
+        leader = self.start_leader(self.blocking('slow'), leader_results)
+
+        result = self.flight.do('k', lambda: 'own', wait_timeout=0.05)
+
+        self.assertEqual(result, ('own', False))
+        self.release.set()
+        leader.join(5)
+
+    def test_different_keys_do_not_coalesce(self):
+        results = []
+        leader = self.start_leader(self.blocking('a'), results, key='a')
+
+        self.assertEqual(self.flight.do('b', lambda: 'b'), ('b', False))
+        self.assertEqual(self.flight.get_stats()['coalesced'], 0)
+        self.release.set()
+        leader.join(5)
+
+
+class RunBranchesTests(SimpleTestCase):
+    """Per-branch budgets and timeout reporting in rag.concurrency.run_branches"""
+
+    def test_timeouts_report_queued_versus_running(self):
+        release = threading.Event()
+        started = []
+
+        def slow(name):
+            def fn():
+                started.append(name)
+                release.wait(5)
+                return name
+            return fn
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            results = run_branches({
+                'running': (slow('running'), 0.1),
+                'queued': (slow('queued'), 0.1),
+            }, executor=executor)
+        finally:
+            release.set()
+            executor.shutdown(wait=True)
+
+        self.assertEqual(results['running']['status'], 'timeout')
+        self.assertEqual(results['queued']['status'], 'queued_timeout')
+        self.assertIn('still queued', results['queued']['error'])
+        # The queued branch was cancelled instead of running after its budget
+        self.assertEqual(started, ['running'])
+
+    def test_branches_get_separate_pools(self):
+        release = threading.Event()
+        results = run_branches({
+            'test_llm': (lambda: release.wait(5), 0.1),
+            'test_video': (lambda: 'videos', 1.0),
+        }, max_workers=1)
+        release.set()
+
+        self.assertEqual(results['test_llm']['status'], 'timeout')
+        self.assertEqual(results['test_video']['status'], 'ok')
+        self.assertEqual(results['test_video']['value'], 'videos')
+
+
+class EmbeddingBatcherTests(SimpleTestCase):
+    """Query micro-batching in rag.embeddings.EmbeddingBatcher"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.append(list(texts))
+        self.release.wait(5)
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+    def test_concurrent_queries_share_a_batch(self):
+        self.release.set()
+        batcher = EmbeddingBatcher(self.encode, max_batch_size=8, max_wait_ms=200)
+        results = {}
+        threads = [
+            start_thread(lambda text=text: results.__setitem__(text, batcher.submit(text, timeout=5)))
+            for text in ('a', 'bb', 'ccc')
+        ]
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual({text: float(vector[0]) for text, vector in results.items()}, {'a': 1.0, 'bb': 2.0, 'ccc': 3.0})
+        self.assertEqual(sorted(sum(self.encoded, [])), ['a', 'bb', 'ccc'])
+
+    def test_submit_times_out_and_drops_queued_request(self):
+        batcher = EmbeddingBatcher(self.encode, max_batch_size=1, max_wait_ms=0)
+        first = start_thread(lambda: batcher.submit('stuck'))
+        wait_until(lambda: self.encoded == [['stuck']])
+
+        start = time.perf_counter()
+        with self.assertRaises(FutureTimeoutError):
+            batcher.submit('late', timeout=0.05)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+        self.release.set()
+        first.join(5)
+        self.assertEqual(float(batcher.submit('next', timeout=5)[0]), 4.0)
+        # The timed-out request was never encoded
+        self.assertEqual(self.encoded, [['stuck'], ['next']])
+        self.assertEqual(batcher.get_stats()['abandoned'], 1)
+
+
+class AnswerQuestionCoalescingTests(SimpleTestCase):
+    """RAGManager.answer_question keys and follower deadlines"""
+
+    def setUp(self):
+        from rag.manager import RAGManager
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.release = threading.Event()
+        self.computed = []
+
+        # Only the pieces answer_question touches; no models or vector store
+        self.manager = RAGManager.__new__(RAGManager)
+        self.manager.sos_flight = SingleFlight('sos')
+        self.manager.answer_cache = SemanticAnswerCache(f"{self.tmp_dir}/cache.sqlite3")
+        self.manager._answer_question = self.fake_answer
+
+    def tearDown(self):
+        self.release.set()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def fake_answer(self, question, *args):
+        self.computed.append(question)
+        self.release.wait(5)
+        return {'strategies': [{'title': question}], 'cache': {}, 'degraded': []}
+
+    def ask(self, results, question, **kwargs):
+        return start_thread(lambda: results.append(self.manager.answer_question(question, **kwargs)))
+
+    def test_normalized_questions_share_one_computation(self):
+        results = []
+        leader = self.ask(results, "Fractions  samajh nahi aa rahe", grade="4", subject="Math")
+        wait_until(lambda: self.manager.sos_flight.get_stats()['in_flight'] == 1)
+        follower = self.ask(results, "  fractions samajh NAHI aa rahe ", grade=" 4", subject="math ")
+        wait_until(lambda: self.manager.sos_flight.get_stats()['coalesced'] == 1)
+
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(len(self.computed), 1)
+        self.assertEqual(sorted(result['cache']['coalesced'] for result in results), [False, True])
+        self.assertEqual(results[0]['strategies'], results[1]['strategies'])
+
+    def test_other_grade_is_not_coalesced(self):
+        results = []
+        leader = self.ask(results, "fractions", grade="4")
+        wait_until(lambda: self.manager.sos_flight.get_stats()['in_flight'] == 1)
+        other = self.ask(results, "fractions", grade="5")
+        wait_until(lambda: len(self.computed) == 2)
+
+        self.release.set()
+        leader.join(5)
+        other.join(5)
+        self.assertEqual(self.manager.sos_flight.get_stats()['coalesced'], 0)
+
+    def test_follower_degrades_at_its_own_deadline(self):
+        results = []
+        leader = self.ask(results, "fractions", deadline_seconds=30)
+        wait_until(lambda: self.manager.sos_flight.get_stats()['in_flight'] == 1)
+
+        start = time.perf_counter()
+        result = self.manager.answer_question("fractions", deadline_seconds=0.1)
+        waited = time.perf_counter() - start
+
+        self.assertLess(waited, 1.0)
+        self.assertEqual(result['strategies'], [])
+        self.assertEqual(result['degraded'], ['retrieval', 'llm', 'video'])
+        self.assertEqual(result['timings']['mode'], 'coalesced')
+        self.assertFalse(result['cache']['coalesced'])
+        self.assertEqual(len(self.computed), 1)
+
+        self.release.set()
+        leader.join(5)
+        self.assertEqual(results[0]['strategies'], [{'title': 'fractions'}])
+
+
+class StrategyStreamParserTests(SimpleTestCase):
+    """Incremental parsing of streamed {"strategies": [...]} JSON"""
+
+    DOCUMENT = (
+        '```json\n{"strategies": ['
+        '{"title": "Roti {fractions}", "steps": ["Fold \\"half\\"", "Tear [quarters]"]}, '
+        '{"title": "Number line", "meta": {"minutes": 5, "tags": ["a}", "{b"]}}'
+        ']}\n```'
+    )
+    FIRST = {'title': 'Roti {fractions}', 'steps': ['Fold "half"', 'Tear [quarters]']}
+    SECOND = {'title': 'Number line', 'meta': {'minutes': 5, 'tags': ['a}', '{b']}}
+
+    @staticmethod
+    def feed_all(parser, chunks):
+        """Feed chunks in order, recording which chunk completed which strategies"""
+        return [parser.feed(chunk) for chunk in chunks]
+
+    def test_whole_document_in_one_chunk(self):
+        parser = StrategyStreamParser()
+        self.assertEqual(parser.feed(self.DOCUMENT), [self.FIRST, self.SECOND])
+        self.assertEqual(parser.emitted, 2)
+
+    def test_every_split_point_gives_the_same_objects(self):
+        for split in range(1, len(self.DOCUMENT)):
+            parser = StrategyStreamParser()
+            outputs = self.feed_all(parser, [self.DOCUMENT[:split], self.DOCUMENT[split:]])
+            self.assertEqual(outputs[0] + outputs[1], [self.FIRST, self.SECOND], f"split at {split}")
+
+    def test_objects_are_emitted_when_their_brace_closes(self):
+        parser = StrategyStreamParser()
+        outputs = self.feed_all(parser, list(self.DOCUMENT))
+        first_close = self.DOCUMENT.index('}, {"title": "Number')
+        second_close = self.DOCUMENT.index(']}\n```') - 1
+
+        emitted_at = [i for i, output in enumerate(outputs) if output]
+        self.assertEqual(emitted_at, [first_close, second_close])
+        self.assertEqual(outputs[first_close], [self.FIRST])
+        self.assertEqual(outputs[second_close], [self.SECOND])
+        self.assertEqual(parser.text, self.DOCUMENT)
+
+    def test_other_arrays_are_ignored(self):
+        parser = StrategyStreamParser()
+        document = (
+            '{"note": "strategies", "examples": [{"title": "not a strategy"}], '
+            '"strategies": [{"title": "real"}], "extra": [{"title": "after"}]}'
+        )
+        self.assertEqual(self.feed_all(parser, [document[:30], document[30:]])[1], [{'title': 'real'}])
+        self.assertEqual(parser.emitted, 1)
+
+    def test_custom_array_key(self):
+        parser = StrategyStreamParser(array_key='videos')
+        document = '{"strategies": [{"title": "s"}], "videos": [{"id": "v1"}]}'
+        self.assertEqual(parser.feed(document), [{'id': 'v1'}])
+
+    def test_truncated_output_keeps_only_closed_objects(self):
+        parser = StrategyStreamParser()
+        truncated = self.DOCUMENT[:self.DOCUMENT.index('"meta"') + 12]
+        self.assertEqual(self.feed_all(parser, [truncated[:40], truncated[40:]]), [[], [self.FIRST]])
+        self.assertEqual(parser.feed(''), [])
+        self.assertEqual(parser.emitted, 1)
+
+    def test_malformed_object_is_skipped(self):
+        parser = StrategyStreamParser()
+        document = '{"strategies": [{"title": "bad",}, {"title": "good"}]}'
+        self.assertEqual(parser.feed(document), [{'title': 'good'}])
+        self.assertEqual(parser.emitted, 1)
+
+    def test_no_strategies_key(self):
+        parser = StrategyStreamParser()
+        self.assertEqual(parser.feed('{"answer": [{"title": "x"}]}'), [])
+        self.assertEqual(parser.feed(None), [])
+        self.assertEqual(parser.emitted, 0)
+
+
+class StaleIndexJobTests(TestCase):
+    """Abandoned-job sweep in api.jobs.IndexJobRunner"""
+
+    def make_job(self, status, age_seconds):
+        job = IndexJob.objects.create(pdf_path='ncf.pdf', source_name='NCF Document', status=status)
+        IndexJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=age_seconds))
+        return job
+
+    def statuses(self, *jobs):
+        return [IndexJob.objects.get(pk=job.pk).status for job in jobs]
+
+    def test_runner_start_fails_jobs_without_heartbeat(self):
+        stale_running = self.make_job('running', 3600)
+        stale_queued = self.make_job('queued', 3600)
+        done = self.make_job('succeeded', 3600)
+
+        IndexJobRunner(stale_seconds=900)
+
+        self.assertEqual(self.statuses(stale_running, stale_queued, done), ['failed', 'failed', 'succeeded'])
+        self.assertIn('Abandoned', IndexJob.objects.get(pk=stale_running.pk).error)
+
+    def test_live_running_job_protects_its_queue(self):
+        live = self.make_job('running', 10)
+        waiting = self.make_job('queued', 3600)
+        dead = self.make_job('running', 3600)
+
+        runner = IndexJobRunner(stale_seconds=900)
+
+        self.assertEqual(self.statuses(live, waiting, dead), ['running', 'queued', 'failed'])
+        # Sweeps are throttled per process
+        IndexJob.objects.filter(pk=live.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(runner.sweep_stale_jobs(), 0)
+        self.assertEqual(runner.fail_stale_jobs(), 2)
+
+    def test_status_endpoint_sweeps(self):
+        from api import jobs
+
+        job = self.make_job('running', 3600)
+        jobs._runner_instance = None
+        try:
+            response = self.client.get(f'/api/v1/admin/index-jobs/{job.pk}/')
+        finally:
+            jobs._runner_instance = None
+        self.assertEqual(response.json()['job']['status'], 'failed')
+
+
+@skipUnless(faiss, "faiss-cpu is not installed")
+class FaissSnapshotMergeTests(SimpleTestCase):
+    """Two writers of one FAISS collection saving in turn"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def open_store(self):
+        store = FaissVectorStore(self.directory, 'ncf_documents', 4, 'test-model')
+        if store.exists():
+            store.load()
+        return store
+
+    def add(self, store, *ids):
+        vectors = np.random.default_rng(len(ids)).random((len(ids), 4), dtype=np.float32)
+        store.add(list(ids), vectors, [f"text {chunk_id}" for chunk_id in ids], [{'chunk': chunk_id} for chunk_id in ids])
+
+    def stored_ids(self):
+        return sorted(self.open_store().get()['ids'])
+
+    def test_disjoint_writers_keep_both_changes(self):
+        seed = self.open_store()
+        self.add(seed, 'base-1', 'base-2', 'old-a', 'old-b')
+        seed.snapshot()
+
+        writer_a = self.open_store()
+        writer_b = self.open_store()
+        self.add(writer_a, 'new-a1', 'new-a2')
+        writer_a.delete(ids=['old-a'])
+        self.add(writer_b, 'new-b1')
+        writer_b.delete(ids=['old-b'])
+
+        writer_a.snapshot()
+        writer_b.snapshot()
+        expected = ['base-1', 'base-2', 'new-a1', 'new-a2', 'new-b1']
+        self.assertEqual(self.stored_ids(), expected)
+
+        # A writer with nothing new to save must not roll back the other's save
+        writer_a.snapshot()
+        self.assertEqual(self.stored_ids(), expected)
+        self.assertEqual(self.open_store().get(ids=['new-b1'])['documents'], ['text new-b1'])
+
+    def test_drop_replaces_instead_of_merging(self):
+        seed = self.open_store()
+        self.add(seed, 'base-1', 'base-2')
+        seed.snapshot()
+
+        rebuilder = self.open_store()
+        rebuilder.drop()
+        self.add(rebuilder, 'fresh-1')
+        rebuilder.snapshot()
+
+        self.assertEqual(self.stored_ids(), ['fresh-1'])
+
+
+class BM25SaveMergeTests(SimpleTestCase):
+    """Two writers of one BM25 index saving in turn"""
+
+    # One distinct word per chunk, so a search finds exactly that chunk
+    WORDS = {
+        'base-1': 'आम', 'base-2': 'kite', 'old-a': 'river', 'old-b': 'mango',
+        'new-a1': 'tiger', 'new-a2': 'lotus', 'new-b1': 'peacock',
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def open_index(self):
+        index = BM25Index(self.directory, 'ncf_documents')
+        index.load()
+        return index
+
+    def add(self, index, *ids):
+        index.add(list(ids), [f"{self.WORDS[chunk_id]} कक्षा में पढ़ाई" for chunk_id in ids])
+
+    def stored_ids(self):
+        index = self.open_index()
+        found = [chunk_id for chunk_id, word in self.WORDS.items() if index.search(word, top_k=5)]
+        self.assertEqual(index.count(), len(found))
+        return sorted(found)
+
+    def test_disjoint_writers_keep_both_changes(self):
+        seed = self.open_index()
+        self.add(seed, 'base-1', 'base-2', 'old-a', 'old-b')
+        seed.save()
+
+        writer_a = self.open_index()
+        writer_b = self.open_index()
+        self.add(writer_a, 'new-a1', 'new-a2')
+        writer_a.delete(['old-a'])
+        self.add(writer_b, 'new-b1')
+        writer_b.delete(['old-b'])
+
+        writer_a.save()
+        writer_b.save()
+        expected = ['base-1', 'base-2', 'new-a1', 'new-a2', 'new-b1']
+        self.assertEqual(self.stored_ids(), expected)
+
+        # A writer with nothing new to save must not roll back the other's save
+        writer_a.save()
+        self.assertEqual(self.stored_ids(), expected)
+
+    def test_clear_replaces_instead_of_merging(self):
+        seed = self.open_index()
+        self.add(seed, 'base-1', 'base-2')
+        seed.save()
+
+        rebuilder = self.open_index()
+        rebuilder.clear()
+        self.add(rebuilder, 'new-a1')
+        rebuilder.save()
+
+        self.assertEqual(self.stored_ids(), ['new-a1'])
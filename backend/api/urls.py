@@ -22,6 +22,7 @@ urlpatterns = [
     # SOS - Main feature (returns strategies + videos)
     # ═══════════════════════════════════════════════════════════════════════════
     path('sos/', views.SOSView.as_view(), name='sos'),
+    path('sos/stream/', views.SOSStreamView.as_view(), name='sos-stream'),
     
     # Strategy feedback
     path('feedback/', views.FeedbackView.as_view(), name='feedback'),
@@ -50,6 +51,9 @@ urlpatterns = [
 
     # Admin - PDF indexing
     path('admin/index-pdf/', views.IndexPDFView.as_view(), name='index-pdf'),
+    path('admin/index-jobs/<uuid:job_id>/', views.IndexJobStatusView.as_view(), name='index-job-status'),
+    path('admin/index-jobs/<uuid:job_id>/cancel/', views.IndexJobCancelView.as_view(), name='index-job-cancel'),
+    path('admin/cache/flush/', views.CacheFlushView.as_view(), name='cache-flush'),
     
     # ═══════════════════════════════════════════════════════════════════════════
     # Social / Community Features
@@ -2,7 +2,10 @@
 Shiksha Saathi - API Views
 Migrated with RAGManager integration for YouTube videos and SentenceTransformer embeddings.
 """
+import json
 import logging
+import os
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -14,6 +17,7 @@ from .serializers import (
     FeedbackRequestSerializer,
     FeedbackResponseSerializer,
     HealthCheckSerializer,
+    StrategySerializer,
 )
 
 logger = logging.getLogger(__name__)
@@ -52,6 +56,14 @@ class HealthCheckView(APIView):
             'gemini_configured': gemini_configured,
         }
         
+        try:
+            from rag.gemini_client import get_gemini_guard_stats
+            guard_stats = get_gemini_guard_stats()
+            data['gemini_rate_limiter'] = guard_stats['rate_limiter']
+            data['gemini_circuit_breaker'] = guard_stats['circuit_breaker']
+        except Exception as e:
+            logger.warning(f"Gemini guard stats unavailable: {e}")
+        
         serializer = HealthCheckSerializer(data)
         return Response(serializer.data)
 
@@ -101,6 +113,7 @@ class SOSView(APIView):
             logger.info(f"📊 RAG Result: {len(strategies)} strategies, {len(videos)} videos")
             logger.debug(f"   NCF used: {result.get('ncf_used', False)}")
             logger.debug(f"   Confidence: {result.get('confidence_score', 0.0)}")
+            logger.info(f"⏱️ SOS timings: {result.get('timings', {})}")
             
             # If no strategies from AI, use fallback
             if not strategies:
@@ -123,6 +136,9 @@ class SOSView(APIView):
                 'ncf_used': result.get('ncf_used', False),
                 'confidence_score': result.get('confidence_score', 0.0),
                 'offline_available': False,
+                'timings': result.get('timings', {}),
+                'cache': result.get('cache', {}),
+                'degraded': result.get('degraded', []),
             }
             
             # Validate response structure before sending
@@ -384,6 +400,93 @@ class SOSView(APIView):
         ]
 
 
+class SOSStreamView(SOSView):
+    """
+    Streaming SOS endpoint
+    POST /api/v1/sos/stream/
+    
+    Same request body as /sos/. Strategies are streamed one by one as Gemini
+    generates them, followed by a trailing 'done' event with videos and sources.
+    Responds with Server-Sent Events when the client sends
+    'Accept: text/event-stream', otherwise with NDJSON (one event per line).
+    """
+    
+    def post(self, request):
+        """Stream SOS strategies as they are generated"""
+        serializer = SOSRequestSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            logger.warning(f"[INVALID] SOS stream request: {serializer.errors}")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        query = serializer.validated_data['query']
+        context = serializer.validated_data['context']
+        use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+        
+        logger.info("[SOS STREAM REQUEST RECEIVED]")
+        logger.info(f"   Query: '{query[:80]}...'")
+        logger.info(f"   Grade: {context['grade']} | Subject: {context['subject']} | Time: {context['time_left_minutes']}min")
+        
+        response = StreamingHttpResponse(
+            self._event_stream(query, context, use_sse),
+            content_type='text/event-stream' if use_sse else 'application/x-ndjson',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+        return response
+    
+    def _event_stream(self, query: str, context: dict, use_sse: bool):
+        """Generate serialized events, falling back to local strategies if Gemini yields none"""
+        sent_strategies = 0
+        
+        try:
+            from rag.manager import get_rag_manager
+            manager = get_rag_manager()
+            
+            for event in manager.stream_answer(
+                question=query,
+                grade=context['grade'],
+                subject=context['subject'],
+                time_left=context['time_left_minutes'],
+                language=context.get('language', 'hi'),
+            ):
+                if event['event'] == 'strategy':
+                    strategy_serializer = StrategySerializer(data=event['data'])
+                    if not strategy_serializer.is_valid():
+                        logger.warning(f"[STREAM] Dropping invalid strategy: {strategy_serializer.errors}")
+                        continue
+                    sent_strategies += 1
+                    yield self._format_event('strategy', strategy_serializer.data, use_sse)
+                
+                elif event['event'] == 'done':
+                    if not sent_strategies:
+                        logger.warning("[NO AI] No streamed strategies - sending fallback strategies")
+                        for strategy in self._get_fallback_strategies(query, context):
+                            yield self._format_event('strategy', strategy, use_sse)
+                    yield self._format_event('done', {'success': True, **event['data']}, use_sse)
+        
+        except Exception as e:
+            logger.error(f"[SOS STREAM ERROR] {type(e).__name__}: {e}")
+            if not sent_strategies:
+                for strategy in self._get_fallback_strategies(query, context):
+                    yield self._format_event('strategy', strategy, use_sse)
+            yield self._format_event('done', {
+                'success': True,
+                'videos': [],
+                'rag_sources': [],
+                'ncf_used': False,
+                'confidence_score': 0.0,
+                'offline_available': True,
+            }, use_sse)
+    
+    @staticmethod
+    def _format_event(name: str, data: dict, use_sse: bool) -> str:
+        payload = json.dumps(data, ensure_ascii=False)
+        if use_sse:
+            return f"event: {name}\ndata: {payload}\n\n"
+        return json.dumps({'event': name, 'data': data}, ensure_ascii=False) + "\n"
+
+
 class FeedbackView(APIView):
     """
     Strategy feedback endpoint
@@ -496,7 +599,8 @@ class NCFStatsView(APIView):
                 'success': True,
                 'chunks_indexed': stats['document_count'],
                 'is_ready': stats['is_ready'],
-                'collection_name': stats['collection_name']
+                'collection_name': stats['collection_name'],
+                'embedding': stats.get('embedding', {}),
             })
         except Exception as e:
             return Response({'success': False, 'error': str(e)})
@@ -506,28 +610,129 @@ class IndexPDFView(APIView):
     """
     Admin endpoint to index NCF PDF
     POST /api/v1/admin/index-pdf/
+    
+    Indexing runs as a background job; the response carries the job ID to
+    poll at GET /api/v1/admin/index-jobs/<job_id>/.
+    """
+    
+    def post(self, request):
+        """Queue PDF indexing and return the job immediately"""
+        from .jobs import get_index_job_runner
+        from .models import IndexJob
+        
+        force_reindex = request.data.get('force', False)
+        pdf_path = request.data.get('pdf_path', settings.NCF_PDF_PATH)
+        # Each source is indexed incrementally alongside the others already in the collection
+        source_name = request.data.get('source_name') or (
+            'NCF Document' if pdf_path == settings.NCF_PDF_PATH else os.path.splitext(os.path.basename(pdf_path))[0]
+        )
+        
+        if not os.path.exists(pdf_path):
+            return Response({
+                'success': False,
+                'error': f'PDF not found: {pdf_path}',
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            job = IndexJob.objects.create(
+                pdf_path=pdf_path,
+                source_name=source_name,
+                force_reindex=bool(force_reindex),
+            )
+            get_index_job_runner().submit(job)
+            
+            return Response({
+                'success': True,
+                'message': 'PDF indexing started',
+                'job_id': str(job.id),
+                'status': job.status,
+                'source_name': source_name,
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except Exception as e:
+            logger.error(f"Indexing error: {e}")
+            return Response({
+                'success': False,
+                'error': str(e),
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class IndexJobStatusView(APIView):
+    """
+    Background indexing job status
+    GET /api/v1/admin/index-jobs/<job_id>/
+    """
+    
+    def get(self, request, job_id):
+        """Return progress (pages, chunks, throughput) and the result once finished"""
+        from .jobs import get_index_job_runner
+        from .models import IndexJob
+        
+        # After a restart, jobs of the dead worker are resolved here even if nothing new is submitted
+        get_index_job_runner().sweep_stale_jobs()
+        job = IndexJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({'success': False, 'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({'success': True, 'job': job.to_dict()})
+
+
+class IndexJobCancelView(APIView):
+    """
+    Cancel a background indexing job
+    POST /api/v1/admin/index-jobs/<job_id>/cancel/
+    
+    A running job stops at the next page; nothing it staged reaches the live index.
+    """
+    
+    def post(self, request, job_id):
+        """Request cancellation"""
+        from .jobs import get_index_job_runner
+        from .models import IndexJob
+        
+        get_index_job_runner().sweep_stale_jobs()
+        job = IndexJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({'success': False, 'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if job.is_finished:
+            return Response({
+                'success': False,
+                'error': f'Job already {job.status}',
+                'job': job.to_dict(),
+            }, status=status.HTTP_409_CONFLICT)
+        
+        IndexJob.objects.filter(pk=job_id).update(cancel_requested=True)
+        job.refresh_from_db()
+        logger.info(f"🛑 Cancel requested for index job {job_id}")
+        
+        return Response({'success': True, 'job': job.to_dict()})
+
+
+class CacheFlushView(APIView):
+    """
+    Admin endpoint to flush response caches
+    POST /api/v1/admin/cache/flush/
+    
+    Body (optional): {"caches": ["semantic", "youtube"]}
     """
     
     def post(self, request):
-        """Trigger PDF indexing"""
+        """Flush semantic answer and/or YouTube caches"""
         try:
             from rag.manager import get_rag_manager
             
-            force_reindex = request.data.get('force', False)
-            pdf_path = request.data.get('pdf_path', settings.NCF_PDF_PATH)
-            
+            caches = request.data.get('caches')
             manager = get_rag_manager()
-            result = manager.index_pdf(pdf_path, force_reindex=force_reindex)
+            flushed = manager.flush_caches(caches)
             
             return Response({
                 'success': True,
-                'message': 'PDF indexed successfully',
-                'chunks_created': result.get('chunks_count', 0),
-                'status': result.get('status', 'unknown'),
+                'flushed': flushed,
             })
             
         except Exception as e:
-            logger.error(f"Indexing error: {e}")
+            logger.error(f"Cache flush error: {e}")
             return Response({
                 'success': False,
                 'error': str(e),
@@ -189,6 +189,146 @@ GEMINI_MODEL = 'gemini-2.0-flash'  # Updated from deprecated gemini-1.5-flash
 CHROMA_PERSIST_DIRECTORY = os.getenv('CHROMA_PERSIST_DIRECTORY', str(BASE_DIR / 'chroma_db'))
 NCF_PDF_PATH = os.getenv('NCF_PDF_PATH', str(BASE_DIR.parent / 'NCF-FS_2022EN.pdf'))
 
+# Embedding model shared by indexing and retrieval (recorded in collection metadata)
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+# Query micro-batching: concurrent query encodes within the wait window share one model call (1 disables)
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32'))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '5'))
+# Chunks embedded and written per batch while indexing (bounds indexing memory)
+INDEX_BATCH_SIZE = int(os.getenv('INDEX_BATCH_SIZE', '64'))
+# Queued/running index jobs without a heartbeat for this long are marked failed (checked when
+# a job runner starts and when job status is read)
+INDEX_JOB_STALE_SECONDS = float(os.getenv('INDEX_JOB_STALE_SECONDS', '900'))
+
+# Indexing dedup: strip header/footer lines found at the top/bottom of at least
+# RAG_BOILERPLATE_MIN_PAGES pages and RAG_BOILERPLATE_MIN_FRACTION of a PDF's pages, and drop
+# chunks whose SimHash (over RAG_DEDUP_SHINGLE_SIZE-word shingles) is within
+# RAG_DEDUP_MAX_DISTANCE bits of a chunk already kept. Changing these re-chunks PDFs on the next index run.
+RAG_DEDUP_ENABLED = os.getenv('RAG_DEDUP_ENABLED', 'True').lower() == 'true'
+RAG_DEDUP_MAX_DISTANCE = int(os.getenv('RAG_DEDUP_MAX_DISTANCE', '3'))
+RAG_DEDUP_SHINGLE_SIZE = int(os.getenv('RAG_DEDUP_SHINGLE_SIZE', '3'))
+RAG_BOILERPLATE_MIN_PAGES = int(os.getenv('RAG_BOILERPLATE_MIN_PAGES', '3'))
+RAG_BOILERPLATE_MIN_FRACTION = float(os.getenv('RAG_BOILERPLATE_MIN_FRACTION', '0.3'))
+
+# Vector store holding the collection: 'chroma' or 'faiss' (CPU, needs faiss-cpu)
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'chroma')
+# FAISS index: 'flat' (exact), 'ivf' (nprobe of nlist clusters searched) or 'hnsw' (graph, ef_search candidates)
+FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat')
+FAISS_IVF_NLIST = int(os.getenv('FAISS_IVF_NLIST', '256'))
+FAISS_IVF_NPROBE = int(os.getenv('FAISS_IVF_NPROBE', '16'))
+FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', '32'))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', '80'))
+FAISS_HNSW_EF_SEARCH = int(os.getenv('FAISS_HNSW_EF_SEARCH', '64'))
+
+# Retrieval backend: 'chroma' (query the vector store above) or 'numpy' (in-process exact
+# search over an mmap'd export of the collection, shared by all workers on the host)
+RAG_RETRIEVAL_BACKEND = os.getenv('RAG_RETRIEVAL_BACKEND', 'chroma')
+# Storage dtype of the NumPy index: 'float32', 'float16' (half the memory) or 'int8'
+# (scalar-quantized scan at a quarter of the memory, top candidates reranked exactly)
+RAG_NUMPY_INDEX_DTYPE = os.getenv('RAG_NUMPY_INDEX_DTYPE', 'float32')
+RAG_NUMPY_RERANK_CANDIDATES = int(os.getenv('RAG_NUMPY_RERANK_CANDIDATES', '50'))
+
+# Search mode: 'vector' or 'hybrid' (BM25 keyword search fused with vector search by
+# reciprocal rank fusion; helps short Hinglish/Hindi queries and exact NCF terms)
+RAG_SEARCH_MODE = os.getenv('RAG_SEARCH_MODE', 'vector')
+# Candidates taken from each ranking before fusion, and the RRF damping constant
+RAG_HYBRID_CANDIDATES = int(os.getenv('RAG_HYBRID_CANDIDATES', '20'))
+RAG_HYBRID_RRF_K = int(os.getenv('RAG_HYBRID_RRF_K', '60'))
+# BM25 score at which a chunk counts as a keyword match even below the vector relevance cut-off
+RAG_HYBRID_MIN_KEYWORD_SCORE = float(os.getenv('RAG_HYBRID_MIN_KEYWORD_SCORE', '2.0'))
+
+# Cross-encoder rerank: over-fetch RAG_RERANK_CANDIDATES hits and keep the best top_k by a
+# small CPU cross-encoder, scored in one batch; past the budget the vector order is kept
+RAG_RERANK_ENABLED = os.getenv('RAG_RERANK_ENABLED', 'False').lower() == 'true'
+RAG_RERANK_MODEL = os.getenv('RAG_RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+RAG_RERANK_CANDIDATES = int(os.getenv('RAG_RERANK_CANDIDATES', '30'))
+RAG_RERANK_BUDGET_MS = float(os.getenv('RAG_RERANK_BUDGET_MS', '250'))
+RAG_RERANK_MAX_LENGTH = int(os.getenv('RAG_RERANK_MAX_LENGTH', '256'))
+RAG_RERANK_BATCH_SIZE = int(os.getenv('RAG_RERANK_BATCH_SIZE', '32'))
+RAG_RERANK_WORKERS = int(os.getenv('RAG_RERANK_WORKERS', '1'))
+# Cross-encoder score (logit) at which a chunk is used as context below the vector relevance cut-off
+RAG_RERANK_MIN_SCORE = float(os.getenv('RAG_RERANK_MIN_SCORE', '0.0'))
+
+# Prompt context packing: candidates retrieved per SOS query, packed (overlaps removed,
+# MMR-diversified) into RAG_CONTEXT_MAX_TOKENS tokens
+RAG_CONTEXT_CANDIDATES = int(os.getenv('RAG_CONTEXT_CANDIDATES', '6'))
+RAG_CONTEXT_MAX_TOKENS = int(os.getenv('RAG_CONTEXT_MAX_TOKENS', '1200'))
+# MMR trade-off: 1.0 ranks by relevance only, lower values favour diverse sections
+RAG_CONTEXT_MMR_LAMBDA = float(os.getenv('RAG_CONTEXT_MMR_LAMBDA', '0.7'))
+# Tokenizer for counting: a tokenizer.json path or HuggingFace name (empty = the embedding model's)
+RAG_CONTEXT_TOKENIZER = os.getenv('RAG_CONTEXT_TOKENIZER', '')
+
+# Restrict NCF retrieval to chunks tagged for the teacher's grade and subject (tags are added
+# at indexing time; re-index older collections), widening to all chunks below this many results
+RAG_FILTER_BY_CLASS = os.getenv('RAG_FILTER_BY_CLASS', 'True').lower() == 'true'
+RAG_FILTER_MIN_RESULTS = int(os.getenv('RAG_FILTER_MIN_RESULTS', '2'))
+
+# Language partitions, e.g. 'hi,en': chunks are also kept in '<collection>__<lang>' collections
+# and a query searches its detected language first, the others only when it finds fewer than
+# RAG_PARTITION_MIN_RESULTS relevant hits (empty = one collection for all languages)
+RAG_LANGUAGE_PARTITIONS = [language.strip() for language in os.getenv('RAG_LANGUAGE_PARTITIONS', '').split(',') if language.strip()]
+RAG_PARTITION_MIN_RESULTS = int(os.getenv('RAG_PARTITION_MIN_RESULTS', '2'))
+# Per-partition embedding models, e.g. 'hi=paraphrase-multilingual-MiniLM-L12-v2' (default: EMBEDDING_MODEL_NAME)
+RAG_PARTITION_EMBEDDING_MODELS = dict(
+    item.strip().split('=', 1) for item in os.getenv('RAG_PARTITION_EMBEDDING_MODELS', '').split(',') if '=' in item
+)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SOS LATENCY CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Run Gemini strategy generation and the YouTube lookup in parallel
+SOS_CONCURRENT = os.getenv('SOS_CONCURRENT', 'True').lower() == 'true'
+SOS_LLM_TIMEOUT_SECONDS = float(os.getenv('SOS_LLM_TIMEOUT_SECONDS', '25'))
+SOS_VIDEO_TIMEOUT_SECONDS = float(os.getenv('SOS_VIDEO_TIMEOUT_SECONDS', '12'))
+# Threads per SOS branch pool (retrieval, llm and video each get their own, so a slow
+# upstream cannot starve the other branches)
+RAG_WORKER_THREADS = int(os.getenv('RAG_WORKER_THREADS', '16'))
+
+# Per-request deadline: seconds of budget per minute of class time left, clamped
+SOS_DEADLINE_SECONDS_PER_MINUTE = float(os.getenv('SOS_DEADLINE_SECONDS_PER_MINUTE', '2'))
+SOS_DEADLINE_MIN_SECONDS = float(os.getenv('SOS_DEADLINE_MIN_SECONDS', '6'))
+SOS_DEADLINE_MAX_SECONDS = float(os.getenv('SOS_DEADLINE_MAX_SECONDS', '25'))
+# Share of the deadline each stage may use (the LLM and video stages overlap)
+SOS_STAGE_BUDGETS = {
+    'retrieval': 0.15,
+    'llm': 0.95,
+    'video': 0.6,
+}
+
+# Gemini guard: process-wide token bucket and circuit breaker (no sleep-based retries)
+GEMINI_RATE_LIMIT_PER_MINUTE = float(os.getenv('GEMINI_RATE_LIMIT_PER_MINUTE', '30'))
+GEMINI_RATE_LIMIT_BURST = int(os.getenv('GEMINI_RATE_LIMIT_BURST', '10'))
+GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('GEMINI_BREAKER_FAILURE_THRESHOLD', '5'))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv('GEMINI_BREAKER_RESET_SECONDS', '30'))
+
+# YouTube oEmbed lookups: per-request in-flight bound and shared pool size
+YOUTUBE_OEMBED_CONCURRENCY = int(os.getenv('YOUTUBE_OEMBED_CONCURRENCY', '6'))
+YOUTUBE_OEMBED_POOL_SIZE = int(os.getenv('YOUTUBE_OEMBED_POOL_SIZE', '16'))
+YOUTUBE_OEMBED_TIMEOUT_SECONDS = float(os.getenv('YOUTUBE_OEMBED_TIMEOUT_SECONDS', '3'))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CACHE CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# SQLite file shared by all workers on this host
+RAG_CACHE_PATH = os.getenv('RAG_CACHE_PATH', str(BASE_DIR / 'cache' / 'rag_cache.sqlite3'))
+
+# Normalized query -> ranked YouTube video IDs
+YOUTUBE_SEARCH_CACHE_TTL_SECONDS = int(os.getenv('YOUTUBE_SEARCH_CACHE_TTL_SECONDS', str(6 * 3600)))
+YOUTUBE_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('YOUTUBE_SEARCH_CACHE_MAX_ENTRIES', '5000'))
+
+# Video ID -> oEmbed metadata (rarely changes)
+YOUTUBE_OEMBED_CACHE_TTL_SECONDS = int(os.getenv('YOUTUBE_OEMBED_CACHE_TTL_SECONDS', str(30 * 86400)))
+YOUTUBE_OEMBED_CACHE_MAX_ENTRIES = int(os.getenv('YOUTUBE_OEMBED_CACHE_MAX_ENTRIES', '50000'))
+
+# Semantic SOS answer cache (same grade/subject/language, cosine >= threshold), in the
+# shared SQLite file above; every index run clears it
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', str(24 * 3600)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2000'))
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # LOGGING CONFIGURATION
 # ═══════════════════════════════════════════════════════════════════════════════
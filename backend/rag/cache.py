@@ -0,0 +1,439 @@
+"""
+Shiksha Saathi - Response Caches
+SQLite-backed TTL cache and semantic cache for generated SOS answers, both
+shared by all server workers on the same host.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a free-text query for use as a cache key"""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+class _SharedSQLite:
+    """One SQLite file (WAL mode) opened with a connection per thread"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteTTLCache(_SharedSQLite):
+    """
+    Key/value cache with per-entry TTL and size-bounded LRU eviction.
+
+    Entries live in a single SQLite file (WAL mode), so every gunicorn/uwsgi
+    worker on the host shares them. Several namespaces can share one file.
+    Hit/miss counters are per process.
+
+    Usage:
+        cache = SQLiteTTLCache('/tmp/rag_cache.sqlite3', 'yt_search', ttl_seconds=3600)
+        cache.set('fractions class 4', ['abc123xyz00'])
+        video_ids = cache.get('fractions class 4')
+    """
+
+    # Run eviction every N writes instead of on every set
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl_seconds: float,
+        max_entries: int = 10000,
+    ):
+        super().__init__(path)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._stats_lock = threading.Lock()
+
+        self._init_schema()
+
+    def _init_schema(self):
+        """Create the shared cache table if needed"""
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, accessed_at)"
+        )
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a cached value.
+
+        Returns:
+            The cached value, or None on miss/expiry/error
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    )
+                self._record(hit=False)
+                return None
+
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._record(hit=True)
+            return json.loads(row[0])
+
+        except Exception as e:
+            logger.warning(f"Cache read failed ({self.namespace}): {e}")
+            self._record(hit=False)
+            return None
+
+    def set(self, key: str, value: Any, ttl_seconds: float = None):
+        """Store a JSON-serializable value"""
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+            )
+
+            with self._stats_lock:
+                self._writes += 1
+                should_evict = self._writes % self.EVICT_EVERY == 0
+            if should_evict:
+                self.evict()
+
+        except Exception as e:
+            logger.warning(f"Cache write failed ({self.namespace}): {e}")
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least-recently-used ones above max_entries.
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connection()
+        removed = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?",
+            (self.namespace, time.time()),
+        ).rowcount
+
+        overflow = self.count() - self.max_entries
+        if overflow > 0:
+            removed += conn.execute(
+                """
+                DELETE FROM cache_entries WHERE rowid IN (
+                    SELECT rowid FROM cache_entries WHERE namespace = ?
+                    ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (self.namespace, overflow),
+            ).rowcount
+
+        if removed:
+            logger.debug(f"Cache {self.namespace}: evicted {removed} entries")
+        return removed
+
+    def clear(self) -> int:
+        """Remove every entry in this namespace"""
+        return self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).rowcount
+
+    def count(self) -> int:
+        """Number of stored entries (including not-yet-evicted expired ones)"""
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        except Exception:
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size for monitoring"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            'entries': self.count(),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+
+class SemanticAnswerCache(_SharedSQLite):
+    """
+    Cache of generated SOS answers, matched by query embedding.
+
+    Entries are partitioned by (grade, subject, language) so a hit can only
+    come from a teacher in the same classroom context. Within a partition the
+    closest entry by cosine similarity is returned if it clears the threshold.
+    Entries have a TTL; above max_entries the least recently used are evicted.
+
+    Entries and the hit/miss/latency-saved counters live in the shared SQLite
+    cache file, so every worker on the host serves the same answers, a flush
+    (or the invalidation after a re-index) clears them everywhere, and the
+    stats cover all workers.
+
+    Usage:
+        cache = SemanticAnswerCache('/tmp/rag_cache.sqlite3', threshold=0.92)
+        hit = cache.lookup(embedding, ('4', 'math', 'hi'))
+        if hit is None:
+            cache.store(embedding, ('4', 'math', 'hi'), answer, llm_ms=2300)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.92,
+        ttl_seconds: float = 24 * 3600,
+        max_entries: int = 2000,
+        namespace: str = 'semantic_answers',
+    ):
+        super().__init__(path)
+        self.namespace = namespace
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS semantic_answers (
+                namespace TEXT NOT NULL,
+                partition_key TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                value TEXT NOT NULL,
+                llm_ms REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_semantic_partition ON semantic_answers (namespace, partition_key)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_counters (
+                namespace TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                latency_saved_ms REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+
+    @staticmethod
+    def partition_key(grade: str, subject: str, language: str) -> tuple:
+        """Build the (grade, subject, language) partition key"""
+        return (normalize_query(grade), normalize_query(subject), normalize_query(language))
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def _partition_text(partition: tuple) -> str:
+        return json.dumps(list(partition), ensure_ascii=False)
+
+    def _count(self, hits: int = 0, misses: int = 0, latency_saved_ms: float = 0.0):
+        self._connection().execute(
+            """
+            INSERT INTO cache_counters (namespace, hits, misses, latency_saved_ms) VALUES (?, ?, ?, ?)
+            ON CONFLICT(namespace) DO UPDATE SET
+                hits = hits + excluded.hits,
+                misses = misses + excluded.misses,
+                latency_saved_ms = latency_saved_ms + excluded.latency_saved_ms
+            """,
+            (self.namespace, hits, misses, latency_saved_ms),
+        )
+
+    def lookup(self, embedding, partition: tuple) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically similar query.
+
+        Returns:
+            {'value', 'similarity', 'latency_saved_ms'} on hit, otherwise None
+        """
+        query = self._normalize(embedding)
+        now = time.time()
+        try:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT rowid, embedding FROM semantic_answers "
+                "WHERE namespace = ? AND partition_key = ? AND expires_at >= ?",
+                (self.namespace, self._partition_text(partition), now),
+            ).fetchall()
+            # Entries embedded by another model cannot be compared
+            rows = [row for row in rows if len(row[1]) == query.nbytes]
+
+            hit = None
+            if rows:
+                matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    hit = conn.execute(
+                        "SELECT value, llm_ms FROM semantic_answers WHERE rowid = ?", (rows[best][0],)
+                    ).fetchone()
+
+            if hit is None:
+                self._count(misses=1)
+                return None
+
+            conn.execute("UPDATE semantic_answers SET accessed_at = ? WHERE rowid = ?", (now, rows[best][0]))
+            self._count(hits=1, latency_saved_ms=hit[1])
+            return {
+                'value': json.loads(hit[0]),
+                'similarity': round(float(scores[best]), 4),
+                'latency_saved_ms': hit[1],
+            }
+
+        except Exception as e:
+            logger.warning(f"Semantic cache read failed: {e}")
+            return None
+
+    def store(self, embedding, partition: tuple, value: Dict[str, Any], llm_ms: float = 0.0):
+        """Cache an answer together with how long the LLM took to produce it"""
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT INTO semantic_answers "
+                "(namespace, partition_key, embedding, value, llm_ms, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.namespace,
+                    self._partition_text(partition),
+                    self._normalize(embedding).tobytes(),
+                    # default=float: scores may be NumPy scalars
+                    json.dumps(value, ensure_ascii=False, default=float),
+                    round(llm_ms, 1),
+                    now + self.ttl_seconds,
+                    now,
+                ),
+            )
+            self.evict()
+        except Exception as e:
+            logger.warning(f"Semantic cache write failed: {e}")
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least-recently-used ones above max_entries.
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connection()
+        removed = conn.execute(
+            "DELETE FROM semantic_answers WHERE namespace = ? AND expires_at < ?",
+            (self.namespace, time.time()),
+        ).rowcount
+
+        overflow = self.count() - self.max_entries
+        if overflow > 0:
+            removed += conn.execute(
+                """
+                DELETE FROM semantic_answers WHERE rowid IN (
+                    SELECT rowid FROM semantic_answers WHERE namespace = ?
+                    ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (self.namespace, overflow),
+            ).rowcount
+        return removed
+
+    def clear(self) -> int:
+        """Flush every entry in every worker (admin action, re-index). Returns the number removed."""
+        return self._connection().execute(
+            "DELETE FROM semantic_answers WHERE namespace = ?", (self.namespace,)
+        ).rowcount
+
+    def count(self) -> int:
+        """Number of stored entries (including not-yet-evicted expired ones)"""
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM semantic_answers WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        except Exception:
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio and latency saved across all workers, for monitoring"""
+        try:
+            row = self._connection().execute(
+                "SELECT hits, misses, latency_saved_ms FROM cache_counters WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+        except Exception:
+            row = None
+        hits, misses, latency_saved_ms = row or (0, 0, 0.0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total else 0.0,
+            'entries': self.count(),
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'latency_saved_ms': round(latency_saved_ms, 1),
+        }
@@ -0,0 +1,199 @@
+"""
+Shiksha Saathi - Chunk Classifier
+Rule-based tagging of indexed chunks with stage, grade band, subject and
+language, and the matching retrieval filters for a teacher's grade/subject.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .text_utils import detect_language, parse_grade, tokenize
+
+# NCF stages and the grades they span (0 = pre-school / Anganwadi / Balvatika)
+STAGE_GRADES = {
+    'foundational': (0, 2),
+    'preparatory': (3, 5),
+    'middle': (6, 8),
+    'secondary': (9, 12),
+}
+ALL_GRADES = (0, 12)
+
+STAGE_PATTERNS = {
+    'foundational': re.compile(
+        r"foundational stage|pre-?school|anganwadi|balvatika|ages? 3\s*(?:-|–|to)\s*8|"
+        r"बुनियादी (?:स्तर|चरण|अवस्था)|आंगनवाड़ी|बालवाटिका"
+    ),
+    'preparatory': re.compile(r"preparatory stage|प्रारंभिक (?:स्तर|चरण|अवस्था)"),
+    'middle': re.compile(r"middle stage|मध्य (?:स्तर|चरण|अवस्था)"),
+    'secondary': re.compile(r"secondary stage|माध्यमिक (?:स्तर|चरण|अवस्था)"),
+}
+
+# "Grade 3", "Classes 3 to 5", "कक्षा 1-2" (Devanagari digits included)
+GRADE_PATTERN = re.compile(
+    r"(?:grades?|class(?:es)?|std\.?|कक्षा(?:ओं)?)\s*(\d{1,2})(?:\s*(?:-|–|to|and|&|से|व|और)\s*(\d{1,2}))?"
+)
+
+SUBJECT_TERMS = {
+    'math': {
+        'math', 'maths', 'mathematics', 'mathematical', 'numeracy', 'number', 'numbers', 'fraction',
+        'fractions', 'addition', 'subtraction', 'multiplication', 'division', 'geometry', 'shapes',
+        'measurement', 'counting', 'arithmetic', 'गणित', 'संख्या', 'संख्याएँ', 'भिन्न', 'जोड़', 'घटाव',
+        'गुणा', 'ज्यामिति', 'गिनती', 'अंकगणित',
+    },
+    'language': {
+        'language', 'languages', 'literacy', 'reading', 'writing', 'phonics', 'alphabet', 'vocabulary',
+        'grammar', 'poem', 'poems', 'rhymes', 'hindi', 'english', 'भाषा', 'पढ़ना', 'लिखना', 'वर्णमाला',
+        'कविता', 'साक्षरता', 'हिंदी', 'अंग्रेजी', 'व्याकरण',
+    },
+    'science': {
+        'science', 'scientific', 'experiment', 'experiments', 'plants', 'animals', 'energy', 'physics',
+        'chemistry', 'biology', 'विज्ञान', 'प्रयोग', 'पौधे', 'ऊर्जा',
+    },
+    'environmental_studies': {'environment', 'environmental', 'evs', 'पर्यावरण'},
+    'social_science': {
+        'history', 'geography', 'civics', 'society', 'इतिहास', 'भूगोल', 'समाज', 'सामाजिक',
+    },
+    'arts': {
+        'art', 'arts', 'music', 'dance', 'drawing', 'painting', 'craft', 'theatre', 'drama', 'कला', 'संगीत',
+        'नृत्य', 'चित्रकला',
+    },
+    'physical_education': {'sports', 'yoga', 'exercise', 'fitness', 'खेलकूद', 'योग', 'व्यायाम'},
+}
+TERM_SUBJECT = {term: subject for subject, terms in SUBJECT_TERMS.items() for term in terms}
+
+# Bumped whenever classify_chunk changes; stored in source manifests so the next
+# index run rewrites the tags of chunks indexed under an older version
+TAGGER_VERSION = 1
+
+# A subject tag needs this many term hits and a clear lead over the runner-up
+MIN_SUBJECT_HITS = 2
+SUBJECT_LEAD = 1.5
+
+
+def _grade_evidence(text: str) -> List[Tuple[int, int]]:
+    """Grade ranges mentioned in text, from stage names and explicit grades"""
+    lowered = text.lower()
+    ranges = [STAGE_GRADES[stage] for stage, pattern in STAGE_PATTERNS.items() if pattern.search(lowered)]
+    for match in GRADE_PATTERN.finditer(lowered):
+        low = int(match.group(1))
+        high = int(match.group(2)) if match.group(2) else low
+        if 1 <= low <= high <= 12:
+            ranges.append((low, high))
+    return ranges
+
+
+def _subject_of(text: str) -> Optional[str]:
+    counts = Counter(TERM_SUBJECT[token] for token in tokenize(text) if token in TERM_SUBJECT)
+    if not counts:
+        return None
+    ranked = counts.most_common(2)
+    best, hits = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    if hits >= MIN_SUBJECT_HITS and hits >= SUBJECT_LEAD * runner_up:
+        return best
+    return None
+
+
+def _stage_of(grade_min: int, grade_max: int) -> str:
+    for stage, (low, high) in STAGE_GRADES.items():
+        if low <= grade_min and grade_max <= high:
+            return stage
+    return 'general'
+
+
+def classify_chunk(text: str, context: str = "") -> Dict[str, Any]:
+    """
+    Tag one chunk for filtered retrieval.
+
+    Stage/grade and subject come from the chunk itself, or from the
+    surrounding page (context) when the chunk has no evidence of its own.
+    Chunks without evidence apply to every grade and subject.
+
+    Args:
+        text: Chunk text
+        context: Text of the page the chunk came from
+
+    Returns:
+        Scalar metadata: 'stage', 'grade_min', 'grade_max', 'subject', 'language'
+    """
+    ranges = _grade_evidence(text) or (_grade_evidence(context) if context else [])
+    if ranges:
+        grade_min = min(low for low, _ in ranges)
+        grade_max = max(high for _, high in ranges)
+    else:
+        grade_min, grade_max = ALL_GRADES
+
+    subject = _subject_of(text) or (_subject_of(context) if context else None)
+    return {
+        'stage': _stage_of(grade_min, grade_max) if ranges else 'general',
+        'grade_min': grade_min,
+        'grade_max': grade_max,
+        'subject': subject or 'general',
+        'language': detect_language(text),
+    }
+
+
+def normalize_subject(subject: str) -> Optional[str]:
+    """
+    Map a teacher's subject ("Math", "गणित", "EVS", "Hindi") to a chunk subject tag.
+
+    Returns:
+        The subject tag, or None if it is not recognised
+    """
+    counts = Counter(TERM_SUBJECT[token] for token in tokenize(subject) if token in TERM_SUBJECT)
+    return counts.most_common(1)[0][0] if counts else None
+
+
+def build_chunk_filter(grade: str = "", subject: str = "") -> Optional[Dict[str, Any]]:
+    """
+    Metadata filter for chunks that apply to a teacher's grade and subject.
+
+    Chunks tagged 'general' (no grade or subject evidence) always match.
+    Chunks indexed before tagging carry no tags and never match, so only
+    apply the filter once collection_fully_tagged() holds.
+
+    Returns:
+        A vector store where clause, or None if neither value is usable
+    """
+    clauses = []
+    grade_number = parse_grade(grade)
+    if grade_number is not None and ALL_GRADES[0] <= grade_number <= ALL_GRADES[1]:
+        clauses += [{'grade_min': {'$lte': grade_number}}, {'grade_max': {'$gte': grade_number}}]
+
+    subject_tag = normalize_subject(subject)
+    if subject_tag:
+        clauses.append({'subject': {'$in': [subject_tag, 'general']}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def collection_fully_tagged(store) -> bool:
+    """Whether every chunk in a vector store carries classify_chunk tags"""
+    total = store.count()
+    return total > 0 and len(store.get(where={'grade_min': {'$gte': 0}})['ids']) == total
+
+
+def retag_chunks(store, tags: Dict[str, Dict[str, Any]], target=None) -> int:
+    """
+    Rewrite the tags of chunks already in a store, reusing their vectors.
+
+    Args:
+        store: Store holding the chunks
+        tags: Chunk ID -> classify_chunk output
+        target: Store to write to (defaults to store; e.g. a staging collection)
+
+    Returns:
+        Number of chunks rewritten
+    """
+    page = store.get(ids=list(tags), include_embeddings=True)
+    if not page['ids']:
+        return 0
+    (target or store).add(
+        ids=page['ids'],
+        embeddings=page['embeddings'],
+        documents=page['documents'],
+        metadatas=[{**metadata, **tags[chunk_id]} for chunk_id, metadata in zip(page['ids'], page['metadatas'])],
+    )
+    return len(page['ids'])
@@ -0,0 +1,427 @@
+"""
+Shiksha Saathi - Concurrency Helpers
+Shared worker pool and fan-out helpers for running RAG sub-tasks in parallel.
+"""
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Shared executor instances, one per named pool
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers: int = 16, pool: str = "rag") -> ThreadPoolExecutor:
+    """
+    Get a singleton thread pool by name.
+    
+    Separate pools keep nested fan-outs (e.g. oEmbed lookups started from
+    inside an SOS branch) from starving the outer pool.
+    """
+    executor = _executors.get(pool)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f"{pool}-worker",
+                )
+                _executors[pool] = executor
+    return executor
+
+
+def get_branch_executor(branch: str, max_workers: int = 16) -> ThreadPoolExecutor:
+    """
+    Get the thread pool reserved for one kind of branch ('llm', 'video', ...).
+
+    A branch whose upstream is slow can only fill its own pool: abandoned
+    Gemini calls cannot leave video lookups or retrieval waiting for a worker.
+    """
+    return get_executor(max_workers, pool=f"{branch}-branch")
+
+
+def run_branches(
+    branches: Dict[str, Tuple[Callable[[], Any], float]],
+    executor: ThreadPoolExecutor = None,
+    max_workers: int = 16,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run independent branches concurrently, each with its own time budget.
+
+    All branches are submitted at the same time. The call returns once every
+    branch has either finished or used up its budget, so total wall time is
+    max(branch times) instead of their sum.
+
+    A running branch cannot be interrupted, so each callable must bound its
+    own I/O by the time left in its budget (measured from submission, since
+    it may wait for a worker). A branch still queued when its budget runs out
+    is cancelled and never runs.
+
+    Args:
+        branches: Mapping of branch name -> (callable, timeout_seconds)
+        executor: Run every branch on this executor (defaults to one pool per branch name)
+        max_workers: Threads in each per-branch pool
+
+    Returns:
+        Mapping of branch name -> {'value', 'status', 'elapsed_ms', 'error'}
+        where status is one of 'ok', 'timeout' (ran past its budget),
+        'queued_timeout' (never got a worker within its budget) or 'error'
+    """
+    fan_out_start = time.perf_counter()
+
+    def timed(fn: Callable[[], Any]):
+        start = time.perf_counter()
+        value = fn()
+        return value, (time.perf_counter() - start) * 1000
+
+    futures = {
+        name: ((executor or get_branch_executor(name, max_workers)).submit(timed, fn), timeout)
+        for name, (fn, timeout) in branches.items()
+    }
+
+    results = {}
+    for name, (future, timeout) in futures.items():
+        remaining = max(0.0, fan_out_start + timeout - time.perf_counter())
+        try:
+            value, elapsed_ms = future.result(timeout=remaining)
+            results[name] = {
+                'value': value,
+                'status': 'ok',
+                'elapsed_ms': round(elapsed_ms, 1),
+                'error': None,
+            }
+        except FutureTimeoutError:
+            # cancel() only succeeds for a branch that never started; running work
+            # finishes in the background, bounded by its own I/O timeouts
+            queued = future.cancel()
+            state = 'still queued' if queued else 'still running'
+            logger.warning(f"⏱️ Branch '{name}' exceeded its {timeout}s budget ({state})")
+            results[name] = {
+                'value': None,
+                'status': 'queued_timeout' if queued else 'timeout',
+                'elapsed_ms': round((time.perf_counter() - fan_out_start) * 1000, 1),
+                'error': f"timed out after {timeout}s ({state})",
+            }
+        except Exception as e:
+            logger.error(f"❌ Branch '{name}' failed: {type(e).__name__}: {e}")
+            results[name] = {
+                'value': None,
+                'status': 'error',
+                'elapsed_ms': round((time.perf_counter() - fan_out_start) * 1000, 1),
+                'error': str(e),
+            }
+
+    return results
+
+
+class Deadline:
+    """
+    Wall-clock budget for one request, handed out to stages in slices.
+
+    Usage:
+        deadline = Deadline(8.0)
+        timeout = deadline.slice(0.5)   # at most half the budget, never past the deadline
+        if deadline.expired():
+            ...
+    """
+
+    def __init__(self, seconds: float):
+        self.total = seconds
+        self.started_at = time.perf_counter()
+        self.expires_at = self.started_at + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.perf_counter())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def slice(self, fraction: float, cap: float = None) -> float:
+        """
+        Budget for a stage: 'fraction' of the total, bounded by what is left
+        and by an optional hard cap.
+        """
+        budget = min(self.total * fraction, self.remaining())
+        if cap is not None:
+            budget = min(budget, cap)
+        return budget
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started_at) * 1000, 1)
+
+
+class TokenBucket:
+    """
+    Thread-safe, non-blocking token bucket.
+
+    Tokens refill continuously at rate_per_minute up to 'burst'. try_acquire()
+    never waits: callers that get False should degrade instead of retrying.
+
+    Usage:
+        limiter = TokenBucket(rate_per_minute=60, burst=10)
+        if limiter.try_acquire():
+            call_api()
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_minute / 60.0)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available. Returns False immediately otherwise."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.allowed += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {
+                'rate_per_minute': self.rate_per_minute,
+                'burst': self.burst,
+                'tokens_available': round(self._tokens, 2),
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+            }
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for an external dependency.
+
+    closed    -> calls go through; 'failure_threshold' consecutive failures open it
+    open      -> calls are refused without touching the dependency
+    half_open -> after reset_seconds one probe call is let through; its
+                 success closes the breaker, its failure re-opens it
+
+    Usage:
+        breaker = CircuitBreaker('gemini', failure_threshold=5, reset_seconds=30)
+        if breaker.allow_request():
+            try:
+                call_api()
+                breaker.record_success()
+            except Exception:
+                breaker.record_failure()
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.trips = 0
+        self.short_circuited = 0
+        self.last_error = None
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """True if a call may go out now. Never blocks."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def release(self):
+        """Give back a permission from allow_request() that was not used for a call"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"🔌 Circuit '{self.name}' closed again")
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception = None):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if error is not None:
+                self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(
+                        f"🔌 Circuit '{self.name}' opened after {self._consecutive_failures} failures "
+                        f"(retry in {self.reset_seconds}s)"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through (0 when not open)"""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def get_stats(self) -> Dict[str, Any]:
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_seconds': self.reset_seconds,
+                'retry_after_seconds': round(retry_after, 1),
+                'trips': self.trips,
+                'short_circuited': self.short_circuited,
+                'last_error': self.last_error,
+            }
+
+
+class _Call:
+    """One in-flight SingleFlight computation"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one computation.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running (followers) wait for it and receive a deep
+    copy of its result, or its exception. Nothing is cached once the call
+    finishes - this only de-duplicates work that overlaps in time.
+
+    Usage:
+        flight = SingleFlight('sos')
+        result, shared = flight.do(key, lambda: expensive(question))
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.follower_timeouts = 0
+
+    def do(
+        self,
+        key,
+        fn: Callable[[], Any],
+        wait_timeout: float = None,
+        on_timeout: Callable[[], Any] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Run fn once per key across concurrent callers.
+
+        Args:
+            key: Hashable de-duplication key
+            fn: Zero-argument callable producing the result
+            wait_timeout: How long a follower waits for the leader
+            on_timeout: Produces a follower's result when the wait times out
+                        (defaults to computing fn on its own)
+
+        Returns:
+            (result, shared) where shared is True if the result came from another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            if call.done.wait(timeout=wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return copy.deepcopy(call.value), True
+
+            with self._lock:
+                self.follower_timeouts += 1
+            if on_timeout is not None:
+                logger.warning(f"⏱️ SingleFlight '{self.name}': leader still running after {wait_timeout}s, giving up")
+                return on_timeout(), False
+            logger.warning(f"⏱️ SingleFlight '{self.name}': leader still running after {wait_timeout}s, computing independently")
+            return fn(), False
+
+        try:
+            value = fn()
+        except BaseException as e:
+            call.error = e
+            self._finish(key, call)
+            raise
+
+        # Followers get their own copy, so the leader is free to mutate its result
+        with self._lock:
+            self._calls.pop(key, None)
+            if call.followers:
+                call.value = copy.deepcopy(value)
+        self._finish(key, call)
+        return value, False
+
+    def _finish(self, key, call: _Call):
+        with self._lock:
+            self._calls.pop(key, None)
+        if call.followers:
+            logger.info(f"🤝 SingleFlight '{self.name}': shared one result with {call.followers} waiting callers")
+        call.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'follower_timeouts': self.follower_timeouts,
+            }
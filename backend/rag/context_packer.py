@@ -0,0 +1,268 @@
+"""
+Shiksha Saathi - Context Packer
+Fits retrieved passages into a prompt token budget: overlapping chunk spans are
+removed, passages are picked by maximal marginal relevance, and tokens are
+counted with a real tokenizer.
+"""
+import logging
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from tokenizers import Tokenizer
+
+from .embeddings import get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+# Shortest suffix/prefix match treated as chunker overlap rather than coincidence
+MIN_OVERLAP_CHARS = 40
+# A passage left shorter than this after overlap removal is dropped as a duplicate
+MIN_PASSAGE_CHARS = 80
+# Smallest remainder of the budget worth filling with a truncated passage
+MIN_TRUNCATED_TOKENS = 48
+
+
+class TokenCounter:
+    """
+    Counts and truncates text in tokens of a HuggingFace fast tokenizer.
+
+    Without a tokenizer it falls back to the old ~4 characters per token
+    estimate, so a missing tokenizer degrades accuracy, not availability.
+
+    Usage:
+        counter = get_token_counter()
+        counter.count("बच्चों को भिन्न कैसे पढ़ाएं")
+        counter.truncate(text, 200)
+    """
+
+    def __init__(self, tokenizer=None, name: str = 'chars/4'):
+        if tokenizer is not None:
+            # transformers tokenizers wrap a tokenizers.Tokenizer; work on a private copy
+            # so disabling truncation here does not touch the embedding model's settings
+            backend = getattr(tokenizer, 'backend_tokenizer', tokenizer)
+            tokenizer = Tokenizer.from_str(backend.to_str())
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+        self.tokenizer = tokenizer
+        self.name = name
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        if self.tokenizer is None:
+            return [math.ceil(len(text) / 4) for text in texts]
+        return [len(encoding.ids) for encoding in self.tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0] if text else 0
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens, cut at a token boundary"""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is None:
+            return text[:max_tokens * 4]
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        return text[:encoding.offsets[max_tokens - 1][1]]
+
+
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """
+    Get singleton token counter.
+
+    Uses settings.RAG_CONTEXT_TOKENIZER (a tokenizer.json path or a
+    HuggingFace model name, e.g. a Gemma tokenizer to count Gemini-like
+    tokens); by default the embedding model's own tokenizer, which is
+    already loaded.
+    """
+    global _token_counter
+    if _token_counter is None:
+        with _token_counter_lock:
+            if _token_counter is None:
+                name = getattr(settings, 'RAG_CONTEXT_TOKENIZER', '')
+                tokenizer = None
+                try:
+                    if name and os.path.isfile(name):
+                        tokenizer = Tokenizer.from_file(name)
+                    elif name:
+                        tokenizer = Tokenizer.from_pretrained(name)
+                    else:
+                        embedder = get_embedding_service()
+                        name = embedder.model_name
+                        tokenizer = getattr(embedder.model, 'tokenizer', None)
+                    _token_counter = TokenCounter(tokenizer, name) if tokenizer is not None else None
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not load tokenizer {name!r}: {e}")
+                if _token_counter is None:
+                    logger.warning("⚠️ No tokenizer available - context budgets use a chars/4 estimate")
+                    _token_counter = TokenCounter()
+    return _token_counter
+
+
+def _suffix_prefix_overlap(first: str, second: str, min_chars: int) -> int:
+    """Length of the longest suffix of first that is also a prefix of second"""
+    if len(first) < min_chars or len(second) < min_chars:
+        return 0
+    probe = second[:min_chars]
+    # The overlap cannot be longer than second, so start searching where that suffix begins
+    position = first.find(probe, max(0, len(first) - len(second)))
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+
+def remove_overlaps(text: str, kept: Sequence[str], min_chars: int = MIN_OVERLAP_CHARS) -> Tuple[str, int]:
+    """
+    Strip the spans of text that repeat passages already in the context.
+
+    Chunkers repeat the tail of one chunk at the head of the next, so a
+    neighbouring chunk shares a prefix or suffix with a kept one; a chunk
+    wholly inside a kept one is removed entirely.
+
+    Returns:
+        (remaining text, number of characters removed)
+    """
+    original_length = len(text)
+    for other in kept:
+        if text in other:
+            return "", original_length
+        head = _suffix_prefix_overlap(other, text, min_chars)
+        if head:
+            text = text[head:].lstrip()
+        tail = _suffix_prefix_overlap(text, other, min_chars)
+        if tail:
+            text = text[:-tail].rstrip()
+    return text, original_length - len(text)
+
+
+def mmr_order(relevance: np.ndarray, embeddings: Optional[np.ndarray], mmr_lambda: float = 0.7) -> List[int]:
+    """
+    Order passages by maximal marginal relevance.
+
+    Each step picks the passage maximising
+    lambda * relevance - (1 - lambda) * max cosine similarity to those already picked.
+    Without embeddings this is plain relevance order.
+    """
+    count = len(relevance)
+    if embeddings is None or count <= 1:
+        return [int(i) for i in np.argsort(-relevance, kind='stable')]
+
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    pairwise = vectors @ vectors.T
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    remaining = np.ones(count, dtype=bool)
+    order = []
+    for _ in range(count):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(remaining, mmr_lambda * relevance - (1 - mmr_lambda) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        order.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return order
+
+
+def pack_context(
+    passages: List[Dict[str, Any]],
+    max_tokens: int,
+    format_passage: Callable[[Dict[str, Any], str], str],
+    separator: str = "\n\n",
+    header: str = "",
+    mmr_lambda: float = 0.7,
+    token_counter: Optional[TokenCounter] = None,
+) -> Dict[str, Any]:
+    """
+    Build a prompt context of at most max_tokens tokens.
+
+    Passages are visited in MMR order; spans repeating an already packed
+    passage are cut, near-empty remainders are dropped, and a passage that
+    does not fit is truncated at a token boundary when enough budget is
+    left to be useful.
+
+    Args:
+        passages: Dicts with 'text', 'relevance' (higher is better, on a 0-1
+                  scale comparable to cosine similarity) and optionally
+                  'embedding' (enables MMR diversity)
+        max_tokens: Token budget for the whole context, header included
+        format_passage: Renders (passage, trimmed text) as one context block
+        separator: Placed between blocks
+        header: Prepended to the context when any passage is packed
+        mmr_lambda: Relevance/diversity trade-off (1.0 = relevance only)
+        token_counter: Defaults to get_token_counter()
+
+    Returns:
+        Dict with 'context', 'passages' (packed, in context order, each with
+        'packed_text'), 'tokens', 'duplicates', 'overlap_chars', 'truncated'
+    """
+    counter = token_counter or get_token_counter()
+    result = {'context': "", 'passages': [], 'tokens': 0, 'duplicates': 0, 'overlap_chars': 0, 'truncated': False}
+    if not passages or max_tokens <= 0:
+        return result
+
+    relevance = np.array([float(passage.get('relevance', 0.0)) for passage in passages], dtype=np.float32)
+    embeddings = None
+    if all(passage.get('embedding') is not None for passage in passages):
+        embeddings = np.asarray([passage['embedding'] for passage in passages], dtype=np.float32)
+
+    budget = max_tokens - counter.count(header)
+    separator_tokens = counter.count(separator)
+    blocks, kept_texts = [], []
+    used = 0
+
+    for i in mmr_order(relevance, embeddings, mmr_lambda):
+        passage = passages[i]
+        text, removed = remove_overlaps(' '.join(passage['text'].split()), kept_texts)
+        result['overlap_chars'] += removed
+        if not text or (removed and len(text) < MIN_PASSAGE_CHARS):
+            result['duplicates'] += 1
+            continue
+
+        joint = separator_tokens if blocks else 0
+        block = format_passage(passage, text)
+        cost = counter.count(block) + joint
+        if used + cost > budget:
+            room = budget - used - joint - counter.count(format_passage(passage, ""))
+            if room < MIN_TRUNCATED_TOKENS:
+                continue
+            text = counter.truncate(text, room)
+            block = format_passage(passage, text)
+            cost = counter.count(block) + joint
+            if used + cost > budget:
+                continue
+            result['truncated'] = True
+
+        blocks.append(block)
+        kept_texts.append(text)
+        result['passages'].append({**passage, 'packed_text': text})
+        used += cost
+
+    if not blocks:
+        return result
+
+    context = header + separator.join(blocks)
+    tokens = counter.count(context)
+    # Token counts are not strictly additive across block boundaries; trim any excess
+    limit = max_tokens
+    while tokens > max_tokens and limit > 0:
+        limit -= tokens - max_tokens
+        context = counter.truncate(context, limit)
+        tokens = counter.count(context)
+        result['truncated'] = True
+
+    result['context'] = context
+    result['tokens'] = tokens
+    return result
@@ -0,0 +1,321 @@
+"""
+Shiksha Saathi - Corpus Indexer
+Index many PDFs at once: extraction and chunking in a process pool,
+a single embedding stage in the parent, and resumable checkpoints.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from .embeddings import get_embedding_service
+from .chunk_classifier import TAGGER_VERSION, retag_chunks
+from .dedup import dedup_options
+from .indexer import SourceChunker, iter_pdf_pages
+from .manifest import ManifestStore, file_sha256
+from .sparse_index import BM25Index
+from .vector_store import open_vector_store
+
+logger = logging.getLogger(__name__)
+
+
+def discover_corpus(path: str) -> List[Dict[str, str]]:
+    """
+    List the PDFs to index.
+
+    Args:
+        path: A directory (searched recursively for *.pdf) or a JSON manifest:
+              [{"path": "guides/fln.pdf", "source": "NCERT FLN Guide"}, ...]
+              Relative paths in a manifest are resolved against its directory.
+
+    Returns:
+        Entries with 'path' and 'source', in a stable order
+    """
+    root = Path(path)
+    if root.is_dir():
+        return [
+            {'path': str(pdf), 'source': pdf.stem}
+            for pdf in sorted(root.rglob('*.pdf'))
+        ]
+
+    with open(root, 'r', encoding='utf-8') as f:
+        listed = json.load(f)
+
+    entries = []
+    for item in listed:
+        item = {'path': item} if isinstance(item, str) else item
+        pdf_path = Path(item['path'])
+        if not pdf_path.is_absolute():
+            pdf_path = root.parent / pdf_path
+        entries.append({'path': str(pdf_path), 'source': item.get('source') or pdf_path.stem})
+    return entries
+
+
+def extract_and_chunk(
+    pdf_path: str,
+    source: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    dedup: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Worker-process stage: hash, extract, deduplicate and chunk one PDF.
+
+    Uses the same SourceChunker as RAGManager.index_pdf, so chunk IDs match.
+
+    Returns:
+        {'path', 'source', 'file_sha256', 'pages', 'chunks': [{'id', 'text', 'metadata'}],
+        'dedup': SourceChunker stats, 'extract_s'}
+    """
+    start = time.perf_counter()
+    chunker = SourceChunker(source, chunk_size, chunk_overlap, dedup)
+    chunks = []
+    pages = 0
+    for page in chunker.iter_pages(iter_pdf_pages(pdf_path)):
+        pages += 1
+        chunks.extend(page['chunks'])
+
+    return {
+        'path': pdf_path,
+        'source': source,
+        'file_sha256': file_sha256(pdf_path),
+        'pages': pages,
+        'chunks': chunks,
+        'dedup': chunker.stats,
+        'extract_s': round(time.perf_counter() - start, 2),
+    }
+
+
+class CorpusIndexer:
+    """
+    Index a directory (or manifest) of PDFs into one collection.
+
+    Extraction and chunking run in a ProcessPoolExecutor; results feed a
+    single embedding stage in this process, which embeds in fixed-size
+    batches. Every finished PDF is written to a checkpoint file, so a rerun
+    after a crash continues where it stopped. Extraction and chunking go
+    through the same SourceChunker as RAGManager.index_pdf and the
+    per-source manifests are shared, so either can re-index a source the
+    other indexed without re-embedding unchanged chunks.
+
+    Usage:
+        indexer = CorpusIndexer(workers=4)
+        summary = indexer.run(discover_corpus('/data/pdfs'))
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = None,
+        collection_name: str = "ncf_documents",
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        checkpoint_path: Optional[str] = None,
+    ):
+        self.persist_directory = persist_directory or settings.CHROMA_PERSIST_DIRECTORY
+        self.collection_name = collection_name
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.batch_size = batch_size or getattr(settings, 'INDEX_BATCH_SIZE', 64)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.dedup = dedup_options()
+        self.checkpoint_path = Path(
+            checkpoint_path or Path(self.persist_directory) / 'checkpoints' / f"{collection_name}.json"
+        )
+
+        Path(self.persist_directory).mkdir(parents=True, exist_ok=True)
+        self.embedder = get_embedding_service()
+        self.manifests = ManifestStore(self.persist_directory)
+        self.store = open_vector_store(collection_name, self.persist_directory, self.embedder)
+        self.bm25 = BM25Index(self.persist_directory, collection_name)
+        self.bm25.load()
+
+    # ─── Checkpoints ─────────────────────────────────────────────────────────
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """Completed PDFs from previous (possibly interrupted) runs"""
+        if not self.checkpoint_path.exists():
+            return {'completed': {}}
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return {'completed': {}}
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def reset_checkpoint(self):
+        if self.checkpoint_path.exists():
+            self.checkpoint_path.unlink()
+
+    # ─── Embedding stage ─────────────────────────────────────────────────────
+
+    def _store_source(self, extracted: Dict[str, Any]) -> Dict[str, Any]:
+        """Embed new chunks of one PDF, delete its orphans and write its manifest"""
+        source = extracted['source']
+        manifest = self.manifests.load(self.collection_name, source)
+        if manifest:
+            existing_ids = set(manifest.get('chunk_ids', []))
+        else:
+            existing_ids = set(self.store.get(where={'source': source})['ids'])
+
+        new_chunks = [chunk for chunk in extracted['chunks'] if chunk['id'] not in existing_ids]
+        retagged = 0
+        if not manifest or manifest.get('tagger') != TAGGER_VERSION:
+            # Chunks kept from an index made by an older classifier get their tags rewritten
+            kept = [chunk for chunk in extracted['chunks'] if chunk['id'] in existing_ids]
+            for i in range(0, len(kept), self.batch_size):
+                retagged += retag_chunks(self.store, {chunk['id']: chunk['metadata'] for chunk in kept[i:i + self.batch_size]})
+        for i in range(0, len(new_chunks), self.batch_size):
+            batch = new_chunks[i:i + self.batch_size]
+            texts = [chunk['text'] for chunk in batch]
+            batch_ids = [chunk['id'] for chunk in batch]
+            self.store.add(
+                ids=batch_ids,
+                embeddings=self.embedder.encode(texts),
+                documents=texts,
+                metadatas=[chunk['metadata'] for chunk in batch],
+            )
+            self.bm25.add(batch_ids, texts)
+
+        chunk_ids = {chunk['id'] for chunk in extracted['chunks']}
+        orphan_ids = sorted(existing_ids - chunk_ids)
+        for i in range(0, len(orphan_ids), self.batch_size):
+            self.store.delete(ids=orphan_ids[i:i + self.batch_size])
+        self.bm25.delete(orphan_ids)
+        # The checkpoint and manifest must not get ahead of persisted vectors
+        self.store.snapshot()
+        self.bm25.save()
+
+        self.manifests.save(self.collection_name, source, {
+            'file_sha256': extracted['file_sha256'],
+            'embedding_model': self.embedder.model_name,
+            'pages': extracted['pages'],
+            'chunk_ids': sorted(chunk_ids),
+            'path': extracted['path'],
+            'dedup': self.dedup,
+            'tagger': TAGGER_VERSION,
+        })
+        return {'added': len(new_chunks), 'deleted': len(orphan_ids), 'retagged': retagged, 'chunks': len(chunk_ids)}
+
+    # ─── Driver ──────────────────────────────────────────────────────────────
+
+    def run(
+        self,
+        entries: List[Dict[str, str]],
+        resume: bool = True,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Index every entry, skipping PDFs already completed with the same content.
+
+        Args:
+            entries: Output of discover_corpus()
+            resume: Honour the checkpoint from earlier runs
+            progress_callback: Called after each PDF with running totals
+
+        Returns:
+            Summary with per-status counts, chunk totals, failures and timings
+        """
+        start = time.perf_counter()
+        checkpoint = self.load_checkpoint() if resume else {'completed': {}}
+        completed = checkpoint.setdefault('completed', {})
+
+        summary = {
+            'total': len(entries),
+            'indexed': 0,
+            'skipped': 0,
+            'failed': [],
+            'chunks_added': 0,
+            'chunks_deleted': 0,
+            'chunks_retagged': 0,
+            'near_duplicates': 0,
+            'boilerplate_lines_removed': 0,
+            'elapsed_s': 0.0,
+        }
+
+        # Resume: a PDF completed earlier is skipped unless its content, the dedup options or the tagger changed
+        pending = []
+        for entry in entries:
+            done = completed.get(entry['path'])
+            if (
+                done and done.get('file_sha256') == file_sha256(entry['path'])
+                and done.get('dedup') == self.dedup and done.get('tagger') == TAGGER_VERSION
+            ):
+                summary['skipped'] += 1
+            else:
+                pending.append(entry)
+
+        logger.info(
+            f"📚 Corpus indexing: {len(pending)} PDFs to process, {summary['skipped']} already done "
+            f"({self.workers} workers, batch {self.batch_size})"
+        )
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # Bounded in-flight extraction keeps memory proportional to the worker count
+            queue = list(reversed(pending))
+            in_flight = {}
+
+            def submit_next():
+                entry = queue.pop()
+                future = pool.submit(
+                    extract_and_chunk, entry['path'], entry['source'], self.chunk_size, self.chunk_overlap,
+                    self.dedup,
+                )
+                in_flight[future] = entry
+
+            while queue and len(in_flight) < self.workers * 2:
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry = in_flight.pop(future)
+                    try:
+                        extracted = future.result()
+                        stored = self._store_source(extracted)
+                    except Exception as e:
+                        logger.error(f"❌ Failed to index {entry['path']}: {type(e).__name__}: {e}")
+                        summary['failed'].append({'path': entry['path'], 'error': str(e)})
+                    else:
+                        summary['indexed'] += 1
+                        summary['chunks_added'] += stored['added']
+                        summary['chunks_deleted'] += stored['deleted']
+                        summary['chunks_retagged'] += stored['retagged']
+                        summary['near_duplicates'] += extracted['dedup']['near_duplicates']
+                        summary['boilerplate_lines_removed'] += extracted['dedup']['lines_removed']
+                        completed[entry['path']] = {
+                            'source': entry['source'],
+                            'file_sha256': extracted['file_sha256'],
+                            'dedup': self.dedup,
+                            'tagger': TAGGER_VERSION,
+                            'chunks': stored['chunks'],
+                            'completed_at': time.time(),
+                        }
+                        self._save_checkpoint(checkpoint)
+                        logger.info(
+                            f"✅ {entry['source']}: {stored['chunks']} chunks "
+                            f"(+{stored['added']}/-{stored['deleted']}, extract {extracted['extract_s']}s)"
+                        )
+
+                    summary['elapsed_s'] = round(time.perf_counter() - start, 2)
+                    if progress_callback:
+                        progress_callback(dict(summary, failed=len(summary['failed'])))
+
+                    if queue:
+                        submit_next()
+
+        summary['elapsed_s'] = round(time.perf_counter() - start, 2)
+        return summary
@@ -0,0 +1,210 @@
+"""
+Shiksha Saathi - Chunk Deduplication
+Strips recurring page headers/footers before chunking and drops chunks that
+are near-duplicates (SimHash over word shingles) of one already kept.
+"""
+import hashlib
+import re
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .text_utils import tokenize
+
+FINGERPRINT_BITS = 64
+# Page numbers and dates differ between otherwise identical header/footer lines
+DIGIT_PATTERN = re.compile(r"[0-9०-९]+")
+
+
+def dedup_options() -> Optional[Dict[str, Any]]:
+    """
+    Deduplication settings for the indexing pipeline, or None when disabled.
+
+    Stored in each source's manifest: a PDF indexed under other options is
+    re-chunked even if the file is unchanged.
+    """
+    if not getattr(settings, 'RAG_DEDUP_ENABLED', True):
+        return None
+    return {
+        'max_distance': getattr(settings, 'RAG_DEDUP_MAX_DISTANCE', 3),
+        'shingle_size': getattr(settings, 'RAG_DEDUP_SHINGLE_SIZE', 3),
+        'boilerplate_min_pages': getattr(settings, 'RAG_BOILERPLATE_MIN_PAGES', 3),
+        'boilerplate_min_fraction': getattr(settings, 'RAG_BOILERPLATE_MIN_FRACTION', 0.3),
+    }
+
+
+# ─── Headers and footers ─────────────────────────────────────────────────────
+
+def _line_key(line: str) -> str:
+    return DIGIT_PATTERN.sub('#', ' '.join(line.lower().split()))
+
+
+class BoilerplateStripper:
+    """
+    Removes lines that recur at the top or bottom of many pages.
+
+    A line (compared with digits masked, so "Page 12" matches "Page 13")
+    is boilerplate once it appeared within edge_lines of the top or bottom
+    of at least min_pages pages and min_fraction of the pages seen so far.
+    Pages are processed as a stream: the first warmup_pages are held back
+    until there is enough evidence, then every page is stripped with what
+    has been learned up to and including it.
+
+    Usage:
+        stripper = BoilerplateStripper()
+        for page in stripper.process(pages):
+            chunks = chunk(page['text'])
+    """
+
+    def __init__(
+        self,
+        edge_lines: int = 3,
+        min_pages: int = 3,
+        min_fraction: float = 0.3,
+        warmup_pages: int = 10,
+    ):
+        self.edge_lines = edge_lines
+        self.min_pages = min_pages
+        self.min_fraction = min_fraction
+        self.warmup_pages = warmup_pages
+        self.counts: Counter = Counter()
+        self.pages_seen = 0
+        self.lines_removed = 0
+
+    def learn(self, text: str):
+        lines = [line for line in text.splitlines() if line.strip()]
+        edges = lines[:self.edge_lines] + lines[-self.edge_lines:]
+        self.counts.update({_line_key(line) for line in edges})
+        self.pages_seen += 1
+
+    def is_boilerplate(self, key: str) -> bool:
+        count = self.counts.get(key, 0)
+        return count >= self.min_pages and count >= self.min_fraction * self.pages_seen
+
+    def strip(self, text: str) -> str:
+        """Text without boilerplate lines among its first and last edge_lines lines"""
+        lines = text.splitlines()
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        edges = set(content[:self.edge_lines] + content[-self.edge_lines:])
+        removed = {i for i in edges if self.is_boilerplate(_line_key(lines[i]))}
+        if not removed:
+            return text
+        self.lines_removed += len(removed)
+        return '\n'.join(line for i, line in enumerate(lines) if i not in removed)
+
+    def process(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield page dicts with boilerplate stripped from their 'text'"""
+        held = deque()
+        for page in pages:
+            self.learn(page['text'])
+            held.append(page)
+            if self.pages_seen > self.warmup_pages:
+                page = held.popleft()
+                yield {**page, 'text': self.strip(page['text'])}
+        while held:
+            page = held.popleft()
+            yield {**page, 'text': self.strip(page['text'])}
+
+    @property
+    def boilerplate_lines(self) -> List[str]:
+        return sorted(key for key in self.counts if self.is_boilerplate(key))
+
+
+# ─── Near-duplicate chunks ───────────────────────────────────────────────────
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64-bit SimHash of a text's word shingles.
+
+    Texts sharing most of their shingles get fingerprints a few bits apart,
+    whatever their length; formatting and case do not matter.
+    """
+    tokens = tokenize(text)
+    if len(tokens) >= shingle_size:
+        shingles = {' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    else:
+        shingles = set(tokens) or {text}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big') for shingle in shingles],
+        dtype='>u8',
+    )
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, FINGERPRINT_BITS)
+    majority = (2 * bits.sum(axis=0, dtype=np.int64) > len(shingles)).astype(np.uint8)
+    return int.from_bytes(np.packbits(majority).tobytes(), 'big')
+
+
+class NearDuplicateIndex:
+    """
+    Finds chunks whose SimHash is within max_distance bits of one already kept.
+
+    Fingerprints are split into max_distance + 1 bands; two fingerprints
+    within max_distance bits agree exactly on at least one band, so only
+    chunks sharing a band are compared.
+
+    Usage:
+        index = NearDuplicateIndex(max_distance=3)
+        if index.add(chunk_id, text) is not None:
+            ...  # near-duplicate of an earlier chunk, skip it
+    """
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 3):
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self.bands = [
+            (i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width)
+            for i in range(bands)
+        ]
+        self.buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in self.bands]
+        self.kept = 0
+        self.duplicates = 0
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> low) & ((1 << (high - low)) - 1) for low, high in self.bands]
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """Key of a kept chunk within max_distance bits, if any"""
+        for buckets, value in zip(self.buckets, self._band_values(fingerprint)):
+            for other, key in buckets.get(value, ()):
+                if bin(fingerprint ^ other).count('1') <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, key: str, text: str) -> Optional[str]:
+        """
+        Keep a chunk unless it near-duplicates one already kept.
+
+        Returns:
+            None if the chunk was kept, else the key of the chunk it duplicates
+        """
+        fingerprint = simhash(text, self.shingle_size)
+        duplicate_of = self.find(fingerprint)
+        if duplicate_of is not None:
+            self.duplicates += 1
+            return duplicate_of
+        for buckets, value in zip(self.buckets, self._band_values(fingerprint)):
+            buckets.setdefault(value, []).append((fingerprint, key))
+        self.kept += 1
+        return None
+
+
+def drop_near_duplicates(
+    chunks: List[Dict[str, Any]],
+    max_distance: int = 3,
+    shingle_size: int = 3,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Keep the first of each group of near-duplicate chunks, in order.
+
+    Args:
+        chunks: Dicts with 'id' and 'text'
+
+    Returns:
+        (kept chunks, number dropped)
+    """
+    index = NearDuplicateIndex(max_distance, shingle_size)
+    kept = [chunk for chunk in chunks if index.add(chunk['id'], chunk['text']) is None]
+    return kept, index.duplicates
@@ -0,0 +1,347 @@
+"""
+Shiksha Saathi - Embedding Service
+One SentenceTransformer per process, shared by indexing and querying so every
+vector in a collection comes from the same model.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingMismatchError(ValueError):
+    """A collection was built with a different embedding model than the one loaded"""
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches single-query encode requests from concurrent threads.
+
+    A background thread takes the first waiting request, keeps collecting
+    for up to max_wait_ms (or until max_batch_size requests), then runs one
+    encode over the batch and hands each caller its own vector. A lone
+    request pays at most max_wait_ms extra; under load, per-call model
+    overhead is shared across the batch.
+
+    Usage:
+        batcher = EmbeddingBatcher(service.encode, max_batch_size=32, max_wait_ms=5)
+        vector = batcher.submit("How to teach fractions?")
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._started_at = time.perf_counter()
+
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+        self.queue_wait_ms_total = 0.0
+        self.encode_ms_total = 0.0
+        self.abandoned = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Queue one text and wait for its vector.
+
+        Args:
+            text: Text to embed
+            timeout: Seconds to wait (None waits indefinitely)
+
+        Raises:
+            concurrent.futures.TimeoutError: If no vector arrived in time; a request
+                not yet picked up by the worker is dropped from the queue
+            Whatever the underlying encode raised for this batch
+        """
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                with self._stats_lock:
+                    self.abandoned += 1
+            raise
+
+    def _collect(self) -> List[tuple]:
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        window_ends = time.perf_counter() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = window_ends - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip requests whose caller timed out while they were queued
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _, _ in batch]
+            encode_start = time.perf_counter()
+
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                logger.error(f"❌ Batched embedding failed for {len(texts)} queries: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            encode_ms = (time.perf_counter() - encode_start) * 1000
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.queue_wait_ms_total += sum((encode_start - queued_at) * 1000 for _, _, queued_at in batch)
+                self.encode_ms_total += encode_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch size, queue wait and throughput counters"""
+        with self._stats_lock:
+            uptime = time.perf_counter() - self._started_at
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self.batches,
+                'requests': self.requests,
+                'avg_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'avg_queue_wait_ms': round(self.queue_wait_ms_total / self.requests, 2) if self.requests else 0.0,
+                'avg_encode_ms': round(self.encode_ms_total / self.batches, 2) if self.batches else 0.0,
+                'encode_throughput_per_s': round(self.requests / (self.encode_ms_total / 1000), 1) if self.encode_ms_total else 0.0,
+                'requests_per_s': round(self.requests / uptime, 2) if uptime else 0.0,
+                'queue_depth': self._queue.qsize(),
+                'abandoned': self.abandoned,
+            }
+
+
+class EmbeddingService:
+    """
+    Owns the loaded embedding model and stamps/validates collection metadata.
+
+    Collections created through the service carry 'embedding_model' and
+    'embedding_dimension' in their metadata; opening a collection built with
+    another model raises EmbeddingMismatchError instead of returning
+    meaningless neighbours.
+
+    Usage:
+        embedder = get_embedding_service()
+        collection = embedder.get_or_create_collection(client, 'ncf_documents')
+        vector = embedder.encode_query("How to teach fractions?")
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        micro_batch_size: int = 32,
+        micro_batch_wait_ms: float = 5.0,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        logger.info(f"Loading embedding model: {model_name}...")
+        start = time.perf_counter()
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        logger.info(f"✅ Embedding model ready ({self.dimension} dims, {time.perf_counter() - start:.1f}s)")
+
+        self.texts_encoded = 0
+        self.encode_calls = 0
+        self._stats_lock = threading.Lock()
+
+        # Query embeddings from concurrent requests share one encode call
+        self.batcher = (
+            EmbeddingBatcher(self.encode, micro_batch_size, micro_batch_wait_ms)
+            if micro_batch_size > 1 else None
+        )
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Embed a list of texts.
+
+        Args:
+            texts: Texts to embed
+            batch_size: Model batch size (defaults to the service setting)
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=batch_size or self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+
+        with self._stats_lock:
+            self.encode_calls += 1
+            self.texts_encoded += len(texts)
+        return vectors.astype(np.float32, copy=False)
+
+    def encode_query(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Embed a single query string (micro-batched with concurrent queries).
+
+        Args:
+            text: Query to embed
+            timeout: Seconds to wait for the micro-batcher (None waits indefinitely)
+
+        Raises:
+            concurrent.futures.TimeoutError: If the batcher did not deliver in time
+        """
+        if self.batcher is not None:
+            return self.batcher.submit(text, timeout=timeout)
+        return self.encode([text])[0]
+
+    def collection_metadata(self) -> Dict[str, Any]:
+        """Metadata that identifies vectors produced by this service"""
+        return {
+            'embedding_model': self.model_name,
+            'embedding_dimension': self.dimension,
+        }
+
+    def create_collection(self, client, name: str, metadata: Optional[Dict[str, Any]] = None):
+        """Create a collection stamped with this model's name and dimension"""
+        return client.create_collection(
+            name=name,
+            metadata={**(metadata or {}), **self.collection_metadata()},
+        )
+
+    def get_or_create_collection(self, client, name: str, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Open a collection, validating its embedding metadata, or create it.
+
+        Raises:
+            EmbeddingMismatchError: If the existing collection uses another model
+        """
+        try:
+            collection = client.get_collection(name=name)
+        except Exception:
+            collection = None
+
+        if collection is None:
+            logger.info(f"Creating collection {name} for {self.model_name}")
+            return self.create_collection(client, name, metadata)
+
+        self.check_collection(collection)
+        return collection
+
+    def check_collection(self, collection):
+        """
+        Verify a collection was built with this model.
+
+        Collections from before the metadata existed are accepted when their
+        stored vectors have the right dimension, and stamped on the spot.
+
+        Raises:
+            EmbeddingMismatchError: On a model or dimension mismatch
+        """
+        metadata = dict(collection.metadata or {})
+        stored_model = metadata.get('embedding_model')
+
+        if stored_model is None:
+            stored_dimension = self._peek_dimension(collection)
+            if stored_dimension is not None and stored_dimension != self.dimension:
+                raise EmbeddingMismatchError(
+                    f"Collection '{collection.name}' holds {stored_dimension}-dim vectors but "
+                    f"{self.model_name} produces {self.dimension}; re-index the collection"
+                )
+            self._stamp(collection, metadata)
+            return
+
+        stored_dimension = int(metadata.get('embedding_dimension') or 0)
+        if stored_model != self.model_name or stored_dimension != self.dimension:
+            raise EmbeddingMismatchError(
+                f"Collection '{collection.name}' was indexed with {stored_model} ({stored_dimension} dims) "
+                f"but the loaded model is {self.model_name} ({self.dimension} dims); re-index the collection"
+            )
+
+    @staticmethod
+    def _peek_dimension(collection) -> Optional[int]:
+        """Dimension of one stored vector, or None for an empty collection"""
+        try:
+            sample = collection.get(limit=1, include=['embeddings'])
+            embeddings = sample.get('embeddings')
+            if embeddings is not None and len(embeddings) > 0:
+                return len(embeddings[0])
+        except Exception as e:
+            logger.warning(f"Could not inspect vectors in {collection.name}: {e}")
+        return None
+
+    def _stamp(self, collection, metadata: Dict[str, Any]):
+        """Record this model on a legacy collection"""
+        # Chroma rejects changes to hnsw:* settings after creation
+        metadata = {key: value for key, value in metadata.items() if not key.startswith('hnsw:')}
+        try:
+            collection.modify(metadata={**metadata, **self.collection_metadata()})
+            logger.warning(f"Stamped legacy collection {collection.name} with embedding model {self.model_name}")
+        except Exception as e:
+            logger.warning(f"Could not record embedding metadata on {collection.name}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Model identity and encode counters for monitoring"""
+        return {
+            'model': self.model_name,
+            'dimension': self.dimension,
+            'encode_calls': self.encode_calls,
+            'texts_encoded': self.texts_encoded,
+            'micro_batching': self.batcher.get_stats() if self.batcher else None,
+        }
+
+
+# One service per model name per process
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
+    """Get singleton embedding service (defaults to settings.EMBEDDING_MODEL_NAME)"""
+    model_name = model_name or getattr(settings, 'EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+    service = _services.get(model_name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(model_name)
+            if service is None:
+                service = EmbeddingService(
+                    model_name,
+                    batch_size=getattr(settings, 'EMBEDDING_BATCH_SIZE', 64),
+                    micro_batch_size=getattr(settings, 'EMBEDDING_BATCH_MAX_SIZE', 32),
+                    micro_batch_wait_ms=getattr(settings, 'EMBEDDING_BATCH_MAX_WAIT_MS', 5.0),
+                )
+                _services[model_name] = service
+    return service
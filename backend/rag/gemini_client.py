@@ -4,10 +4,15 @@ Wrapper for Google Gemini API with system prompts.
 """
 import json
 import logging
+import threading
+import time
 from typing import List, Dict, Any, Optional
 
 import google.generativeai as genai
 from django.conf import settings
+from google.api_core import exceptions as google_exceptions
+
+from .concurrency import CircuitBreaker, TokenBucket
 
 logger = logging.getLogger(__name__)
 
@@ -147,6 +152,228 @@ Now respond to teacher's emergency with JSON only!
 """
 
 
+class GenerativeModelRegistry:
+    """
+    Process-wide registry of configured GenerativeModel instances.
+    
+    One model is built per (model name, system prompt, generation config) and
+    reused by every request and thread, so construction, prompt and config
+    serialization happen once per process instead of once per call.
+    
+    Usage:
+        model = get_model_registry().get(
+            'gemini-2.0-flash',
+            system_instruction=PROMPT,
+            generation_config={'temperature': 0.7},
+        )
+        response = model.generate_content(user_prompt)
+    """
+    
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+        self.build_ms_total = 0.0
+    
+    @staticmethod
+    def _key(model_name: str, system_instruction: Optional[str], generation_config: Optional[Dict]) -> tuple:
+        return (
+            model_name,
+            system_instruction or "",
+            json.dumps(generation_config or {}, sort_keys=True),
+        )
+    
+    def get(
+        self,
+        model_name: str,
+        system_instruction: Optional[str] = None,
+        generation_config: Optional[Dict[str, Any]] = None,
+    ) -> genai.GenerativeModel:
+        """
+        Get (building on first use) the model for this configuration.
+        
+        Args:
+            model_name: Gemini model name, e.g. 'gemini-2.0-flash'
+            system_instruction: System prompt baked into the model
+            generation_config: GenerationConfig fields baked into the model
+            
+        Returns:
+            Shared GenerativeModel instance
+        """
+        key = self._key(model_name, system_instruction, generation_config)
+        
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.hits += 1
+                return model
+            
+            start = time.perf_counter()
+            model = genai.GenerativeModel(
+                model_name,
+                system_instruction=system_instruction,
+                generation_config=genai.GenerationConfig(**generation_config) if generation_config else None,
+            )
+            build_ms = (time.perf_counter() - start) * 1000
+            
+            self._models[key] = model
+            self.builds += 1
+            self.build_ms_total += build_ms
+            logger.info(f"Built Gemini model {model_name} ({build_ms:.1f} ms, {len(self._models)} cached)")
+            return model
+    
+    def clear(self):
+        """Drop all cached models (e.g. after re-configuring the API key)"""
+        with self._lock:
+            self._models.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Build/reuse counters and the construction time saved by reuse"""
+        avg_build_ms = self.build_ms_total / self.builds if self.builds else 0.0
+        return {
+            'models': len(self._models),
+            'builds': self.builds,
+            'reuses': self.hits,
+            'avg_build_ms': round(avg_build_ms, 2),
+            'estimated_saved_ms': round(avg_build_ms * self.hits, 1),
+        }
+
+
+# Singleton registry instance
+_registry_instance = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> GenerativeModelRegistry:
+    """Get singleton Gemini model registry"""
+    global _registry_instance
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = GenerativeModelRegistry()
+    return _registry_instance
+
+
+class GeminiUnavailableError(Exception):
+    """Gemini was not called: the circuit breaker is open or the rate limit is used up"""
+
+
+# Process-wide limiter/breaker shared by every thread that calls Gemini
+_rate_limiter_instance = None
+_breaker_instance = None
+_guard_lock = threading.Lock()
+
+
+def get_gemini_rate_limiter() -> TokenBucket:
+    """Get singleton token bucket for Gemini calls"""
+    global _rate_limiter_instance
+    if _rate_limiter_instance is None:
+        with _guard_lock:
+            if _rate_limiter_instance is None:
+                _rate_limiter_instance = TokenBucket(
+                    rate_per_minute=getattr(settings, 'GEMINI_RATE_LIMIT_PER_MINUTE', 30),
+                    burst=getattr(settings, 'GEMINI_RATE_LIMIT_BURST', 10),
+                )
+    return _rate_limiter_instance
+
+
+def get_gemini_breaker() -> CircuitBreaker:
+    """Get singleton circuit breaker for Gemini calls"""
+    global _breaker_instance
+    if _breaker_instance is None:
+        with _guard_lock:
+            if _breaker_instance is None:
+                _breaker_instance = CircuitBreaker(
+                    'gemini',
+                    failure_threshold=getattr(settings, 'GEMINI_BREAKER_FAILURE_THRESHOLD', 5),
+                    reset_seconds=getattr(settings, 'GEMINI_BREAKER_RESET_SECONDS', 30),
+                )
+    return _breaker_instance
+
+
+def reserve_gemini_call():
+    """
+    Check the breaker and take a rate-limit token before calling Gemini.
+    
+    Never waits. The caller must report the outcome with
+    get_gemini_breaker().record_success() / record_failure().
+    
+    Raises:
+        GeminiUnavailableError: If the call should not be made right now
+    """
+    breaker = get_gemini_breaker()
+    if not breaker.allow_request():
+        raise GeminiUnavailableError(
+            f"Gemini circuit open (next probe in {breaker.retry_after():.0f}s)"
+        )
+    if not get_gemini_rate_limiter().try_acquire():
+        breaker.release()
+        raise GeminiUnavailableError("Gemini rate limit reached")
+
+
+# Errors raised when a request runs out of the timeout it was given
+_TIMEOUT_ERRORS = (TimeoutError, google_exceptions.DeadlineExceeded, google_exceptions.RetryError)
+
+
+def is_deadline_cutoff(error: Exception, timeout: Optional[float]) -> bool:
+    """
+    True if 'error' is a request running out of a timeout we imposed.
+    
+    Such cutoffs come from our own request deadline, not from Gemini being
+    unhealthy, so they must not count towards opening the circuit breaker.
+    """
+    if timeout is None:
+        return False
+    if isinstance(error, _TIMEOUT_ERRORS):
+        return True
+    message = str(error).lower()
+    return 'timed out' in message or 'deadline exceeded' in message
+
+
+def guarded_generate_content(model: genai.GenerativeModel, prompt: str, **kwargs):
+    """
+    model.generate_content() behind the shared rate limiter and circuit breaker.
+    
+    Not for stream=True calls, whose errors surface while iterating; those
+    use reserve_gemini_call() and report the outcome themselves. A call cut
+    off by the timeout in request_options frees its breaker slot without
+    counting as a failure.
+    
+    Raises:
+        GeminiUnavailableError: If the call was refused without contacting Gemini
+    """
+    reserve_gemini_call()
+    breaker = get_gemini_breaker()
+    request_options = kwargs.get('request_options')
+    timeout = request_options.get('timeout') if isinstance(request_options, dict) else None
+    try:
+        response = model.generate_content(prompt, **kwargs)
+    except Exception as e:
+        if is_deadline_cutoff(e, timeout):
+            breaker.release()
+        else:
+            breaker.record_failure(e)
+        raise
+    breaker.record_success()
+    return response
+
+
+def get_gemini_guard_stats() -> Dict[str, Any]:
+    """Rate limiter and circuit breaker state for /health/"""
+    return {
+        'rate_limiter': get_gemini_rate_limiter().get_stats(),
+        'circuit_breaker': get_gemini_breaker().get_stats(),
+    }
+
+
+STRATEGY_GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'max_output_tokens': 1500,
+    'response_mime_type': "application/json",
+}
+
+
 class GeminiClient:
     """
     Wrapper for Google Gemini API.
@@ -171,9 +398,10 @@ class GeminiClient:
         
         try:
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(
-                model_name=self.model_name,
+            self.model = get_model_registry().get(
+                self.model_name,
                 system_instruction=MASTER_SYSTEM_PROMPT,
+                generation_config=STRATEGY_GENERATION_CONFIG,
             )
             logger.info(f"Gemini client initialized with model: {self.model_name}")
         except Exception as e:
@@ -222,14 +450,7 @@ class GeminiClient:
         
         try:
             # Generate response
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=1500,
-                    response_mime_type="application/json",
-                ),
-            )
+            response = guarded_generate_content(self.model, prompt)
             
             # Parse JSON response
             response_text = response.text.strip()
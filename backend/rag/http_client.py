@@ -0,0 +1,57 @@
+"""
+Shiksha Saathi - Shared HTTP Client
+Process-wide httpx client with keep-alive (and HTTP/2 when available) for outbound lookups.
+"""
+import logging
+import threading
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (installed via httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# Singleton client instance
+_client_instance = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Get singleton httpx client.
+    
+    httpx.Client is thread-safe, so all worker threads share one connection
+    pool and reuse TLS connections to youtube.com / duckduckgo.com instead of
+    opening a fresh one per lookup.
+    """
+    global _client_instance
+    if _client_instance is None:
+        with _client_lock:
+            if _client_instance is None:
+                http2 = _http2_available()
+                _client_instance = httpx.Client(
+                    http2=http2,
+                    headers=DEFAULT_HEADERS,
+                    timeout=httpx.Timeout(10.0),
+                    follow_redirects=True,
+                    limits=httpx.Limits(
+                        max_connections=32,
+                        max_keepalive_connections=16,
+                        keepalive_expiry=60,
+                    ),
+                )
+                logger.info(f"Shared HTTP client initialized (http2={http2})")
+    return _client_instance
@@ -1,23 +1,284 @@
 """
 Shiksha Saathi - PDF Indexer for RAG
-Indexes the NCF PDF document into ChromaDB for retrieval.
+Indexes the NCF PDF document into the vector store for retrieval.
 """
 import logging
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
 import fitz  # PyMuPDF
-import chromadb
-from chromadb.config import Settings
 from django.conf import settings
+from pypdf import PdfReader
+
+from .chunk_classifier import classify_chunk
+from .dedup import BoilerplateStripper, NearDuplicateIndex, dedup_options, drop_near_duplicates
+from .embeddings import get_embedding_service
+from .manifest import make_chunk_id
+from .sparse_index import BM25Index
+from .vector_store import open_vector_store
 
 logger = logging.getLogger(__name__)
 
 
+# Pages with less text than this (blank, image-only) are not chunked
+MIN_PAGE_CHARS = 50
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield non-empty pages (pypdf) one at a time, so only the current page's text is held.
+
+    This is the extraction behind the shared collection's chunk IDs
+    (SourceChunker); a different extractor would change them.
+
+    Yields:
+        Dicts with 'page_number' and 'text'
+    """
+    reader = PdfReader(pdf_path)
+    for page_num, page in enumerate(reader.pages):
+        text = page.extract_text()
+        if text and text.strip():
+            yield {'page_number': page_num + 1, 'text': text}
+
+
+def chunk_words(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+    """
+    Split text into chunks of chunk_size words, overlapping by overlap words.
+    """
+    words = text.split()
+    chunks = []
+    for i in range(0, len(words), chunk_size - overlap):
+        chunk = ' '.join(words[i:i + chunk_size])
+        if chunk.strip():
+            chunks.append(chunk)
+    return chunks
+
+
+class SourceChunker:
+    """
+    Turns one source's pages into the chunks stored in the shared collection.
+
+    RAGManager.index_pdf and CorpusIndexer both go through this class, so
+    they produce the same chunk IDs, text and metadata for a PDF, and
+    either can re-index a source the other indexed without re-embedding it.
+    Pages are stripped of recurring headers/footers and chunks that
+    duplicate (exactly or nearly) an earlier chunk of the source are
+    dropped, unless dedup is None.
+
+    Usage:
+        chunker = SourceChunker('NCF Document', dedup=dedup_options())
+        for page in chunker.iter_pages(iter_pdf_pages(pdf_path)):
+            for chunk in page['chunks']:
+                ...  # {'id', 'text', 'metadata'}
+    """
+
+    def __init__(
+        self,
+        source: str,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        dedup: Optional[Dict[str, Any]] = None,
+    ):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.stripper = None
+        self.near_duplicates = None
+        if dedup:
+            self.stripper = BoilerplateStripper(
+                min_pages=dedup['boilerplate_min_pages'],
+                min_fraction=dedup['boilerplate_min_fraction'],
+            )
+            self.near_duplicates = NearDuplicateIndex(dedup['max_distance'], dedup['shingle_size'])
+        self._seen = set()
+
+    def iter_pages(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every page with its new chunks.
+
+        Yields:
+            Dicts with 'page_number', 'text' and 'chunks' (each {'id', 'text', 'metadata'};
+            empty for near-blank pages)
+        """
+        if self.stripper is not None:
+            pages = self.stripper.process(pages)
+        for page in pages:
+            page_number, text = page['page_number'], page['text']
+            chunks = []
+            if len(text.strip()) >= MIN_PAGE_CHARS:
+                for chunk in chunk_words(text, self.chunk_size, self.chunk_overlap):
+                    chunk_id = make_chunk_id(self.source, page_number, chunk)
+                    if chunk_id in self._seen:
+                        continue
+                    if self.near_duplicates is not None and self.near_duplicates.add(chunk_id, chunk) is not None:
+                        continue
+                    self._seen.add(chunk_id)
+                    chunks.append({
+                        'id': chunk_id,
+                        'text': chunk,
+                        # 'page' is read by RAGManager.search, 'page_number' by NCFRetriever
+                        'metadata': {
+                            'page': page_number,
+                            'page_number': page_number,
+                            'source': self.source,
+                            **classify_chunk(chunk, text),
+                        },
+                    })
+            yield {'page_number': page_number, 'text': text, 'chunks': chunks}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'lines_removed': self.stripper.lines_removed if self.stripper is not None else 0,
+            'near_duplicates': self.near_duplicates.duplicates if self.near_duplicates is not None else 0,
+        }
+
+
+def extract_pdf_pages(pdf_path: str) -> List[Dict[str, Any]]:
+    """
+    Extract text from PDF with page metadata (PyMuPDF; used by NCFIndexer,
+    which rebuilds its collection from scratch).
+
+    Returns:
+        List of dicts with 'text', 'page_number', 'source'
+    """
+    pdf_path = Path(pdf_path)
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+
+    documents = []
+
+    try:
+        doc = fitz.open(str(pdf_path))
+        logger.info(f"Opened PDF: {pdf_path.name} ({len(doc)} pages)")
+
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            text = page.get_text()
+
+            if text.strip():  # Only add non-empty pages
+                documents.append({
+                    'text': text,
+                    'page_number': page_num + 1,
+                    'source': pdf_path.name,
+                })
+
+        doc.close()
+        logger.info(f"Extracted text from {len(documents)} pages")
+
+    except Exception as e:
+        logger.error(f"Error extracting PDF: {e}")
+        raise
+
+    return documents
+
+
+def chunk_documents(
+    documents: List[Dict[str, Any]],
+    chunk_size: int = 500,
+    chunk_overlap: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Split documents into overlapping chunks for better retrieval.
+
+    Returns:
+        List of chunks with metadata (page, source, chunk index and
+        classify_chunk tags)
+    """
+    chunks = []
+    chunk_id = 0
+
+    for doc in documents:
+        text = doc['text']
+        page_num = doc['page_number']
+        source = doc['source']
+
+        # Split text into chunks
+        start = 0
+        while start < len(text):
+            end = start + chunk_size
+            chunk_text = text[start:end]
+
+            # Try to break at sentence boundary
+            if end < len(text):
+                last_period = chunk_text.rfind('.')
+                last_newline = chunk_text.rfind('\n')
+                break_point = max(last_period, last_newline)
+
+                if break_point > chunk_size * 0.5:
+                    chunk_text = chunk_text[:break_point + 1]
+                    end = start + break_point + 1
+
+            if chunk_text.strip():
+                chunks.append({
+                    'id': f"chunk_{chunk_id}",
+                    'text': chunk_text.strip(),
+                    'metadata': {
+                        'page_number': page_num,
+                        'source': source,
+                        'chunk_index': chunk_id,
+                        **classify_chunk(chunk_text, text),
+                    }
+                })
+                chunk_id += 1
+
+            # Move start with overlap
+            start = end - chunk_overlap
+            if start < 0:
+                start = 0
+            if end >= len(text):
+                break
+
+    logger.info(f"Created {len(chunks)} chunks from {len(documents)} pages")
+    return chunks
+
+
+def chunk_documents_deduplicated(
+    documents: List[Dict[str, Any]],
+    chunk_size: int = 500,
+    chunk_overlap: int = 100,
+    dedup: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    chunk_documents with recurring headers/footers stripped from the pages
+    first and near-duplicate chunks dropped afterwards.
+
+    Args:
+        dedup: Output of dedup_options(); None chunks the pages unchanged
+
+    Returns:
+        (chunks, {'boilerplate_lines', 'lines_removed', 'near_duplicates'})
+    """
+    stats = {'boilerplate_lines': 0, 'lines_removed': 0, 'near_duplicates': 0}
+    if not dedup:
+        return chunk_documents(documents, chunk_size, chunk_overlap), stats
+
+    stripper = BoilerplateStripper(
+        min_pages=dedup['boilerplate_min_pages'],
+        min_fraction=dedup['boilerplate_min_fraction'],
+    )
+    documents = list(stripper.process(documents))
+    chunks, dropped = drop_near_duplicates(
+        chunk_documents(documents, chunk_size, chunk_overlap),
+        dedup['max_distance'],
+        dedup['shingle_size'],
+    )
+    stats.update(
+        boilerplate_lines=len(stripper.boilerplate_lines),
+        lines_removed=stripper.lines_removed,
+        near_duplicates=dropped,
+    )
+    logger.info(
+        f"Dedup: {stats['lines_removed']} header/footer lines stripped, "
+        f"{dropped} near-duplicate chunks dropped"
+    )
+    return chunks, stats
+
+
 class NCFIndexer:
     """
-    Index NCF PDF into ChromaDB for RAG retrieval.
+    Index NCF PDF into the vector store (VECTOR_STORE_BACKEND) for RAG retrieval.
     
     Usage:
         indexer = NCFIndexer()
@@ -35,17 +296,12 @@ class NCFIndexer:
         self.collection_name = collection_name
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.embedder = get_embedding_service()
         
         # Ensure persist directory exists
         Path(self.persist_directory).mkdir(parents=True, exist_ok=True)
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=Settings(anonymized_telemetry=False),
-        )
-        
-        logger.info(f"ChromaDB initialized at: {self.persist_directory}")
+        logger.info(f"Vector store directory: {self.persist_directory}")
     
     def extract_text_from_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
         """
@@ -54,87 +310,19 @@ class NCFIndexer:
         Returns:
             List of dicts with 'text', 'page_number', 'source'
         """
-        pdf_path = Path(pdf_path)
-        if not pdf_path.exists():
-            raise FileNotFoundError(f"PDF not found: {pdf_path}")
-        
-        documents = []
-        
-        try:
-            doc = fitz.open(str(pdf_path))
-            logger.info(f"Opened PDF: {pdf_path.name} ({len(doc)} pages)")
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                
-                if text.strip():  # Only add non-empty pages
-                    documents.append({
-                        'text': text,
-                        'page_number': page_num + 1,
-                        'source': pdf_path.name,
-                    })
-            
-            doc.close()
-            logger.info(f"Extracted text from {len(documents)} pages")
-            
-        except Exception as e:
-            logger.error(f"Error extracting PDF: {e}")
-            raise
-        
-        return documents
+        return extract_pdf_pages(pdf_path)
     
     def create_chunks(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Split documents into overlapping chunks for better retrieval.
         
+        Recurring headers/footers and near-duplicate chunks are removed
+        unless RAG_DEDUP_ENABLED is off.
+        
         Returns:
             List of chunks with metadata
         """
-        chunks = []
-        chunk_id = 0
-        
-        for doc in documents:
-            text = doc['text']
-            page_num = doc['page_number']
-            source = doc['source']
-            
-            # Split text into chunks
-            start = 0
-            while start < len(text):
-                end = start + self.chunk_size
-                chunk_text = text[start:end]
-                
-                # Try to break at sentence boundary
-                if end < len(text):
-                    last_period = chunk_text.rfind('.')
-                    last_newline = chunk_text.rfind('\n')
-                    break_point = max(last_period, last_newline)
-                    
-                    if break_point > self.chunk_size * 0.5:
-                        chunk_text = chunk_text[:break_point + 1]
-                        end = start + break_point + 1
-                
-                if chunk_text.strip():
-                    chunks.append({
-                        'id': f"chunk_{chunk_id}",
-                        'text': chunk_text.strip(),
-                        'metadata': {
-                            'page_number': page_num,
-                            'source': source,
-                            'chunk_index': chunk_id,
-                        }
-                    })
-                    chunk_id += 1
-                
-                # Move start with overlap
-                start = end - self.chunk_overlap
-                if start < 0:
-                    start = 0
-                if end >= len(text):
-                    break
-        
-        logger.info(f"Created {len(chunks)} chunks from {len(documents)} pages")
+        chunks, _ = chunk_documents_deduplicated(documents, self.chunk_size, self.chunk_overlap, dedup_options())
         return chunks
     
     def index_pdf(self, pdf_path: str) -> Dict[str, Any]:
@@ -149,16 +337,12 @@ class NCFIndexer:
         """
         logger.info(f"Starting PDF indexing: {pdf_path}")
         
-        # Delete existing collection if exists
-        try:
-            self.client.delete_collection(self.collection_name)
-            logger.info(f"Deleted existing collection: {self.collection_name}")
-        except Exception:
-            pass
-        
-        # Create new collection
-        collection = self.client.create_collection(
-            name=self.collection_name,
+        # Replace any existing collection with a new one (stamped with the embedding model)
+        store = open_vector_store(
+            self.collection_name,
+            self.persist_directory,
+            self.embedder,
+            recreate=True,
             metadata={"description": "NCF-FS 2022 Document for Shiksha Saathi RAG"}
         )
         
@@ -171,20 +355,31 @@ class NCFIndexer:
         if not chunks:
             raise ValueError("No chunks created from PDF")
         
-        # Add to ChromaDB (it will auto-generate embeddings)
-        collection.add(
+        # Embed with the shared service so queries and documents use the same model
+        texts = [chunk['text'] for chunk in chunks]
+        embeddings = self.embedder.encode(texts)
+        
+        store.add(
             ids=[chunk['id'] for chunk in chunks],
-            documents=[chunk['text'] for chunk in chunks],
+            embeddings=embeddings,
+            documents=texts,
             metadatas=[chunk['metadata'] for chunk in chunks],
         )
+        store.snapshot()
+        
+        # Keep the keyword index used by hybrid search in step with the collection
+        bm25 = BM25Index(self.persist_directory, self.collection_name)
+        bm25.add([chunk['id'] for chunk in chunks], texts)
+        bm25.save()
         
-        logger.info(f"Indexed {len(chunks)} chunks to ChromaDB")
+        logger.info(f"Indexed {len(chunks)} chunks to {store.backend}")
         
         return {
             'success': True,
             'chunks_count': len(chunks),
             'pages_processed': len(documents),
             'collection_name': self.collection_name,
+            'embedding_model': self.embedder.model_name,
         }
 
 
@@ -7,22 +7,103 @@ Migrated from Flask implementation.
 import os
 import json
 import time
+import uuid
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Callable
+from concurrent.futures import wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
 
-import httpx
 import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
-from pypdf import PdfReader
-import chromadb
-from chromadb.config import Settings
+import numpy as np
 from django.conf import settings
 from html.parser import HTMLParser
 
+from .concurrency import Deadline, SingleFlight, get_branch_executor, get_executor, run_branches
+from .http_client import get_http_client
+from .cache import SQLiteTTLCache, SemanticAnswerCache, normalize_query
+from .embeddings import EmbeddingMismatchError, get_embedding_service
+from .manifest import ManifestStore, file_sha256
+from .partitions import LanguagePartitions
+from .numpy_index import NumpyVectorIndex
+from .chunk_classifier import TAGGER_VERSION, build_chunk_filter, collection_fully_tagged, retag_chunks
+from .dedup import dedup_options
+from .indexer import SourceChunker, chunk_words, iter_pdf_pages
+from .context_packer import pack_context
+from .reranker import get_reranker
+from .sparse_index import BM25Index, reciprocal_rank_fusion
+from .vector_store import matches_where, open_vector_store
+from .text_utils import build_youtube_query
+from .streaming import StrategyStreamParser
+from .gemini_client import (
+    GeminiUnavailableError,
+    get_gemini_breaker,
+    get_model_registry,
+    guarded_generate_content,
+    is_deadline_cutoff,
+    reserve_gemini_call,
+)
+
 logger = logging.getLogger(__name__)
 
 
+SOS_SYSTEM_PROMPT = """You are "Shiksha Saathi" - an expert AI Teacher Assistant for Indian school teachers.
+Your goal is to provide IMMEDIATE, ACTIONABLE teaching strategies.
+
+CRITICAL RULES:
+1. Provide EXACTLY 3 strategies in valid JSON format
+2. Each strategy: max 3-4 bullet points, each under 15 words
+3. Start each step with a verb: "Draw", "Ask", "Divide", "Show"
+4. Include time estimate for each strategy
+5. Use materials available in Indian government schools
+
+OUTPUT FORMAT (STRICT JSON):
+{
+  "strategies": [
+    {
+      "title": "Short catchy name",
+      "title_hi": "हिंदी में नाम",
+      "time_minutes": 2,
+      "difficulty": "easy|medium|hard",
+      "steps": ["Step 1", "Step 2", "Step 3"],
+      "materials": ["item1", "item2"],
+      "ncf_alignment": "Brief NCF principle"
+    }
+  ]
+}"""
+
+SOS_GENERATION_CONFIG = {
+    'max_output_tokens': 1200,
+    'temperature': 0.7,
+    'response_mime_type': "application/json",
+}
+
+SOLVE_SYSTEM_PROMPT = """You are an expert school teacher in India.
+Your goal is to solve the given problem step-by-step, clearly and simply.
+
+OUTPUT FORMAT (STRICT JSON):
+{
+  "solution_markdown": "Full solution in markdown format. Use latex for math if needed.",
+  "steps": [
+    {"titile": "Step 1", "content": "Explanation..."},
+    {"title": "Step 2", "content": "Explanation..."}
+  ],
+  "concpet_explanation": "Brief explanation of the underlying concept",
+  "difficulty_level": "Easy|Medium|Hard",
+  "detected_subject": "Math|Science|etc"
+}
+
+GUIDELINES:
+1. Explanation should be student-friendly.
+2. If it's a math problem, show clear calculation steps.
+3. If it's a science problem, explain the concept first.
+4. Use standard Indian curriculum terminology where applicable.
+"""
+
+SOLVE_GENERATION_CONFIG = {
+    'response_mime_type': "application/json",
+    'temperature': 0.4,
+}
+
 
 class DDGHtmlParser(HTMLParser):
     """Simple parser for DuckDuckGo HTML results"""
@@ -82,7 +163,7 @@ class RAGManager:
         self, 
         persist_directory: str = None,
         collection_name: str = "ncf_documents",
-        embedding_model_name: str = 'all-MiniLM-L6-v2',
+        embedding_model_name: Optional[str] = None,
         gemini_api_key: Optional[str] = None
     ):
         """
@@ -90,13 +171,14 @@ class RAGManager:
         
         Args:
             persist_directory: Directory to persist vector database
-            collection_name: Name of the ChromaDB collection
-            embedding_model_name: Name of the sentence-transformers model
+            collection_name: Name of the vector store collection
+            embedding_model_name: Name of the sentence-transformers model (defaults to settings.EMBEDDING_MODEL_NAME)
             gemini_api_key: API key for Google Gemini (optional)
         """
         self.persist_directory = persist_directory or getattr(settings, 'CHROMA_PERSIST_DIRECTORY', './chroma_db')
         self.collection_name = collection_name
         self.gemini_api_key = gemini_api_key or getattr(settings, 'GEMINI_API_KEY', '')
+        self.gemini_model_name = getattr(settings, 'GEMINI_MODEL', 'gemini-2.0-flash')
         
         logger.info(f"Initializing RAG Manager with collection: {collection_name}")
         
@@ -122,23 +204,143 @@ class RAGManager:
         # Ensure persist directory exists
         Path(self.persist_directory).mkdir(parents=True, exist_ok=True)
         
-        # Initialize embedding model (SentenceTransformer for better multilingual support)
-        logger.info(f"Loading embedding model: {embedding_model_name}...")
-        self.embedding_model = SentenceTransformer(embedding_model_name)
+        # Two-level YouTube cache shared by all workers: query -> ranked video IDs, video ID -> oEmbed metadata
+        cache_path = getattr(settings, 'RAG_CACHE_PATH', str(Path(self.persist_directory).parent / 'cache' / 'rag_cache.sqlite3'))
+        self.youtube_search_cache = SQLiteTTLCache(
+            cache_path,
+            namespace='youtube_search',
+            ttl_seconds=getattr(settings, 'YOUTUBE_SEARCH_CACHE_TTL_SECONDS', 6 * 3600),
+            max_entries=getattr(settings, 'YOUTUBE_SEARCH_CACHE_MAX_ENTRIES', 5000),
+        )
+        self.oembed_cache = SQLiteTTLCache(
+            cache_path,
+            namespace='youtube_oembed',
+            ttl_seconds=getattr(settings, 'YOUTUBE_OEMBED_CACHE_TTL_SECONDS', 30 * 86400),
+            max_entries=getattr(settings, 'YOUTUBE_OEMBED_CACHE_MAX_ENTRIES', 50000),
+        )
         
-        # Initialize ChromaDB with persistence
-        self.chroma_client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=Settings(anonymized_telemetry=False)
+        # Semantic cache in front of the Gemini strategy call, shared by all workers
+        self.answer_cache = SemanticAnswerCache(
+            cache_path,
+            threshold=getattr(settings, 'SEMANTIC_CACHE_THRESHOLD', 0.92),
+            ttl_seconds=getattr(settings, 'SEMANTIC_CACHE_TTL_SECONDS', 24 * 3600),
+            max_entries=getattr(settings, 'SEMANTIC_CACHE_MAX_ENTRIES', 2000),
         )
         
-        # Get or create collection
+        # Coalesce identical concurrent work (workshop bursts of the same question)
+        self.sos_flight = SingleFlight('sos')
+        self.youtube_flight = SingleFlight('youtube_search')
+        self.pdf_flight = SingleFlight('pdf_search')
+        
+        # Shared embedding model - the same one NCFIndexer and NCFRetriever use
+        self.embedder = get_embedding_service(embedding_model_name)
+        
+        # Per-source manifests for incremental re-indexing
+        self.manifests = ManifestStore(self.persist_directory)
+        
+        # Get or create collection; a collection built with another model is kept
+        # out of retrieval until it is re-indexed
+        self.embedding_mismatch = None
         try:
-            self.collection = self.chroma_client.get_collection(name=collection_name)
-            logger.info(f"Loaded existing collection: {collection_name} with {self.collection.count()} documents")
-        except Exception:
-            self.collection = self.chroma_client.create_collection(name=collection_name)
-            logger.info(f"Created new collection: {collection_name}")
+            self.store = open_vector_store(collection_name, self.persist_directory, self.embedder)
+            logger.info(f"Loaded {self.store.backend} collection: {collection_name} with {self.store.count()} documents")
+        except EmbeddingMismatchError as e:
+            logger.error(f"❌ {e}")
+            self.embedding_mismatch = str(e)
+            self.store = open_vector_store(collection_name, self.persist_directory, self.embedder, verify=False)
+        
+        # Optional in-process NumPy index over an mmap'd export of the collection
+        self.retrieval_backend = getattr(settings, 'RAG_RETRIEVAL_BACKEND', 'chroma')
+        self.numpy_index = None
+        if self.retrieval_backend == 'numpy':
+            self.numpy_index = NumpyVectorIndex(self.persist_directory, collection_name, **self._numpy_index_options())
+            self._ensure_numpy_index()
+        
+        # BM25 inverted index, maintained with the vector index for hybrid search
+        self.search_mode = getattr(settings, 'RAG_SEARCH_MODE', 'vector')
+        self.bm25 = BM25Index(self.persist_directory, collection_name)
+        self.bm25.load()
+        if self.search_mode == 'hybrid' and not self.embedding_mismatch:
+            count = self.store.count()
+            if count > 0 and self.bm25.count() != count:
+                logger.info(f"BM25 index for {collection_name} is missing or stale - rebuilding")
+                self.bm25.rebuild_from_store(self.store)
+        
+        # Optional per-language collections derived from this one, searched by query language
+        self.partitions = None
+        languages = getattr(settings, 'RAG_LANGUAGE_PARTITIONS', [])
+        if languages and not self.embedding_mismatch:
+            self.partitions = LanguagePartitions(
+                self.persist_directory,
+                collection_name,
+                languages,
+                self.embedder,
+                models=getattr(settings, 'RAG_PARTITION_EMBEDDING_MODELS', {}),
+                min_results=getattr(settings, 'RAG_PARTITION_MIN_RESULTS', 2),
+                numpy_index=self._numpy_index_options() if self.retrieval_backend == 'numpy' else None,
+            )
+            if self.partitions.count() != self.store.count():
+                logger.info(f"Language partitions of {collection_name} are missing or stale - syncing")
+                self.partitions.sync(self.store)
+        
+        # Grade/subject filters apply once the collection carries chunk tags
+        self._tagged_state = (False, float('-inf'))
+        
+        # Optional cross-encoder rerank of over-fetched candidates
+        self.reranker = get_reranker() if getattr(settings, 'RAG_RERANK_ENABLED', False) else None
+        
+        # Header/footer stripping and near-duplicate removal while indexing (None = off)
+        self.dedup = dedup_options()
+    
+    @staticmethod
+    def _numpy_index_options() -> Dict[str, Any]:
+        """NumpyVectorIndex settings shared by the collection and its language partitions"""
+        return {
+            'dtype': getattr(settings, 'RAG_NUMPY_INDEX_DTYPE', 'float32'),
+            'rerank_candidates': getattr(settings, 'RAG_NUMPY_RERANK_CANDIDATES', 50),
+        }
+    
+    def _ensure_numpy_index(self):
+        """Load the NumPy index, rebuilding it if it is missing or out of date"""
+        if self.embedding_mismatch:
+            return
+        index = self.numpy_index
+        index.load()
+        count = self.store.count()
+        if (
+            index.info.get('count') != count
+            or index.info.get('embedding_model') != self.embedder.model_name
+        ) and count > 0:
+            logger.info(f"NumPy index for {self.collection_name} is missing or stale - rebuilding")
+            self.rebuild_numpy_index()
+    
+    def rebuild_numpy_index(self) -> Optional[Dict]:
+        """
+        Re-export the collection into the NumPy index (no-op unless that backend is enabled).
+        
+        Returns:
+            The index info, or None if the NumPy backend is not enabled
+        """
+        if self.numpy_index is None:
+            return None
+        try:
+            return self.numpy_index.build_from_store(self.store, embedding_model=self.embedder.model_name)
+        except Exception as e:
+            # Search falls back to ChromaDB while the index is unavailable
+            logger.error(f"❌ Failed to build NumPy index: {type(e).__name__}: {e}")
+            return None
+    
+    def _iter_pdf_pages(self, pdf_path: str) -> Iterator[Dict]:
+        """
+        Yield non-empty pages one at a time, so only the current page's text is held.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Yields:
+            Dictionaries with page_number and text
+        """
+        return iter_pdf_pages(pdf_path)
     
     def _extract_text_from_pdf(self, pdf_path: str) -> List[Dict]:
         """
@@ -150,17 +352,7 @@ class RAGManager:
         Returns:
             List of dictionaries with page_number and text
         """
-        reader = PdfReader(pdf_path)
-        pages_text = []
-        
-        for page_num, page in enumerate(reader.pages):
-            text = page.extract_text()
-            if text and text.strip():
-                pages_text.append({
-                    'page_number': page_num + 1,
-                    'text': text
-                })
-        
+        pages_text = list(self._iter_pdf_pages(pdf_path))
         logger.info(f"Extracted text from {len(pages_text)} pages")
         return pages_text
     
@@ -181,145 +373,474 @@ class RAGManager:
         Returns:
             List of text chunks
         """
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if len(chunk.strip()) > 0:
-                chunks.append(chunk)
-        
-        return chunks
+        return chunk_words(text, chunk_size, overlap)
     
     def index_pdf(
         self, 
         pdf_path: str, 
         source_name: str = "NCF Document",
-        force_reindex: bool = False
+        force_reindex: bool = False,
+        batch_size: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        staged: bool = False,
+        should_cancel: Optional[Callable[[], bool]] = None
     ) -> Dict:
         """
-        Index a PDF document into the vector database.
+        Index (or incrementally re-index) a PDF document into the vector database.
+        
+        Chunk IDs are derived from (source, page, content hash), so re-indexing
+        only embeds new or changed chunks and deletes chunks that disappeared.
+        If the file hash matches the source's manifest, nothing is extracted or
+        embedded at all. Several sources can share the collection.
+        
+        Pages are read, chunked, embedded and added in fixed-size batches, so
+        peak memory depends on the batch size rather than the document size.
+        
+        Unless self.dedup is None, header/footer lines recurring across pages
+        are stripped before chunking and a chunk that near-duplicates one
+        already kept from this document is not indexed.
+        
+        A run that re-reads the PDF clears the semantic answer cache in every
+        worker, since cached answers were built from the previous context.
+        
+        With staged=True, new embeddings are written to a temporary staging
+        collection and only copied into the live collection (with orphan
+        deletes and the manifest update) once everything succeeded, so
+        searches keep using the old index until the commit.
         
         Args:
             pdf_path: Path to the PDF file
             source_name: Name to identify the document source
-            force_reindex: If True, re-index even if collection has documents
+            force_reindex: If True, re-embed every chunk of this source even if unchanged
+            batch_size: Chunks per embed/add batch (defaults to settings.INDEX_BATCH_SIZE)
+            progress_callback: Called after each batch with pages/chunks/batches/elapsed_s
+            staged: Build in a staging collection and commit at the end
+            should_cancel: Polled between pages; returning True abandons the run
             
         Returns:
-            Dictionary with indexing statistics
+            Dictionary with indexing statistics ('status' is 'cancelled' if abandoned)
         """
         logger.info(f"Indexing PDF: {pdf_path}")
+        start = time.perf_counter()
+        
+        if self.embedding_mismatch:
+            if not force_reindex:
+                return {
+                    'status': 'error',
+                    'reason': 'embedding_model_mismatch',
+                    'detail': self.embedding_mismatch,
+                    'document_count': self.store.count()
+                }
+            # Vectors from another model cannot be reused - start the collection over
+            logger.info("Force reindex - recreating collection built with another embedding model")
+            self.store = open_vector_store(self.collection_name, self.persist_directory, self.embedder, recreate=True)
+            self.bm25.clear()
+            self.manifests.clear(self.collection_name)
+            self.embedding_mismatch = None
         
-        # Check if already indexed
-        if self.collection.count() > 0 and not force_reindex:
-            count = self.collection.count()
-            logger.info(f"Collection already has {count} documents. Skipping indexing.")
+        # Unchanged file: hashing is the whole cost
+        file_hash = file_sha256(pdf_path)
+        manifest = self.manifests.load(self.collection_name, source_name)
+        if (
+            manifest and not force_reindex
+            and manifest.get('file_sha256') == file_hash
+            and manifest.get('embedding_model') == self.embedder.model_name
+            and manifest.get('dedup') == self.dedup
+            and manifest.get('tagger') == TAGGER_VERSION
+        ):
+            logger.info(f"'{source_name}' unchanged since last index ({len(manifest['chunk_ids'])} chunks). Skipping.")
             return {
-                'status': 'skipped',
-                'reason': 'already_indexed',
-                'document_count': count
+                'status': 'unchanged',
+                'chunks_count': len(manifest['chunk_ids']),
+                'pages': manifest.get('pages', 0),
+                'source': source_name,
+                'added': 0,
+                'deleted': 0,
+                'elapsed_s': round(time.perf_counter() - start, 2)
             }
         
-        # Force reindex - delete existing
-        if force_reindex and self.collection.count() > 0:
-            logger.info("Force reindex - deleting existing collection")
-            self.chroma_client.delete_collection(self.collection_name)
-            self.collection = self.chroma_client.create_collection(name=self.collection_name)
-        
-        # Extract text from PDF
-        pages = self._extract_text_from_pdf(pdf_path)
-        
-        # Process and store chunks
-        all_chunks = []
-        all_metadatas = []
-        all_ids = []
-        
-        chunk_id = 0
-        for page_data in pages:
-            page_num = page_data['page_number']
-            text = page_data['text']
-            
-            # Skip empty pages
-            if len(text.strip()) < 50:
-                continue
-            
-            # Create chunks
-            chunks = self._chunk_text(text)
-            
-            for chunk in chunks:
-                all_chunks.append(chunk)
-                all_metadatas.append({
-                    'page': page_num,
-                    'source': source_name
-                })
-                all_ids.append(f"chunk_{chunk_id}")
-                chunk_id += 1
+        # Chunk IDs this source currently owns (manifest, or the collection for pre-manifest indexes)
+        if manifest:
+            existing_ids = set(manifest.get('chunk_ids', []))
+        else:
+            existing_ids = set(self.store.get(where={'source': source_name})['ids'])
         
-        if not all_chunks:
-            return {
-                'status': 'error',
-                'reason': 'no_chunks_created',
-                'document_count': 0
-            }
+        batch_size = batch_size or getattr(settings, 'INDEX_BATCH_SIZE', 64)
+        progress = {
+            'pages_processed': 0,
+            'chunks_indexed': 0,
+            'chunks_unchanged': 0,
+            'chunks_retagged': 0,
+            'batches': 0,
+            'elapsed_s': 0.0,
+        }
         
-        # Generate embeddings using SentenceTransformer
-        logger.info(f"Generating embeddings for {len(all_chunks)} chunks...")
-        embeddings = self.embedding_model.encode(all_chunks).tolist()
+        batch_texts = []
+        batch_metadatas = []
+        batch_ids = []
+        seen_ids = set()
+        # Unchanged chunks tagged by an older classifier (or not at all) get their tags rewritten
+        retag = not manifest or manifest.get('tagger') != TAGGER_VERSION
+        retag_batch = {}
         
-        # Add to ChromaDB
-        self.collection.add(
-            embeddings=embeddings,
-            documents=all_chunks,
-            metadatas=all_metadatas,
-            ids=all_ids
-        )
+        write_store = self.store
+        if staged:
+            write_store = open_vector_store(
+                f"{self.collection_name}__staging_{uuid.uuid4().hex[:8]}",
+                self.persist_directory,
+                self.embedder,
+                recreate=True,
+            )
+        
+        def flush_batch():
+            # Embed and store one batch, then drop it so memory stays flat
+            embeddings = self.embedder.encode(batch_texts).tolist()
+            write_store.add(
+                ids=batch_ids,
+                embeddings=embeddings,
+                documents=batch_texts,
+                metadatas=batch_metadatas
+            )
+            if not staged:
+                self.bm25.add(batch_ids, batch_texts)
+            progress['chunks_indexed'] += len(batch_texts)
+            progress['batches'] += 1
+            progress['elapsed_s'] = round(time.perf_counter() - start, 2)
+            batch_texts.clear()
+            batch_metadatas.clear()
+            batch_ids.clear()
+            
+            if progress_callback:
+                progress_callback(dict(progress))
+            if progress['batches'] % 10 == 0:
+                logger.info(
+                    f"   ... {progress['pages_processed']} pages, {progress['chunks_indexed']} chunks "
+                    f"({progress['elapsed_s']}s)"
+                )
+        
+        # Same extraction and chunking as CorpusIndexer, so both produce the same chunk IDs
+        chunker = SourceChunker(source_name, dedup=self.dedup)
         
-        logger.info(f"Successfully indexed {len(all_chunks)} chunks from {len(pages)} pages")
+        def flush_retag():
+            progress['chunks_retagged'] += retag_chunks(self.store, retag_batch, target=write_store)
+            retag_batch.clear()
+        
+        try:
+            # Stream pages -> chunks -> fixed-size embedding batches
+            for page_data in chunker.iter_pages(self._iter_pdf_pages(pdf_path)):
+                if should_cancel and should_cancel():
+                    logger.info(f"🛑 Indexing of '{source_name}' cancelled after {progress['pages_processed']} pages")
+                    return {
+                        'status': 'cancelled',
+                        'pages': progress['pages_processed'],
+                        'source': source_name,
+                        'added': 0 if staged else progress['chunks_indexed'],
+                        'elapsed_s': round(time.perf_counter() - start, 2)
+                    }
+                
+                progress['pages_processed'] += 1
+                
+                for chunk in page_data['chunks']:
+                    chunk_id = chunk['id']
+                    seen_ids.add(chunk_id)
+                    
+                    if chunk_id in existing_ids and not force_reindex:
+                        progress['chunks_unchanged'] += 1
+                        if retag:
+                            retag_batch[chunk_id] = chunk['metadata']
+                            if len(retag_batch) >= batch_size:
+                                flush_retag()
+                        continue
+                    
+                    batch_texts.append(chunk['text'])
+                    batch_metadatas.append(chunk['metadata'])
+                    batch_ids.append(chunk_id)
+                    
+                    if len(batch_texts) >= batch_size:
+                        flush_batch()
+            
+            if batch_texts:
+                flush_batch()
+            if retag_batch:
+                flush_retag()
+            
+            if not seen_ids:
+                return {
+                    'status': 'error',
+                    'reason': 'no_chunks_created',
+                    'document_count': 0
+                }
+            
+            if staged:
+                self._commit_staging(write_store, batch_size)
+            
+            # Chunks that no longer exist in the document (including legacy chunk_N IDs)
+            orphan_ids = sorted(existing_ids - seen_ids)
+            for i in range(0, len(orphan_ids), batch_size):
+                self.store.delete(ids=orphan_ids[i:i + batch_size])
+            self.bm25.delete(orphan_ids)
+            
+            # Persist before the manifest claims the chunks exist (no-op for ChromaDB)
+            self.store.snapshot()
+            self.bm25.save()
+            
+            self.manifests.save(self.collection_name, source_name, {
+                'file_sha256': file_hash,
+                'embedding_model': self.embedder.model_name,
+                'pages': progress['pages_processed'],
+                'chunk_ids': sorted(seen_ids),
+                'dedup': self.dedup,
+                'tagger': TAGGER_VERSION,
+            })
+        finally:
+            if staged:
+                write_store.drop()
+        
+        if progress['chunks_indexed'] or progress['chunks_retagged'] or orphan_ids:
+            self.rebuild_numpy_index()
+            if self.partitions is not None:
+                self.partitions.sync(self.store)
+            self._tagged_state = (False, float('-inf'))
+        
+        # Cached answers were built from the old context (clears every worker's view)
+        invalidated = self.answer_cache.clear()
+        if invalidated:
+            logger.info(f"🧹 Invalidated {invalidated} cached answers after indexing '{source_name}'")
+        
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Indexed '{source_name}': {progress['chunks_indexed']} embedded, {progress['chunks_unchanged']} unchanged, "
+            f"{len(orphan_ids)} deleted from {progress['pages_processed']} pages in {progress['batches']} batches ({elapsed:.1f}s)"
+        )
+        if self.dedup:
+            logger.info(
+                f"   Dedup: {chunker.stats['lines_removed']} header/footer lines stripped, "
+                f"{chunker.stats['near_duplicates']} near-duplicate chunks dropped"
+            )
         
         return {
             'status': 'success',
-            'chunks_count': len(all_chunks),
-            'pages': len(pages),
-            'source': source_name
+            'chunks_count': len(seen_ids),
+            'pages': progress['pages_processed'],
+            'source': source_name,
+            'added': progress['chunks_indexed'],
+            'unchanged': progress['chunks_unchanged'],
+            'retagged': progress['chunks_retagged'],
+            'deleted': len(orphan_ids),
+            'near_duplicates': chunker.stats['near_duplicates'],
+            'boilerplate_lines_removed': chunker.stats['lines_removed'],
+            'batches': progress['batches'],
+            'batch_size': batch_size,
+            'elapsed_s': round(elapsed, 2),
+            'chunks_per_s': round(progress['chunks_indexed'] / elapsed, 1) if elapsed else 0.0
         }
     
-    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+    def _commit_staging(self, staging, batch_size: int):
+        """Copy every vector from a staging store into the live collection"""
+        total = staging.count()
+        logger.info(f"Committing {total} staged chunks into {self.collection_name}")
+        
+        for offset in range(0, total, batch_size):
+            page = staging.get(limit=batch_size, offset=offset, include_embeddings=True)
+            if not page['ids']:
+                break
+            self.store.add(
+                ids=page['ids'],
+                embeddings=page['embeddings'],
+                documents=page['documents'],
+                metadatas=page['metadatas']
+            )
+            self.bm25.add(page['ids'], page['documents'])
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        mode: Optional[str] = None,
+        rerank: Optional[bool] = None,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
         """
         Search the knowledge base for relevant content.
         
         Args:
             query: Search query text
             top_k: Number of top results to return
+            query_embedding: Precomputed embedding of the query (skips encoding)
+            mode: 'vector' or 'hybrid' (BM25 + vector, fused with reciprocal rank
+                  fusion); defaults to settings.RAG_SEARCH_MODE
+            rerank: Rescore over-fetched candidates with the cross-encoder
+                    (defaults to on when settings.RAG_RERANK_ENABLED)
+            where: Metadata filter applied before similarity search
+                   (e.g. from chunk_classifier.build_chunk_filter)
             
         Returns:
             List of dictionaries with text, page, source, and relevance_score
+            (hybrid results also carry rrf_score, keyword_score and keyword_match;
+            reranked results carry rerank_score)
         """
-        if self.collection.count() == 0:
+        if self.embedding_mismatch:
             return []
         
-        # Generate query embedding using SentenceTransformer
-        query_embedding = self.embedding_model.encode([query])[0].tolist()
+        use_numpy = self.numpy_index is not None and self.numpy_index.embeddings is not None
+        if not use_numpy and self.store.count() == 0:
+            return []
         
-        # Search in ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        mode = mode or self.search_mode
+        use_rerank = self.reranker is not None and rerank is not False
+        keep = max(top_k, getattr(settings, 'RAG_RERANK_CANDIDATES', 30)) if use_rerank else top_k
+        fetch = max(keep, getattr(settings, 'RAG_HYBRID_CANDIDATES', 20)) if mode == 'hybrid' else keep
+        
+        # Generate query embedding with the shared embedding service
+        if query_embedding is None:
+            query_embedding = self.embedder.encode_query(query)
+        
+        if self.partitions is not None:
+            # Query's own language partition first, the others only when recall is low;
+            # each partition has its own NumPy index when that backend is enabled
+            hits, _ = self.partitions.query(query, fetch, query_embedding=query_embedding, where=where)
+        elif use_numpy:
+            self.numpy_index.refresh_if_changed()
+            hits = self.numpy_index.query(query_embedding, fetch, where=where)
+        else:
+            hits = self.store.query(query_embedding, fetch, where=where)
+        
+        if mode == 'hybrid':
+            hits = self._fuse_keyword_hits(query, query_embedding, hits, keep, where)
+        if use_rerank:
+            # Falls back to the vector/fused order when the latency budget runs out
+            hits = self.reranker.rerank(query, hits, top_k)
+        hits = hits[:top_k]
         
         # Format results
         formatted_results = []
-        if results['documents'] and len(results['documents'][0]) > 0:
-            for i, doc in enumerate(results['documents'][0]):
-                distance = results['distances'][0][i] if results['distances'] else 1.0
-                formatted_results.append({
-                    'text': doc,
-                    'page': results['metadatas'][0][i]['page'],
-                    'source': results['metadatas'][0][i]['source'],
-                    'relevance_score': 1 - distance  # Convert distance to similarity
-                })
+        for hit in hits:
+            metadata = hit['metadata']
+            result = {
+                'id': hit['id'],
+                'text': hit['text'],
+                # NCFIndexer stores 'page_number', index_pdf stores 'page'
+                'page': metadata.get('page', metadata.get('page_number')),
+                'source': metadata.get('source', 'NCF Document'),
+                'relevance_score': hit['relevance_score']
+            }
+            if mode == 'hybrid':
+                result['rrf_score'] = hit['rrf_score']
+                result['keyword_score'] = hit['keyword_score']
+                result['keyword_match'] = hit['keyword_score'] >= getattr(settings, 'RAG_HYBRID_MIN_KEYWORD_SCORE', 2.0)
+            if 'rerank_score' in hit:
+                result['rerank_score'] = hit['rerank_score']
+            formatted_results.append(result)
         
         return formatted_results
     
+    def _fuse_keyword_hits(
+        self,
+        query: str,
+        query_embedding,
+        vector_hits: List[Dict],
+        top_k: int,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Fuse vector hits with BM25 hits by reciprocal rank fusion.
+        
+        Keyword-only hits are fetched from the store and given their vector
+        relevance too, so every result carries the same score fields. With a
+        metadata filter they are fetched before fusion and dropped unless
+        they match it.
+        """
+        keyword_hits = self.bm25.search(query, top_k=max(top_k, len(vector_hits)))
+        by_id = {hit['id']: hit for hit in vector_hits}
+        if where:
+            by_id.update(self._keyword_only_hits(
+                [chunk_id for chunk_id, _ in keyword_hits if chunk_id not in by_id], query_embedding
+            ))
+            keyword_hits = [
+                (chunk_id, score) for chunk_id, score in keyword_hits
+                if chunk_id in by_id and matches_where(by_id[chunk_id]['metadata'], where)
+            ]
+        
+        keyword_scores = dict(keyword_hits)
+        fused = reciprocal_rank_fusion(
+            [[hit['id'] for hit in vector_hits], [chunk_id for chunk_id, _ in keyword_hits]],
+            k=getattr(settings, 'RAG_HYBRID_RRF_K', 60),
+        )[:top_k]
+        
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+        if missing:
+            by_id.update(self._keyword_only_hits(missing, query_embedding))
+        
+        return [
+            {**by_id[chunk_id], 'rrf_score': rrf_score, 'keyword_score': keyword_scores.get(chunk_id, 0.0)}
+            for chunk_id, rrf_score in fused
+            if chunk_id in by_id
+        ]
+    
+    def _keyword_only_hits(self, ids: List[str], query_embedding) -> Dict[str, Dict]:
+        """Hits (with vector relevance) for chunks found only by keyword search"""
+        if not ids:
+            return {}
+        page = self.store.get(ids=ids, include_embeddings=True)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        hits = {}
+        for chunk_id, text, metadata, vector in zip(page['ids'], page['documents'], page['metadatas'], page['embeddings']):
+            similarity = float(np.dot(vector, query_vector) / max(float(np.linalg.norm(vector)), 1e-12))
+            hits[chunk_id] = {
+                'id': chunk_id,
+                'text': text,
+                'metadata': metadata or {},
+                'relevance_score': 2 * similarity - 1,
+            }
+        return hits
+    
+    def _chunks_tagged(self) -> bool:
+        """
+        Whether every chunk in the collection carries classify_chunk tags.
+        
+        Chunks indexed before tagging have none and grade/subject filters
+        would drop them, so filtering waits until re-indexing has tagged them
+        all. A negative answer is re-checked once a minute, so a re-index by
+        another worker is picked up.
+        """
+        tagged, checked_at = self._tagged_state
+        if tagged or time.monotonic() - checked_at < 60:
+            return tagged
+        try:
+            tagged = collection_fully_tagged(self.store)
+        except Exception as e:
+            logger.warning(f"Could not check chunk tags: {e}")
+            tagged = False
+        self._tagged_state = (tagged, time.monotonic())
+        return tagged
+    
+    def flush_caches(self, caches: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Flush response caches (admin action).
+        
+        Args:
+            caches: Which caches to flush - 'semantic' and/or 'youtube' (default: all)
+            
+        All caches live in the shared SQLite file, so this flushes (and counts)
+        the entries of every worker process.
+        
+        Returns:
+            Mapping of cache name -> entries removed
+        """
+        caches = caches or ['semantic', 'youtube']
+        flushed = {}
+        
+        if 'semantic' in caches:
+            flushed['semantic_answers'] = self.answer_cache.clear()
+        if 'youtube' in caches:
+            flushed['youtube_search'] = self.youtube_search_cache.clear()
+            flushed['youtube_oembed'] = self.oembed_cache.clear()
+        
+        logger.info(f"🧹 Flushed caches: {flushed}")
+        return flushed
+    
     def get_stats(self) -> Dict:
         """
         Get statistics about the indexed documents.
@@ -327,14 +848,37 @@ class RAGManager:
         Returns:
             Dictionary with collection statistics
         """
-        count = self.collection.count()
+        count = self.store.count()
         return {
             'collection_name': self.collection_name,
             'document_count': count,
-            'is_ready': count > 0
+            'is_ready': count > 0 and not self.embedding_mismatch,
+            'sources': self.manifests.list_sources(self.collection_name),
+            'embedding': {**self.embedder.get_stats(), 'mismatch': self.embedding_mismatch},
+            'vector_store': self.store.get_stats(),
+            'retrieval': {
+                'backend': self.retrieval_backend,
+                'search_mode': self.search_mode,
+                'filter_by_class': getattr(settings, 'RAG_FILTER_BY_CLASS', True) and self._tagged_state[0],
+                'bm25': self.bm25.get_stats(),
+                'reranker': self.reranker.get_stats() if self.reranker else None,
+                'language_partitions': self.partitions.get_stats() if self.partitions else None,
+                'numpy_index': self.numpy_index.get_stats() if self.numpy_index else None,
+            },
+            'caches': {
+                'youtube_search': self.youtube_search_cache.get_stats(),
+                'youtube_oembed': self.oembed_cache.get_stats(),
+                'semantic_answers': self.answer_cache.get_stats(),
+            },
+            'gemini_models': get_model_registry().get_stats(),
+            'single_flight': {
+                'sos': self.sos_flight.get_stats(),
+                'youtube_search': self.youtube_flight.get_stats(),
+                'pdf_search': self.pdf_flight.get_stats(),
+            }
         }
     
-    def get_youtube_videos(self, query: str, limit: int = 5) -> List[Dict]:
+    def get_youtube_videos(self, query: str, limit: int = 5, timeout: Optional[float] = None) -> List[Dict]:
         """
         Search for relevant YouTube videos using direct web scraping.
         Returns the top 'limit' playable videos.
@@ -342,78 +886,50 @@ class RAGManager:
         Args:
             query: Search query for YouTube
             limit: Maximum number of videos to return
+            timeout: Seconds the whole lookup may take (scrape + oEmbed)
             
         Returns:
             List of video dictionaries with id, title, thumbnail, link, channel, duration
         """
+        budget = Deadline(timeout) if timeout is not None else None
+        if budget and budget.expired():
+            logger.warning(f"⏱️ No time left for YouTube search: {query}")
+            return []
+        videos, shared = self.youtube_flight.do(
+            ('youtube', normalize_query(query), limit),
+            lambda: self._search_youtube_videos(query, limit, budget),
+            wait_timeout=timeout,
+        )
+        if shared:
+            logger.info(f"🤝 Reused in-flight YouTube search for: {query}")
+        return videos
+    
+    def _search_youtube_videos(self, query: str, limit: int, budget: Optional[Deadline]) -> List[Dict]:
+        """Uncoalesced YouTube lookup behind get_youtube_videos"""
         videos = []
+        if budget and budget.expired():
+            return videos
         
         try:
-            import re
-            import urllib.parse
-            
             logger.info(f"🎥 Searching YouTube for: {query}")
             
-            # URL encode the query
-            encoded_query = urllib.parse.quote(query)
-            search_url = f"https://www.youtube.com/results?search_query={encoded_query}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept-Language': 'en-US,en;q=0.9',
-            }
-            
-            response = httpx.get(search_url, headers=headers, timeout=10, follow_redirects=True)
-            
-            if response.status_code != 200:
-                logger.warning(f"YouTube search returned status {response.status_code}")
-                return videos
-            
-            html_content = response.text
-            
-            # Extract video IDs from the page using regex
-            # YouTube embeds video data in the page as JSON
-            video_id_pattern = r'"videoId":"([a-zA-Z0-9_-]{11})"'
-            title_pattern = r'"title":\{"runs":\[\{"text":"([^"]+)"\}\]'
-            
-            video_ids = re.findall(video_id_pattern, html_content)
-            
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_video_ids = []
-            for vid in video_ids:
-                if vid not in seen:
-                    seen.add(vid)
-                    unique_video_ids.append(vid)
+            cache_key = normalize_query(query)
+            unique_video_ids = self.youtube_search_cache.get(cache_key)
             
-            logger.debug(f"   Found {len(unique_video_ids)} unique video IDs")
+            if unique_video_ids is None:
+                scrape_timeout = min(10, budget.remaining()) if budget else 10
+                if scrape_timeout <= 0:
+                    return videos
+                unique_video_ids = self._scrape_youtube_video_ids(query, timeout=scrape_timeout)
+                if unique_video_ids is None:
+                    return videos
+                if unique_video_ids:
+                    self.youtube_search_cache.set(cache_key, unique_video_ids)
+            else:
+                logger.debug(f"   Search cache hit: {len(unique_video_ids)} video IDs")
             
             # Get video details using oEmbed API (reliable and free)
-            for video_id in unique_video_ids[:limit * 2]:  # Get more to account for failures
-                if len(videos) >= limit:
-                    break
-                    
-                try:
-                    oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-                    oembed_response = httpx.get(oembed_url, timeout=3)
-                    
-                    if oembed_response.status_code == 200:
-                        oembed_data = oembed_response.json()
-                        videos.append({
-                            'id': video_id,
-                            'title': oembed_data.get('title', 'Unknown'),
-                            'thumbnail': f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg",
-                            'link': f"https://www.youtube.com/watch?v={video_id}",
-                            'channel': oembed_data.get('author_name', 'Unknown'),
-                            'duration': 'Unknown'  # oEmbed doesn't provide duration
-                        })
-                        logger.debug(f"   ✅ Added video: {oembed_data.get('title', video_id)[:40]}...")
-                    else:
-                        logger.debug(f"   Skipping {video_id}: Not embeddable")
-                        
-                except Exception as e:
-                    logger.debug(f"   Error fetching video {video_id}: {e}")
-                    continue
+            videos = self._resolve_embeddable_videos(unique_video_ids[:limit * 2], limit, budget)  # Get more to account for failures
             
             logger.info(f"✅ YouTube search found {len(videos)} embeddable videos")
             
@@ -422,10 +938,166 @@ class RAGManager:
         
         return videos
     
+    def _scrape_youtube_video_ids(self, query: str, timeout: float = 10) -> Optional[List[str]]:
+        """
+        Scrape the YouTube results page for ranked video IDs.
+        
+        Returns:
+            Unique video IDs in rank order, or None if the page could not be fetched
+        """
+        import re
+        import urllib.parse
+        
+        # URL encode the query
+        encoded_query = urllib.parse.quote(query)
+        search_url = f"https://www.youtube.com/results?search_query={encoded_query}"
+        
+        response = get_http_client().get(search_url, timeout=timeout)
+        
+        if response.status_code != 200:
+            logger.warning(f"YouTube search returned status {response.status_code}")
+            return None
+        
+        # Extract video IDs from the page using regex
+        # YouTube embeds video data in the page as JSON
+        video_id_pattern = r'"videoId":"([a-zA-Z0-9_-]{11})"'
+        video_ids = re.findall(video_id_pattern, response.text)
+        
+        # Remove duplicates while preserving order
+        seen = set()
+        unique_video_ids = []
+        for vid in video_ids:
+            if vid not in seen:
+                seen.add(vid)
+                unique_video_ids.append(vid)
+        
+        logger.debug(f"   Found {len(unique_video_ids)} unique video IDs")
+        return unique_video_ids
+    
+    def _fetch_oembed(self, video_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Look up a single video via YouTube oEmbed.
+        
+        Returns:
+            Video dictionary, or None if the video is not embeddable
+        """
+        cached = self.oembed_cache.get(video_id)
+        if cached is not None:
+            return cached.get('video')
+        if timeout is not None and timeout <= 0:
+            return None
+        
+        oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
+        default_timeout = getattr(settings, 'YOUTUBE_OEMBED_TIMEOUT_SECONDS', 3)
+        oembed_response = get_http_client().get(
+            oembed_url,
+            timeout=min(default_timeout, timeout) if timeout is not None else default_timeout
+        )
+        
+        if oembed_response.status_code != 200:
+            logger.debug(f"   Skipping {video_id}: Not embeddable")
+            # Remember definite "not embeddable / gone" answers, but not transient failures
+            if oembed_response.status_code in (401, 403, 404):
+                self.oembed_cache.set(video_id, {'video': None})
+            return None
+        
+        oembed_data = oembed_response.json()
+        video = {
+            'id': video_id,
+            'title': oembed_data.get('title', 'Unknown'),
+            'thumbnail': f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg",
+            'link': f"https://www.youtube.com/watch?v={video_id}",
+            'channel': oembed_data.get('author_name', 'Unknown'),
+            'duration': 'Unknown'  # oEmbed doesn't provide duration
+        }
+        self.oembed_cache.set(video_id, {'video': video})
+        return video
+    
+    def _resolve_embeddable_videos(
+        self,
+        video_ids: List[str],
+        limit: int,
+        budget: Optional[Deadline] = None
+    ) -> List[Dict]:
+        """
+        Resolve oEmbed metadata for candidate videos concurrently.
+        
+        At most YOUTUBE_OEMBED_CONCURRENCY lookups are in flight per call. As soon
+        as 'limit' embeddable videos are confirmed, lookups that have not started
+        are cancelled; the same happens when the budget runs out. Results keep
+        the original search ranking.
+        
+        Args:
+            video_ids: Candidate video IDs in search-rank order
+            limit: Number of embeddable videos wanted
+            budget: Optional deadline for the whole fan-out
+            
+        Returns:
+            Up to 'limit' video dictionaries
+        """
+        executor = get_executor(getattr(settings, 'YOUTUBE_OEMBED_POOL_SIZE', 16), pool="oembed")
+        concurrency = max(1, getattr(settings, 'YOUTUBE_OEMBED_CONCURRENCY', 6))
+        
+        candidates = iter(enumerate(video_ids))
+        pending = {}
+        confirmed = []
+        
+        def submit_next() -> bool:
+            try:
+                rank, video_id = next(candidates)
+            except StopIteration:
+                return False
+            timeout = budget.remaining() if budget else None
+            pending[executor.submit(self._fetch_oembed, video_id, timeout)] = (rank, video_id)
+            return True
+        
+        for _ in range(concurrency):
+            if not submit_next():
+                break
+        
+        while pending and len(confirmed) < limit:
+            if budget and budget.expired():
+                logger.debug(f"   oEmbed budget exhausted with {len(pending)} lookups pending")
+                break
+            done, _ = wait(pending, timeout=budget.remaining() if budget else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                rank, video_id = pending.pop(future)
+                try:
+                    video = future.result()
+                except Exception as e:
+                    logger.debug(f"   Error fetching video {video_id}: {e}")
+                    video = None
+                
+                if video:
+                    confirmed.append((rank, video))
+                    logger.debug(f"   ✅ Added video: {video['title'][:40]}...")
+                
+                if len(confirmed) < limit:
+                    submit_next()
+        
+        # Enough videos confirmed (or out of time) - drop lookups that have not started yet
+        for future in pending:
+            future.cancel()
+        
+        confirmed.sort(key=lambda item: item[0])
+        return [video for _, video in confirmed[:limit]]
+    
     def search_google_pdfs(self, query: str, limit: int = 5) -> List[Dict]:
         """
         Search Web for PDFs related to the query using DuckDuckGo HTML parsing.
+        
+        Identical searches already in flight are shared rather than repeated.
         """
+        pdfs, shared = self.pdf_flight.do(
+            ('pdf', normalize_query(query), limit),
+            lambda: self._search_pdfs(query, limit),
+        )
+        if shared:
+            logger.info(f"🤝 Reused in-flight PDF search for: {query}")
+        return pdfs
+    
+    def _search_pdfs(self, query: str, limit: int) -> List[Dict]:
+        """Uncoalesced DuckDuckGo PDF search behind search_google_pdfs"""
         pdfs = []
         queries_to_try = [
             f"{query} filetype:pdf",
@@ -442,13 +1114,12 @@ class RAGManager:
                 url = "https://html.duckduckgo.com/html/"
                 params = {'q': search_query}
                 headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
                     'Accept-Language': 'en-US,en;q=0.5',
                     'Referer': 'https://html.duckduckgo.com/'
                 }
                 
-                response = httpx.get(url, params=params, headers=headers, timeout=10, follow_redirects=True)
+                response = get_http_client().get(url, params=params, headers=headers, timeout=10)
                 
                 if response.status_code == 200:
                     html_content = response.text
@@ -493,11 +1164,26 @@ class RAGManager:
         subject: str = "",
         context: str = "",
         time_left: int = 10,
-        language: str = "hi"
+        language: str = "hi",
+        concurrent: Optional[bool] = None,
+        deadline_seconds: Optional[float] = None
     ) -> Dict:
         """
         Generate an answer using RAG and Gemini, including video recommendations.
         
+        Strategy generation and the YouTube lookup are independent, so by default
+        they run in parallel and the critical path is max(LLM, video) rather than
+        their sum.
+        
+        Concurrent calls with the same normalized (question, grade, subject,
+        language) share one computation; followers get a copy of the leader's
+        result with cache['coalesced'] set.
+        
+        The whole request runs against a deadline derived from time_left. Each
+        stage (retrieval, LLM, video) gets a slice of it; a stage that overruns is
+        abandoned and the answer is returned with whatever finished, listing the
+        abandoned stages under 'degraded'.
+        
         Args:
             question: Teacher's question
             teacher_name: Teacher's name for personalization
@@ -506,63 +1192,392 @@ class RAGManager:
             context: Additional context
             time_left: Minutes left in class
             language: Response language (hi/en/hinglish)
+            concurrent: Run LLM and video branches in parallel (defaults to settings.SOS_CONCURRENT)
+            deadline_seconds: Total latency budget (defaults to one derived from time_left)
             
         Returns:
-            Dictionary with response, sources, strategies, and videos
+            Dictionary with response, sources, strategies, videos, per-branch timings
+            and the list of degraded stages
         """
+        key = tuple(normalize_query(value) for value in (question, grade, subject, language))
+        budget = deadline_seconds or self._sos_deadline_seconds(time_left)
+        result, shared = self.sos_flight.do(
+            key,
+            lambda: self._answer_question(
+                question, teacher_name, grade, subject, context, time_left,
+                language, concurrent, budget
+            ),
+            # A follower waits no longer than its own deadline, then degrades instead of starting over
+            wait_timeout=budget,
+            on_timeout=lambda: self._timed_out_answer(budget),
+        )
+        result['cache']['coalesced'] = shared
+        if shared:
+            logger.info(f"🤝 Shared in-flight SOS answer for: {question[:50]}...")
+        return result
+    
+    def _answer_question(
+        self,
+        question: str,
+        teacher_name: str,
+        grade: str,
+        subject: str,
+        context: str,
+        time_left: int,
+        language: str,
+        concurrent: Optional[bool],
+        deadline_seconds: Optional[float]
+    ) -> Dict:
+        """Uncoalesced SOS pipeline behind answer_question"""
         logger.info(f"Processing question: {question[:50]}...")
+        request_start = time.perf_counter()
+        deadline = Deadline(deadline_seconds or self._sos_deadline_seconds(time_left))
+        timings = {'deadline_s': round(deadline.total, 1)}
+        degraded = []
+        
+        if concurrent is None:
+            concurrent = getattr(settings, 'SOS_CONCURRENT', True)
+        
+        # Step 0: Embed once - shared by the semantic cache and NCF retrieval
+        search_query = f"{subject} {question}"
+        step_start = time.perf_counter()
+        query_embedding = self._embed_query(search_query, deadline, degraded)
+        cache_partition = SemanticAnswerCache.partition_key(grade, subject, language)
+        cache_hit = self.answer_cache.lookup(query_embedding, cache_partition) if query_embedding is not None else None
+        timings['embed_ms'] = round((time.perf_counter() - step_start) * 1000, 1)
+        
+        if cache_hit:
+            logger.info(f"♻️ Semantic cache hit (similarity={cache_hit['similarity']}) - skipping Gemini")
+            cached = cache_hit['value']
+            strategies = cached['strategies']
+            response_text = cached['response']
+            sources_used = cached['sources']
+            avg_confidence = cached['avg_confidence']
+            
+            video_deadline = Deadline(self._stage_budget(deadline, 'video'))
+            video = run_branches({
+                'video': (
+                    lambda: self._find_videos(question, subject, grade, timeout=video_deadline.remaining()),
+                    video_deadline.total,
+                ),
+            }, max_workers=getattr(settings, 'RAG_WORKER_THREADS', 16))['video']
+            video_data = video['value'] or []
+            timings['video_ms'] = video['elapsed_ms']
+            if video['status'] != 'ok':
+                degraded.append('video')
+        else:
+            strategies, response_text, video_data, sources_used, avg_confidence = self._generate_answer(
+                question, search_query, query_embedding, teacher_name, grade, subject,
+                context, time_left, concurrent, deadline, timings, degraded
+            )
+            # Answers generated without NCF context are not worth reusing
+            if strategies and 'retrieval' not in degraded and query_embedding is not None:
+                self.answer_cache.store(
+                    query_embedding,
+                    cache_partition,
+                    {
+                        'strategies': strategies,
+                        'response': response_text,
+                        'sources': sources_used,
+                        'avg_confidence': avg_confidence,
+                    },
+                    llm_ms=timings.get('llm_ms', 0.0),
+                )
+        
+        cache_stats = self.answer_cache.get_stats()
+        cache_info = {
+            'hit': cache_hit is not None,
+            'similarity': cache_hit['similarity'] if cache_hit else None,
+            'latency_saved_ms': cache_hit['latency_saved_ms'] if cache_hit else 0.0,
+            'hit_ratio': cache_stats['hit_ratio'],
+            'total_latency_saved_ms': cache_stats['latency_saved_ms'],
+        }
+        
+        if cache_hit:
+            timings['mode'] = 'cached'
+        else:
+            timings['mode'] = 'concurrent' if concurrent else 'sequential'
+        timings['total_ms'] = round((time.perf_counter() - request_start) * 1000, 1)
+        
+        # Determine source type
+        is_ncf_based = len(sources_used) > 0
+        source_type = "ncf_rag" if is_ncf_based else "general_knowledge"
+        
+        # Log final result summary
+        logger.info(f"📊 Result Summary: strategies={len(strategies)}, videos={len(video_data)}, ncf_used={is_ncf_based}, confidence={round(avg_confidence, 2) if is_ncf_based else 0.0}")
+        logger.info(f"⏱️ Timings: {timings}")
+        if degraded:
+            logger.warning(f"⚠️ Degraded stages (deadline {deadline.total:.1f}s): {degraded}")
+        
+        return {
+            'strategies': strategies,
+            'response': response_text,
+            'sources': sources_used,
+            'ncf_used': is_ncf_based,
+            'source_type': source_type,
+            'confidence_score': round(avg_confidence, 2) if is_ncf_based else 0.0,
+            'num_sources': len(sources_used) if is_ncf_based else 0,
+            'videos': video_data,
+            'timings': timings,
+            'cache': cache_info,
+            'degraded': degraded
+        }
+    
+    def _timed_out_answer(self, deadline_seconds: float) -> Dict:
+        """
+        Answer for a request whose deadline ran out while it waited for a shared computation.
+        
+        Every stage is reported as degraded and no strategies are returned, so the
+        caller falls back to its local strategies.
+        """
+        cache_stats = self.answer_cache.get_stats()
+        return {
+            'strategies': [],
+            'response': "",
+            'sources': [],
+            'ncf_used': False,
+            'source_type': "general_knowledge",
+            'confidence_score': 0.0,
+            'num_sources': 0,
+            'videos': [],
+            'timings': {
+                'deadline_s': round(deadline_seconds, 1),
+                'mode': 'coalesced',
+                'total_ms': round(deadline_seconds * 1000, 1),
+            },
+            'cache': {
+                'hit': False,
+                'similarity': None,
+                'latency_saved_ms': 0.0,
+                'hit_ratio': cache_stats['hit_ratio'],
+                'total_latency_saved_ms': cache_stats['latency_saved_ms'],
+            },
+            'degraded': ['retrieval', 'llm', 'video'],
+        }
+    
+    def _embed_query(self, search_query: str, deadline: Deadline, degraded: List[str]):
+        """
+        Embed an SOS query within what is left of the request deadline.
+        
+        Returns:
+            The query embedding, or None (with 'embed' added to degraded) if the
+            micro-batcher could not deliver in time. The caller then skips the
+            semantic cache and retrieval embeds the query directly.
+        """
+        try:
+            return self.embedder.encode_query(search_query, timeout=deadline.remaining())
+        except FutureTimeoutError:
+            logger.warning("⏱️ Query embedding not ready within the deadline - skipping the semantic cache")
+            degraded.append('embed')
+            return None
+    
+    def _sos_deadline_seconds(self, time_left: int) -> float:
+        """
+        Latency budget for an SOS request, scaled by the minutes left in class.
+        
+        A teacher with 2 minutes left gets the minimum budget; the budget grows
+        with time left up to SOS_DEADLINE_MAX_SECONDS.
+        """
+        per_minute = getattr(settings, 'SOS_DEADLINE_SECONDS_PER_MINUTE', 2.0)
+        minimum = getattr(settings, 'SOS_DEADLINE_MIN_SECONDS', 6.0)
+        maximum = getattr(settings, 'SOS_DEADLINE_MAX_SECONDS', 25.0)
+        return min(max((time_left or 0) * per_minute, minimum), maximum)
+    
+    def _stage_budget(self, deadline: Deadline, stage: str) -> float:
+        """Seconds a stage may use: its share of the deadline, capped by the per-branch timeout"""
+        shares = getattr(settings, 'SOS_STAGE_BUDGETS', {'retrieval': 0.15, 'llm': 0.95, 'video': 0.6})
+        caps = {
+            'llm': getattr(settings, 'SOS_LLM_TIMEOUT_SECONDS', 25),
+            'video': getattr(settings, 'SOS_VIDEO_TIMEOUT_SECONDS', 12),
+        }
+        return deadline.slice(shares.get(stage, 1.0), cap=caps.get(stage))
+    
+    def _generate_answer(
+        self,
+        question: str,
+        search_query: str,
+        query_embedding,
+        teacher_name: str,
+        grade: str,
+        subject: str,
+        context: str,
+        time_left: int,
+        concurrent: bool,
+        deadline: Deadline,
+        timings: Dict,
+        degraded: List[str]
+    ):
+        """
+        Full (uncached) SOS path: NCF retrieval, then Gemini and YouTube branches.
+        
+        Records per-stage timings into 'timings' and stages that overran their
+        budget into 'degraded'.
+        
+        Returns:
+            Tuple of (strategies, response_text, videos, sources_used, avg_confidence)
+        """
+        workers = getattr(settings, 'RAG_WORKER_THREADS', 16)
         
         # Step 1: Search NCF knowledge base
-        ncf_results = self.search(f"{subject} {question}", top_k=3)
-        
-        # Format NCF context
-        ncf_context = ""
-        sources_used = []
-        avg_confidence = 0.0
-        
-        if ncf_results:
-            logger.info(f"Found {len(ncf_results)} relevant sections in NCF")
-            ncf_context = "NCF GUIDELINES (Use these as primary reference):\n"
-            
-            confidence_scores = []
-            for result in ncf_results:
-                if result['relevance_score'] > 0.3:  # Only use sufficiently relevant results
-                    ncf_context += f"[NCF Page {result['page']}]: {result['text']}\n\n"
-                    sources_used.append(f"NCF Page {result['page']}")
-                    confidence_scores.append(result['relevance_score'])
-            
-            if not sources_used:
-                ncf_context = ""  # No relevant results above threshold
-            else:
-                avg_confidence = sum(confidence_scores) / len(confidence_scores)
+        retrieval_timeout = self._stage_budget(deadline, 'retrieval')
+        retrieval = run_branches({
+            'retrieval': (lambda: self._build_ncf_context(search_query, query_embedding, grade, subject), retrieval_timeout),
+        }, max_workers=workers)['retrieval']
+        timings['retrieval_ms'] = retrieval['elapsed_ms']
         
-        # Build comprehensive prompt
-        SYSTEM_PROMPT = """You are "Shiksha Saathi" - an expert AI Teacher Assistant for Indian school teachers.
-Your goal is to provide IMMEDIATE, ACTIONABLE teaching strategies.
-
-CRITICAL RULES:
-1. Provide EXACTLY 3 strategies in valid JSON format
-2. Each strategy: max 3-4 bullet points, each under 15 words
-3. Start each step with a verb: "Draw", "Ask", "Divide", "Show"
-4. Include time estimate for each strategy
-5. Use materials available in Indian government schools
+        if retrieval['status'] == 'ok':
+            ncf_context, sources_used, avg_confidence = retrieval['value']
+        else:
+            degraded.append('retrieval')
+            ncf_context, sources_used, avg_confidence = "", [], 0.0
+        
+        user_prompt = self._build_user_prompt(
+            question, teacher_name, grade, subject, context, time_left, ncf_context
+        )
 
-OUTPUT FORMAT (STRICT JSON):
-{
-  "strategies": [
-    {
-      "title": "Short catchy name",
-      "title_hi": "हिंदी में नाम",
-      "time_minutes": 2,
-      "difficulty": "easy|medium|hard",
-      "steps": ["Step 1", "Step 2", "Step 3"],
-      "materials": ["item1", "item2"],
-      "ncf_alignment": "Brief NCF principle"
-    }
-  ]
-}"""
+        logger.info(f"FULL RAG PROMPT:\n{user_prompt}")
 
-        user_prompt = f"""Teacher: {teacher_name}
+        # Step 2 + 3: Gemini strategies and YouTube videos. Each call gets what is left
+        # of its budget when it actually starts, so time spent queued for a worker
+        # shortens the Gemini/HTTP timeouts instead of extending the branch.
+        llm_deadline = Deadline(self._stage_budget(deadline, 'llm'))
+        llm_branch = (
+            lambda: self._generate_strategies(question, user_prompt, timeout=llm_deadline.remaining()),
+            llm_deadline.total,
+        )
+        
+        def video_branch():
+            video_deadline = Deadline(self._stage_budget(deadline, 'video'))
+            return (
+                lambda: self._find_videos(question, subject, grade, timeout=video_deadline.remaining()),
+                video_deadline.total,
+            )
+        
+        if concurrent:
+            branches = run_branches({'llm': llm_branch, 'video': video_branch()}, max_workers=workers)
+        else:
+            branches = run_branches({'llm': llm_branch}, max_workers=workers)
+            branches.update(run_branches({'video': video_branch()}, max_workers=workers))
+        
+        strategies, response_text = branches['llm']['value'] or ([], "")
+        video_data = branches['video']['value'] or []
+        timings['llm_ms'] = branches['llm']['elapsed_ms']
+        timings['video_ms'] = branches['video']['elapsed_ms']
+        timings['llm_status'] = branches['llm']['status']
+        timings['video_status'] = branches['video']['status']
+        
+        if branches['llm']['status'] != 'ok' or not strategies:
+            degraded.append('llm')
+        if branches['video']['status'] != 'ok':
+            degraded.append('video')
+        
+        return strategies, response_text, video_data, sources_used, avg_confidence
+    
+    def _build_ncf_context(self, search_query: str, query_embedding=None, grade: str = "", subject: str = ""):
+        """
+        Retrieve NCF sections for a query and pack them into the prompt budget.
+        
+        Search is first restricted to chunks tagged for the teacher's grade and
+        subject, and widened to the whole collection when that finds fewer than
+        RAG_FILTER_MIN_RESULTS relevant sections. Overlapping chunk spans are
+        removed, sections are chosen by maximal marginal relevance, and the
+        context is held to RAG_CONTEXT_MAX_TOKENS tokens counted with a real
+        tokenizer.
+        
+        Returns:
+            Tuple of (ncf_context, sources_used, avg_confidence)
+        """
+        top_k = getattr(settings, 'RAG_CONTEXT_CANDIDATES', 6)
+        if query_embedding is None:
+            # The batched embed timed out: encode directly instead of queueing behind it again
+            query_embedding = self.embedder.encode([search_query])[0]
+        where = None
+        if getattr(settings, 'RAG_FILTER_BY_CLASS', True) and self._chunks_tagged():
+            where = build_chunk_filter(grade, subject)
+        
+        relevant = self._relevant_results(self.search(search_query, top_k=top_k, query_embedding=query_embedding, where=where))
+        if where is not None and len(relevant) < getattr(settings, 'RAG_FILTER_MIN_RESULTS', 2):
+            # Too little grade/subject-specific material: widen to the whole collection
+            logger.info(f"Only {len(relevant)} sections for filter {where} - searching all chunks")
+            seen = {result['id'] for result in relevant}
+            relevant += [
+                result for result in self._relevant_results(
+                    self.search(search_query, top_k=top_k, query_embedding=query_embedding)
+                )
+                if result['id'] not in seen
+            ][:top_k - len(relevant)]
+        if not relevant:
+            return "", [], 0.0
+        
+        logger.info(f"Found {len(relevant)} relevant sections in NCF")
+        vectors = self._stored_embeddings([result['id'] for result in relevant])
+        passages = [
+            {
+                **result,
+                # MMR relevance on a 0-1 scale: cross-encoder probability when reranked, else cosine similarity
+                'relevance': (
+                    1 / (1 + np.exp(-result['rerank_score'])) if 'rerank_score' in result
+                    else (result['relevance_score'] + 1) / 2
+                ),
+                'embedding': vectors.get(result['id']),
+            }
+            for result in relevant
+        ]
+        packed = pack_context(
+            passages,
+            max_tokens=getattr(settings, 'RAG_CONTEXT_MAX_TOKENS', 1200),
+            format_passage=lambda passage, text: f"[NCF Page {passage['page']}]: {text}",
+            header="NCF GUIDELINES (Use these as primary reference):\n",
+            mmr_lambda=getattr(settings, 'RAG_CONTEXT_MMR_LAMBDA', 0.7),
+        )
+        if not packed['passages']:
+            return "", [], 0.0
+        
+        logger.info(
+            f"Packed {len(packed['passages'])}/{len(relevant)} NCF sections into {packed['tokens']} tokens "
+            f"({packed['duplicates']} duplicates, {packed['overlap_chars']} overlapping chars removed)"
+        )
+        sources_used = [f"NCF Page {passage['page']}" for passage in packed['passages']]
+        confidence_scores = [passage['relevance_score'] for passage in packed['passages']]
+        return packed['context'], sources_used, sum(confidence_scores) / len(confidence_scores)
+    
+    @staticmethod
+    def _relevant_results(results: List[Dict]) -> List[Dict]:
+        """
+        Keep sufficiently relevant results (or strong keyword matches in hybrid
+        mode, or chunks the cross-encoder judged relevant).
+        """
+        min_rerank_score = getattr(settings, 'RAG_RERANK_MIN_SCORE', 0.0)
+        return [
+            result for result in results
+            if result['relevance_score'] > 0.3
+            or result.get('keyword_match')
+            or result.get('rerank_score', float('-inf')) >= min_rerank_score
+        ]
+    
+    def _stored_embeddings(self, ids: List[str]) -> Dict[str, Any]:
+        """Stored vectors by chunk ID (empty if the store cannot return them)"""
+        if not ids:
+            return {}
+        try:
+            page = self.store.get(ids=ids, include_embeddings=True)
+        except Exception as e:
+            logger.warning(f"Could not load chunk embeddings for context packing: {e}")
+            return {}
+        return dict(zip(page['ids'], page['embeddings']))
+    
+    def _build_user_prompt(
+        self,
+        question: str,
+        teacher_name: str,
+        grade: str,
+        subject: str,
+        context: str,
+        time_left: int,
+        ncf_context: str
+    ) -> str:
+        """Build the SOS user prompt from the teacher's context and retrieved NCF text"""
+        return f"""Teacher: {teacher_name}
 Grade: {grade}
 Subject: {subject}
 Time Left: {time_left} minutes
@@ -577,61 +1592,63 @@ global NCF Context which you must follow:
 {ncf_context if ncf_context else 'No specific NCF context available.'}
 
 Respond with ONLY valid JSON containing 3 strategies."""
+    
+    def _generate_strategies(self, question: str, user_prompt: str, timeout: Optional[float] = None):
+        """
+        Call Gemini for the SOS strategies.
+        
+        Never raises: on any failure it logs and returns no strategies so the
+        caller can fall back to local ones.
+        
+        Args:
+            question: Teacher's question (for logging)
+            user_prompt: Fully built SOS prompt
+            timeout: Seconds the Gemini call may take
+        
+        Returns:
+            Tuple of (strategies, raw_response_text)
+        """
 
-        logger.info(f"FULL RAG PROMPT:\n{user_prompt}")
 
-        # Step 2: Get AI response using Gemini
-        video_data = []
         strategies = []
         response_text = ""
+        if timeout is not None and timeout <= 0:
+            logger.warning("⏱️ No time left for Gemini - using fallback strategies")
+            return strategies, response_text
         
         try:
             if not self.gemini_api_key or self.gemini_api_key == 'your-gemini-api-key-here':
                 logger.warning("⚠️ Gemini API key not configured - will use fallback strategies")
                 raise ValueError("Gemini API key not configured")
             
-            logger.info(f"🤖 Calling Gemini API (gemini-2.0-flash) for question: '{question[:50]}...'")
+            logger.info(f"🤖 Calling Gemini API ({self.gemini_model_name}) for question: '{question[:50]}...'")
             
-            model = genai.GenerativeModel(
-                'gemini-2.0-flash',
-                system_instruction=SYSTEM_PROMPT
+            model = get_model_registry().get(
+                self.gemini_model_name,
+                system_instruction=SOS_SYSTEM_PROMPT,
+                generation_config=SOS_GENERATION_CONFIG,
             )
             
-            # Retry logic for API rate limits
-            max_retries = 3
-            retry_delay = 2
+            # No retries here: a rate-limited or failing Gemini trips the shared
+            # breaker and later requests go straight to the fallback strategies
+            request_options = {'timeout': timeout} if timeout is not None else None
+            try:
+                response = guarded_generate_content(model, user_prompt, request_options=request_options)
+            except GeminiUnavailableError:
+                raise
+            except Exception as e:
+                error_str = str(e)
+                if "429" in error_str or "quota" in error_str.lower() or "rate" in error_str.lower():
+                    logger.warning(f"⏳ Gemini rate limit hit: {error_str[:200]}")
+                elif "404" in error_str:
+                    logger.error(f"❌ Model not found error: {error_str}")
+                else:
+                    logger.error(f"❌ Gemini API error: {type(e).__name__}: {error_str}")
+                raise
             
-            for attempt in range(max_retries + 1):
-                try:
-                    logger.debug(f"📤 Gemini API attempt {attempt + 1}/{max_retries + 1}")
-                    response = model.generate_content(
-                        user_prompt,
-                        generation_config=genai.GenerationConfig(
-                            max_output_tokens=1200,
-                            temperature=0.7,
-                            response_mime_type="application/json"
-                        )
-                    )
-                    response_text = response.text
-                    logger.info(f"✅ Gemini API response received ({len(response_text)} chars)")
-                    logger.debug(f"📥 Raw response: {response_text[:200]}...")
-                    break
-                except Exception as e:
-                    error_str = str(e)
-                    if "429" in error_str or "quota" in error_str.lower() or "rate" in error_str.lower():
-                        logger.warning(f"⏳ Rate limit hit (attempt {attempt + 1}). Waiting {retry_delay}s...")
-                        if attempt < max_retries:
-                            time.sleep(retry_delay)
-                            retry_delay *= 2
-                        else:
-                            logger.error(f"❌ Rate limit exceeded after {max_retries + 1} attempts")
-                            raise e
-                    elif "404" in error_str:
-                        logger.error(f"❌ Model not found error: {error_str}")
-                        raise e
-                    else:
-                        logger.error(f"❌ Gemini API error: {type(e).__name__}: {error_str}")
-                        raise e
+            response_text = response.text
+            logger.info(f"✅ Gemini API response received ({len(response_text)} chars)")
+            logger.debug(f"📥 Raw response: {response_text[:200]}...")
             
             # Parse JSON response
             try:
@@ -660,48 +1677,254 @@ Respond with ONLY valid JSON containing 3 strategies."""
                 logger.error(f"   Raw response was: {response_text[:300]}...")
                 strategies = []
                 
+        except GeminiUnavailableError as e:
+            logger.warning(f"⚡ Skipping Gemini: {e} - using fallback strategies")
         except Exception as e:
             logger.error(f"❌ Gemini API failed: {type(e).__name__}: {e}")
             logger.info("⚠️ Falling back to local strategies (no AI response)")
         
-        # Step 3: Get YouTube videos
+        return strategies, response_text
+    
+    def _find_videos(self, question: str, subject: str, grade: str = "", timeout: Optional[float] = None) -> List[Dict]:
+        """
+        Build a YouTube query for the question and fetch matching videos.
+        
+        Args:
+            question: Teacher's question
+            subject: Subject being taught
+            grade: Grade level
+            timeout: Seconds the whole lookup may take
+        
+        Returns:
+            List of video dictionaries (empty on failure)
+        """
+        budget = Deadline(timeout) if timeout is not None else None
+        if budget and budget.expired():
+            return []
         try:
             logger.info(f"🎥 Searching for YouTube videos...")
-            # Generate YouTube search query
-            if self.gemini_api_key and self.gemini_api_key != 'your-gemini-api-key-here':
-                search_model = genai.GenerativeModel('gemini-2.0-flash')
-                search_prompt = f"Convert this teacher question into a 3-5 word YouTube search query for Indian education: '{question}'. Return ONLY the query, nothing else."
-                search_response = search_model.generate_content(search_prompt)
-                yt_query = search_response.text.strip()
-                logger.debug(f"   YouTube query from AI: '{yt_query}'")
-            else:
-                yt_query = f"{subject} teaching {question[:30]}"
-                logger.debug(f"   YouTube query (fallback): '{yt_query}'")
+            # Build the YouTube query locally - no extra Gemini round-trip
+            yt_query = build_youtube_query(question, subject, grade)
+            logger.debug(f"   YouTube query: '{yt_query}'")
             
-            video_data = self.get_youtube_videos(yt_query, limit=5)
+            video_data = self.get_youtube_videos(yt_query, limit=5, timeout=budget.remaining() if budget else None)
             logger.info(f"✅ Found {len(video_data)} YouTube videos")
         except Exception as e:
             logger.error(f"❌ YouTube search failed: {e}")
-            video_data = self.get_youtube_videos(f"{subject} teaching tips", limit=5)
+            if budget and budget.expired():
+                return []
+            video_data = self.get_youtube_videos(f"{subject} teaching tips", limit=5, timeout=budget.remaining() if budget else None)
             logger.info(f"⚠️ Using fallback YouTube search, found {len(video_data)} videos")
         
-        # Determine source type
-        is_ncf_based = len(sources_used) > 0
-        source_type = "ncf_rag" if is_ncf_based else "general_knowledge"
+        return video_data
+    
+    def stream_answer(
+        self,
+        question: str,
+        teacher_name: str = "Teacher",
+        grade: str = "",
+        subject: str = "",
+        context: str = "",
+        time_left: int = 10,
+        language: str = "hi"
+    ) -> Iterator[Dict]:
+        """
+        Streaming variant of answer_question.
         
-        # Log final result summary
-        logger.info(f"📊 Result Summary: strategies={len(strategies)}, videos={len(video_data)}, ncf_used={is_ncf_based}, confidence={round(avg_confidence, 2) if is_ncf_based else 0.0}")
+        Yields events as they become available:
+            {'event': 'strategy', 'data': {...}}  - one per strategy, as soon as Gemini closes it
+            {'event': 'done', 'data': {...}}      - trailing event with videos, sources and timings
         
-        return {
-            'strategies': strategies,
-            'response': response_text,
-            'sources': sources_used,
-            'ncf_used': is_ncf_based,
-            'source_type': source_type,
-            'confidence_score': round(avg_confidence, 2) if is_ncf_based else 0.0,
-            'num_sources': len(sources_used) if is_ncf_based else 0,
-            'videos': video_data
+        The YouTube branch starts immediately in the background, so it overlaps
+        with retrieval and generation. Stages share the same time_left-derived
+        deadline as answer_question; the ones that overrun are listed under
+        'degraded' in the trailing event.
+        
+        Args:
+            Same as answer_question
+            
+        Yields:
+            Event dictionaries
+        """
+        logger.info(f"Streaming question: {question[:50]}...")
+        request_start = time.perf_counter()
+        deadline = Deadline(self._sos_deadline_seconds(time_left))
+        timings = {'deadline_s': round(deadline.total, 1)}
+        degraded = []
+        
+        video_deadline = Deadline(self._stage_budget(deadline, 'video'))
+        video_future = get_branch_executor('video', getattr(settings, 'RAG_WORKER_THREADS', 16)).submit(
+            lambda: self._find_videos(question, subject, grade, video_deadline.remaining())
+        )
+        
+        def mark_first_strategy():
+            if 'first_strategy_ms' not in timings:
+                timings['first_strategy_ms'] = round((time.perf_counter() - request_start) * 1000, 1)
+        
+        # Embed once - shared by the semantic cache and NCF retrieval
+        search_query = f"{subject} {question}"
+        query_embedding = self._embed_query(search_query, deadline, degraded)
+        cache_partition = SemanticAnswerCache.partition_key(grade, subject, language)
+        cache_hit = self.answer_cache.lookup(query_embedding, cache_partition) if query_embedding is not None else None
+        
+        strategies = []
+        if cache_hit:
+            logger.info(f"♻️ Semantic cache hit (similarity={cache_hit['similarity']}) - skipping Gemini")
+            cached = cache_hit['value']
+            sources_used = cached['sources']
+            avg_confidence = cached['avg_confidence']
+            for strategy in cached['strategies']:
+                mark_first_strategy()
+                strategies.append(strategy)
+                yield {'event': 'strategy', 'data': strategy}
+        else:
+            retrieval_timeout = self._stage_budget(deadline, 'retrieval')
+            retrieval = run_branches({
+                'retrieval': (lambda: self._build_ncf_context(search_query, query_embedding, grade, subject), retrieval_timeout),
+            }, max_workers=getattr(settings, 'RAG_WORKER_THREADS', 16))['retrieval']
+            timings['retrieval_ms'] = retrieval['elapsed_ms']
+            if retrieval['status'] == 'ok':
+                ncf_context, sources_used, avg_confidence = retrieval['value']
+            else:
+                degraded.append('retrieval')
+                ncf_context, sources_used, avg_confidence = "", [], 0.0
+            
+            user_prompt = self._build_user_prompt(
+                question, teacher_name, grade, subject, context, time_left, ncf_context
+            )
+            
+            step_start = time.perf_counter()
+            parser = StrategyStreamParser()
+            llm_deadline = Deadline(self._stage_budget(deadline, 'llm'))
+            for strategy in self._stream_strategies(question, user_prompt, parser, llm_deadline):
+                mark_first_strategy()
+                strategies.append(strategy)
+                yield {'event': 'strategy', 'data': strategy}
+            timings['llm_ms'] = round((time.perf_counter() - step_start) * 1000, 1)
+            if not strategies or llm_deadline.expired():
+                degraded.append('llm')
+            
+            if strategies and not degraded:
+                self.answer_cache.store(
+                    query_embedding,
+                    cache_partition,
+                    {
+                        'strategies': strategies,
+                        'response': parser.text,
+                        'sources': sources_used,
+                        'avg_confidence': avg_confidence,
+                    },
+                    llm_ms=timings['llm_ms'],
+                )
+        
+        # Trailing event: videos + sources
+        try:
+            video_data = video_future.result(timeout=video_deadline.remaining())
+        except Exception as e:
+            state = 'still queued' if video_future.cancel() else 'still running'
+            logger.warning(f"⏱️ Video branch not ready for stream ({state}): {type(e).__name__}: {e}")
+            video_data = []
+            degraded.append('video')
+        
+        timings['total_ms'] = round((time.perf_counter() - request_start) * 1000, 1)
+        is_ncf_based = len(sources_used) > 0
+        logger.info(f"⏱️ Stream timings: {timings}")
+        
+        yield {
+            'event': 'done',
+            'data': {
+                'videos': video_data,
+                'rag_sources': sources_used,
+                'ncf_used': is_ncf_based,
+                'confidence_score': round(avg_confidence, 2) if is_ncf_based else 0.0,
+                'strategies_count': len(strategies),
+                'cache_hit': cache_hit is not None,
+                'timings': timings,
+                'degraded': degraded,
+            }
         }
+    
+    def _stream_strategies(
+        self,
+        question: str,
+        user_prompt: str,
+        parser: StrategyStreamParser,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[Dict]:
+        """
+        Call Gemini with streaming enabled and yield strategies as they close.
+        
+        Never raises: on failure it logs and stops, leaving fallback to the caller.
+        If the deadline runs out mid-stream, the strategies already closed are kept
+        and the rest of the stream is abandoned.
+        """
+        breaker = get_gemini_breaker()
+        outcome_recorded = True
+        try:
+            if not self.gemini_api_key or self.gemini_api_key == 'your-gemini-api-key-here':
+                logger.warning("⚠️ Gemini API key not configured - will use fallback strategies")
+                return
+            if deadline and deadline.expired():
+                logger.warning("⏱️ No time left for Gemini - using fallback strategies")
+                return
+            
+            logger.info(f"🤖 Streaming Gemini API ({self.gemini_model_name}) for question: '{question[:50]}...'")
+            
+            model = get_model_registry().get(
+                self.gemini_model_name,
+                system_instruction=SOS_SYSTEM_PROMPT,
+                generation_config=SOS_GENERATION_CONFIG,
+            )
+            # Stream errors surface while iterating, so the breaker outcome is reported below
+            reserve_gemini_call()
+            outcome_recorded = False
+            request_options = {'timeout': deadline.remaining()} if deadline else None
+            response = model.generate_content(user_prompt, stream=True, request_options=request_options)
+            
+            strategy_id = 0
+            cut_off = False
+            for chunk in response:
+                if deadline and deadline.expired():
+                    logger.warning(f"⏱️ Gemini stream cut off at deadline after {parser.emitted} strategies")
+                    cut_off = True
+                    break
+                try:
+                    chunk_text = chunk.text
+                except ValueError:
+                    # Final/safety chunks can carry no text parts
+                    continue
+                
+                for strategy in parser.feed(chunk_text):
+                    strategy_id += 1
+                    strategy['id'] = strategy_id
+                    strategy['success_count'] = 0
+                    strategy['video_url'] = None
+                    logger.debug(f"  📌 Streamed strategy {strategy['id']}: {strategy.get('title', 'Unknown')}")
+                    yield strategy
+            
+            if parser.emitted:
+                breaker.record_success()
+                outcome_recorded = True
+            elif not cut_off:
+                breaker.record_failure()
+                outcome_recorded = True
+            # else: our deadline ended the stream, no verdict on Gemini (released below)
+            logger.info(f"✅ Gemini stream finished ({parser.emitted} strategies)")
+            
+        except GeminiUnavailableError as e:
+            logger.warning(f"⚡ Skipping Gemini stream: {e} - using fallback strategies")
+        except Exception as e:
+            if deadline and (deadline.expired() or is_deadline_cutoff(e, deadline.total)):
+                # Cut off by our own deadline: released below without counting a failure
+                logger.warning(f"⏱️ Gemini stream cut off at deadline: {type(e).__name__}")
+            else:
+                breaker.record_failure(e)
+                outcome_recorded = True
+                logger.error(f"❌ Gemini streaming failed: {type(e).__name__}: {e}")
+        finally:
+            if not outcome_recorded:
+                # Deadline cutoff or client gone mid-stream: no verdict, but free a half-open probe slot
+                breaker.release()
 
 
     def solve_problem(
@@ -725,28 +1948,6 @@ Respond with ONLY valid JSON containing 3 strategies."""
         """
         logger.info(f"Solving problem: {problem_text[:50]}... (Grade: {grade}, Subject: {subject})")
         
-        SYSTEM_PROMPT = """You are an expert school teacher in India.
-Your goal is to solve the given problem step-by-step, clearly and simply.
-
-OUTPUT FORMAT (STRICT JSON):
-{
-  "solution_markdown": "Full solution in markdown format. Use latex for math if needed.",
-  "steps": [
-    {"titile": "Step 1", "content": "Explanation..."},
-    {"title": "Step 2", "content": "Explanation..."}
-  ],
-  "concpet_explanation": "Brief explanation of the underlying concept",
-  "difficulty_level": "Easy|Medium|Hard",
-  "detected_subject": "Math|Science|etc"
-}
-
-GUIDELINES:
-1. Explanation should be student-friendly.
-2. If it's a math problem, show clear calculation steps.
-3. If it's a science problem, explain the concept first.
-4. Use standard Indian curriculum terminology where applicable.
-"""
-
         user_prompt = f"""Problem: {problem_text}
 Student Grade: {grade}
 Subject: {subject}
@@ -758,18 +1959,13 @@ Solve this step-by-step."""
              if not self.gemini_api_key or self.gemini_api_key == 'your-gemini-api-key-here':
                 raise ValueError("Gemini API key not configured")
                 
-             model = genai.GenerativeModel(
-                'gemini-2.0-flash',
-                system_instruction=SYSTEM_PROMPT
+             model = get_model_registry().get(
+                self.gemini_model_name,
+                system_instruction=SOLVE_SYSTEM_PROMPT,
+                generation_config=SOLVE_GENERATION_CONFIG,
              )
              
-             response = model.generate_content(
-                user_prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    temperature=0.4
-                )
-             )
+             response = guarded_generate_content(model, user_prompt)
              
              result = json.loads(response.text)
              return {
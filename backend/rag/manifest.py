@@ -0,0 +1,116 @@
+"""
+Shiksha Saathi - Index Manifests
+Content-hash chunk IDs and per-source manifests for incremental re-indexing.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Read files in 1 MB blocks when hashing
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, streamed so large PDFs are never fully in memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _slug(value: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9]+', '-', value or '').strip('-').lower() or 'source'
+
+
+def make_chunk_id(source: str, page: int, text: str) -> str:
+    """
+    Stable chunk ID from (source, page, content hash).
+
+    The same text on the same page of the same source always gets the same
+    ID, so unchanged chunks can be recognised without re-embedding them.
+    """
+    content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    source_hash = hashlib.sha256((source or '').encode('utf-8')).hexdigest()[:8]
+    return f"{_slug(source)[:40]}-{source_hash}:p{page}:{content_hash}"
+
+
+class ManifestStore:
+    """
+    JSON manifests recording which chunk IDs each source contributed to a collection.
+
+    One file per source under <persist_directory>/manifests/<collection>/.
+
+    Usage:
+        store = ManifestStore(persist_directory)
+        manifest = store.load('ncf_documents', 'NCF Document')
+        store.save('ncf_documents', 'NCF Document', {...})
+    """
+
+    def __init__(self, persist_directory: str):
+        self.directory = Path(persist_directory) / 'manifests'
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, collection_name: str, source: str) -> Path:
+        source_hash = hashlib.sha256((source or '').encode('utf-8')).hexdigest()[:8]
+        return self.directory / collection_name / f"{_slug(source)[:60]}-{source_hash}.json"
+
+    def load(self, collection_name: str, source: str) -> Optional[Dict[str, Any]]:
+        """Manifest for a source, or None if it was never indexed (or is unreadable)"""
+        path = self._path(collection_name, source)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path.name}: {e}")
+            return None
+
+    def save(self, collection_name: str, source: str, manifest: Dict[str, Any]):
+        """Write a manifest atomically (temp file + rename)"""
+        path = self._path(collection_name, source)
+        manifest = {**manifest, 'source': source, 'collection': collection_name, 'updated_at': time.time()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def delete(self, collection_name: str, source: str):
+        path = self._path(collection_name, source)
+        if path.exists():
+            path.unlink()
+
+    def clear(self, collection_name: str) -> int:
+        """Remove every manifest of a collection (e.g. after it was dropped)"""
+        removed = 0
+        for path in (self.directory / collection_name).glob("*.json"):
+            path.unlink()
+            removed += 1
+        return removed
+
+    def list_sources(self, collection_name: str) -> List[Dict[str, Any]]:
+        """Summary of every indexed source in a collection"""
+        sources = []
+        for path in sorted((self.directory / collection_name).glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            sources.append({
+                'source': manifest.get('source'),
+                'chunks': len(manifest.get('chunk_ids', [])),
+                'pages': manifest.get('pages', 0),
+                'file_sha256': manifest.get('file_sha256'),
+                'updated_at': manifest.get('updated_at'),
+            })
+        return sources
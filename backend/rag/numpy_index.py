@@ -0,0 +1,369 @@
+"""
+Shiksha Saathi - NumPy Vector Index
+In-process exact search over memory-mapped, L2-normalized embeddings.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .vector_store import matches_where, replace_directory
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block for float16/int8 storage (bounds the float32 temp copy to ~6 MB)
+SCORE_BLOCK_ROWS = 4096
+# Metadata filters whose matching row numbers are kept between queries
+FILTER_CACHE_SIZE = 64
+
+
+class LoadedIndex(NamedTuple):
+    """Everything one load() read, swapped in as a unit so a query never mixes two builds"""
+    embeddings: np.ndarray
+    codes: Optional[np.ndarray]
+    scale: Optional[np.ndarray]
+    offset: Optional[np.ndarray]
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    info: Dict[str, Any]
+    # Row numbers per metadata filter, valid for this load only
+    filter_rows: Dict[str, np.ndarray]
+
+
+class NumpyVectorIndex:
+    """
+    Exact top-k search with one matrix-vector product over an mmap'd matrix.
+
+    Layout under <persist_directory>/numpy_index/<collection>/:
+        embeddings.npy  - (N, dim) float32 or float16, rows L2-normalized
+        records.json    - parallel arrays: ids, documents, metadatas
+        info.json       - dtype, dimension, count, embedding model, build time
+
+    With dtype='int8' the scan runs over codes.npy, an (N, dim) int8 scalar
+    quantization with a per-dimension scale and offset (quantization.npy),
+    a quarter of the float32 size. The best rerank_candidates rows are then
+    rescored exactly from the float32 embeddings.npy, which is mapped but
+    only touched for those rows, so it mostly stays out of memory.
+
+    The .npy file is opened with mmap_mode='r', so every server worker on the
+    host shares the same page-cache pages instead of holding its own copy.
+    Relevance is reported as 2*cos - 1, which equals ChromaDB's 1 - L2² for
+    normalized vectors, so existing score thresholds keep their meaning.
+
+    Usage:
+        index = NumpyVectorIndex(persist_directory, 'ncf_documents')
+        index.build_from_store(store, embedding_model='all-MiniLM-L6-v2')
+        results = index.query(query_vector, top_k=3)
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        collection_name: str,
+        dtype: str = 'float32',
+        rerank_candidates: int = 50,
+    ):
+        self.directory = Path(persist_directory) / 'numpy_index' / collection_name
+        self.collection_name = collection_name
+        self.dtype = np.dtype(dtype)
+        self.quantized = self.dtype == np.int8
+        # int8 keeps exact float32 vectors for reranking
+        self.storage_dtype = np.dtype(np.float32) if self.quantized else self.dtype
+        self.rerank_candidates = rerank_candidates
+
+        # Replaced by a single assignment on every load(); readers take one reference to it
+        self._loaded: Optional[LoadedIndex] = None
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ─── Build ───────────────────────────────────────────────────────────────
+
+    def build_from_store(self, store, embedding_model: str = "", batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Export a vector store collection into the mmap layout.
+
+        Rows are streamed into the .npy file batch by batch, and the new files
+        replace the old directory in one rename, so readers never see a
+        half-written index.
+
+        Returns:
+            The written info.json contents
+        """
+        start = time.perf_counter()
+        total = store.count()
+        tmp_dir = self.directory.with_name(self.directory.name + f".tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        ids, documents, metadatas = [], [], []
+        matrix = None
+        written = 0
+
+        for offset in range(0, total, batch_size):
+            page = store.get(limit=batch_size, offset=offset, include_embeddings=True)
+            if not page['ids']:
+                break
+
+            vectors = np.asarray(page['embeddings'], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1.0)
+
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    tmp_dir / 'embeddings.npy', mode='w+', dtype=self.storage_dtype, shape=(total, vectors.shape[1])
+                )
+            matrix[written:written + len(vectors)] = vectors.astype(self.storage_dtype)
+            written += len(vectors)
+
+            ids.extend(page['ids'])
+            documents.extend(page['documents'])
+            metadatas.extend(page['metadatas'])
+
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                tmp_dir / 'embeddings.npy', mode='w+', dtype=self.storage_dtype, shape=(0, 0)
+            )
+        matrix.flush()
+        dimension = int(matrix.shape[1])
+        del matrix
+
+        if written != total:
+            # Collection changed while exporting; keep only the rows we have
+            logger.warning(f"Collection size changed during export ({written}/{total} rows)")
+            trimmed = np.load(tmp_dir / 'embeddings.npy')[:written]
+            np.save(tmp_dir / 'embeddings.npy', trimmed)
+
+        if self.quantized:
+            self._write_quantized(tmp_dir)
+
+        with open(tmp_dir / 'records.json', 'w', encoding='utf-8') as f:
+            json.dump({'ids': ids, 'documents': documents, 'metadatas': metadatas}, f, ensure_ascii=False)
+
+        info = {
+            'collection': self.collection_name,
+            'count': written,
+            'dimension': dimension,
+            'dtype': self.dtype.name,
+            'embedding_model': embedding_model,
+            'built_at': time.time(),
+            'build_s': round(time.perf_counter() - start, 2),
+        }
+        with open(tmp_dir / 'info.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+
+        replace_directory(tmp_dir, self.directory)
+
+        logger.info(f"✅ Built NumPy index for {self.collection_name}: {written} x {dimension} {self.dtype.name} ({info['build_s']}s)")
+        self.load()
+        return info
+
+    @staticmethod
+    def _write_quantized(tmp_dir: Path):
+        """Per-dimension min/max int8 codes: x ~= (code + 128) * scale + offset"""
+        vectors = np.load(tmp_dir / 'embeddings.npy', mmap_mode='r')
+        rows, dimension = vectors.shape
+
+        low = np.full(dimension, np.inf, dtype=np.float32)
+        high = np.full(dimension, -np.inf, dtype=np.float32)
+        for start in range(0, rows, SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS])
+            low = np.minimum(low, block.min(axis=0))
+            high = np.maximum(high, block.max(axis=0))
+        if rows == 0:
+            low = high = np.zeros(dimension, dtype=np.float32)
+        scale = (high - low) / 255
+        scale[scale == 0] = 1.0
+
+        codes = np.lib.format.open_memmap(tmp_dir / 'codes.npy', mode='w+', dtype=np.int8, shape=(rows, dimension))
+        for start in range(0, rows, SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS])
+            codes[start:start + len(block)] = np.clip(np.rint((block - low) / scale) - 128, -128, 127)
+        codes.flush()
+        del codes
+        np.save(tmp_dir / 'quantization.npy', np.stack([scale, low]).astype(np.float32))
+
+    # ─── Load ────────────────────────────────────────────────────────────────
+
+    def exists(self) -> bool:
+        return (self.directory / 'info.json').exists()
+
+    def load(self) -> bool:
+        """(Re)open the index files. Returns False if no index has been built."""
+        with self._lock:
+            if not self.exists():
+                return False
+
+            info_path = self.directory / 'info.json'
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            with open(self.directory / 'records.json', 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+            codes = scale = offset = None
+            if info.get('dtype') == 'int8':
+                codes = np.load(self.directory / 'codes.npy', mmap_mode='r')
+                scale, offset = np.load(self.directory / 'quantization.npy')
+            self._loaded = LoadedIndex(
+                embeddings=np.load(self.directory / 'embeddings.npy', mmap_mode='r'),
+                codes=codes,
+                scale=scale,
+                offset=offset,
+                ids=records['ids'],
+                documents=records['documents'],
+                metadatas=records['metadatas'],
+                info=info,
+                filter_rows={},
+            )
+            self._loaded_mtime = info_path.stat().st_mtime
+            self._checked_at = time.monotonic()
+            return True
+
+    def refresh_if_changed(self, interval_seconds: float = 5.0):
+        """Reload when another process rebuilt the index (checked at most every interval)"""
+        now = time.monotonic()
+        if now - self._checked_at < interval_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = (self.directory / 'info.json').stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            logger.info(f"NumPy index for {self.collection_name} changed on disk - reloading")
+            self.load()
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        loaded = self._loaded
+        return loaded.embeddings if loaded else None
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        loaded = self._loaded
+        return loaded.codes if loaded else None
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        loaded = self._loaded
+        return loaded.info if loaded else {}
+
+    @property
+    def count(self) -> int:
+        loaded = self._loaded
+        return len(loaded.ids) if loaded else 0
+
+    # ─── Query ───────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _blockwise_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # numpy has no fast float16/int8 GEMV: convert one block at a time to float32
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        return scores
+
+    def _scores(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        return self._blockwise_scores(matrix, query)
+
+    @staticmethod
+    def _rows_matching(loaded: LoadedIndex, where: Dict[str, Any]) -> np.ndarray:
+        """Row numbers whose metadata matches a filter (cached per filter until the next load)"""
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False)
+        cache = loaded.filter_rows
+        rows = cache.get(key)
+        if rows is None:
+            rows = np.fromiter(
+                (i for i, metadata in enumerate(loaded.metadatas) if matches_where(metadata, where)), dtype=np.int64
+            )
+            if len(cache) >= FILTER_CACHE_SIZE:
+                cache.pop(next(iter(cache)))
+            cache[key] = rows
+        return rows
+
+    def _top(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first"""
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def query(self, query_embedding, top_k: int = 3, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k nearest chunks by cosine similarity.
+
+        With a metadata filter only the matching rows are scored.
+
+        Returns:
+            List of {'id', 'text', 'metadata', 'similarity', 'relevance_score'}, best first
+        """
+        # One snapshot for the whole query: a concurrent reload swaps in a new one
+        loaded = self._loaded
+        if loaded is None or len(loaded.embeddings) == 0:
+            return []
+        embeddings = loaded.embeddings
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        rows = None
+        if where:
+            rows = self._rows_matching(loaded, where)
+            if len(rows) == 0:
+                return []
+
+        codes = loaded.codes
+        if codes is not None:
+            # Approximate scan over int8 codes; the constant query.offset term
+            # does not change the ranking, so it is left out
+            approximate = self._blockwise_scores(codes if rows is None else codes[rows], query * loaded.scale)
+            candidates = self._top(approximate, max(top_k, self.rerank_candidates))
+            candidates = np.sort(candidates if rows is None else rows[candidates])
+            # Exact rerank: only the candidate rows of the float32 file are read
+            exact = np.asarray(embeddings[candidates], dtype=np.float32) @ query
+            order = self._top(exact, top_k)
+            top, similarities = candidates[order], exact[order]
+        else:
+            scores = self._scores(embeddings if rows is None else embeddings[rows], query)
+            top = self._top(scores, top_k)
+            similarities = scores[top]
+            if rows is not None:
+                top = rows[top]
+
+        return [
+            {
+                'id': loaded.ids[i],
+                'text': loaded.documents[i],
+                'metadata': loaded.metadatas[i] or {},
+                'similarity': float(similarity),
+                'relevance_score': float(2 * similarity - 1),
+            }
+            for i, similarity in zip(top, similarities)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        loaded = self._loaded
+        codes = loaded.codes if loaded else None
+        embeddings_path = self.directory / 'embeddings.npy'
+        codes_path = self.directory / 'codes.npy'
+        file_bytes = embeddings_path.stat().st_size if embeddings_path.exists() else 0
+        codes_bytes = codes_path.stat().st_size if codes is not None and codes_path.exists() else 0
+        return {
+            **(loaded.info if loaded else {}),
+            'loaded': loaded is not None,
+            'file_bytes': file_bytes + codes_bytes,
+            # Bytes read by every query's full scan (the rest is touched only for reranking)
+            'scan_bytes': codes_bytes or file_bytes,
+            'rerank_candidates': self.rerank_candidates if codes is not None else 0,
+        }
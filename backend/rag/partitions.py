@@ -0,0 +1,274 @@
+"""
+Shiksha Saathi - Language Partitions
+Per-language collections derived from the main collection, with query
+language routing.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embeddings import EmbeddingMismatchError, get_embedding_service
+from .numpy_index import NumpyVectorIndex
+from .text_utils import detect_language
+from .vector_store import open_vector_store
+
+logger = logging.getLogger(__name__)
+
+# Partitions searched for a query language, best first. Hinglish is written in
+# Latin script and shares most content words with English material.
+ROUTES = {
+    'hi': ('hi', 'en'),
+    'en': ('en', 'hi'),
+    'hinglish': ('en', 'hi'),
+}
+
+
+class LanguagePartitions:
+    """
+    One vector store collection per language, named '<collection>__<lang>'.
+
+    The main collection stays the source of truth; sync() copies each chunk
+    into the partition of its 'language' tag (detected from the text for
+    untagged chunks) and rewrites chunks whose metadata changed. A
+    partition can use its own embedding model, in which case its chunks
+    are re-embedded instead of copied. With numpy_index options each
+    partition also gets its own NumpyVectorIndex, which serves its queries.
+
+    A query is routed by detect_language to its own partition first, and
+    the other partitions are searched only when that finds fewer than
+    min_results hits above min_relevance. Scores from different embedding
+    models are not comparable, so such hits keep their partition order.
+
+    Usage:
+        partitions = LanguagePartitions(persist_directory, 'ncf_documents', ['hi', 'en'], embedder)
+        partitions.sync(store)
+        hits, info = partitions.query("बच्चे भिन्न नहीं समझ रहे", top_k=3)
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        collection_name: str,
+        languages: Sequence[str],
+        default_embedder,
+        models: Optional[Dict[str, str]] = None,
+        min_results: int = 2,
+        min_relevance: float = 0.3,
+        numpy_index: Optional[Dict[str, Any]] = None,
+    ):
+        self.collection_name = collection_name
+        self.default_embedder = default_embedder
+        self.min_results = min_results
+        self.min_relevance = min_relevance
+        self.partitions: Dict[str, Dict[str, Any]] = {}
+
+        models = models or {}
+        for language in languages:
+            embedder = get_embedding_service(models[language]) if models.get(language) else default_embedder
+            name = f"{collection_name}__{language}"
+            try:
+                store = open_vector_store(name, persist_directory, embedder)
+            except EmbeddingMismatchError as e:
+                # Derived data: rebuild it for the current model
+                logger.warning(f"Rebuilding partition {name}: {e}")
+                store = open_vector_store(name, persist_directory, embedder, recreate=True)
+            partition = {'store': store, 'embedder': embedder, 'numpy': None}
+            if numpy_index is not None:
+                # NumpyVectorIndex kwargs (dtype, rerank_candidates), as for the main collection
+                index = NumpyVectorIndex(persist_directory, name, **numpy_index)
+                partition['numpy'] = index
+                if (
+                    not index.load()
+                    or index.info.get('count') != store.count()
+                    or index.info.get('embedding_model') != embedder.model_name
+                ):
+                    self._rebuild_numpy(partition)
+            self.partitions[language] = partition
+
+        self._stats_lock = threading.Lock()
+        self.queries: Dict[str, int] = {}
+        self.fallbacks = 0
+
+    @property
+    def languages(self) -> List[str]:
+        return list(self.partitions)
+
+    def partition_of(self, language: str) -> str:
+        """Partition holding chunks of a detected language"""
+        if language in self.partitions:
+            return language
+        for candidate in ROUTES.get(language, ()):
+            if candidate in self.partitions:
+                return candidate
+        return self.languages[0]
+
+    def route(self, query: str) -> List[str]:
+        """Partitions to search for a query, in order"""
+        language = detect_language(query)
+        first = self.partition_of(language)
+        rest = [candidate for candidate in ROUTES.get(language, ()) if candidate in self.partitions and candidate != first]
+        rest += [candidate for candidate in self.partitions if candidate != first and candidate not in rest]
+        return [first] + rest
+
+    def count(self) -> int:
+        return sum(partition['store'].count() for partition in self.partitions.values())
+
+    @staticmethod
+    def _rebuild_numpy(partition: Dict[str, Any]):
+        try:
+            partition['numpy'].build_from_store(partition['store'], embedding_model=partition['embedder'].model_name)
+        except Exception as e:
+            # Queries fall back to the partition's vector store while the index is unavailable
+            logger.error(f"❌ Failed to build NumPy index for partition: {type(e).__name__}: {e}")
+
+    # ─── Build ───────────────────────────────────────────────────────────────
+
+    def sync(self, store, batch_size: int = 500) -> Dict[str, Any]:
+        """
+        Bring every partition in line with the main collection.
+
+        Only chunks that are new to a partition, or whose metadata changed
+        (e.g. re-tagged), are copied (or embedded with the partition's
+        model); chunks no longer in the main collection are deleted.
+
+        Returns:
+            Per-language {'chunks', 'added', 'updated', 'deleted'} and elapsed_s
+        """
+        start = time.perf_counter()
+        existing = {}
+        for language, partition in self.partitions.items():
+            page = partition['store'].get()
+            existing[language] = dict(zip(page['ids'], page['metadatas']))
+        wanted = {language: set() for language in self.partitions}
+        added = {language: 0 for language in self.partitions}
+        updated = {language: 0 for language in self.partitions}
+
+        total = store.count()
+        for offset in range(0, total, batch_size):
+            page = store.get(limit=batch_size, offset=offset, include_embeddings=True)
+            if not page['ids']:
+                break
+
+            new_rows: Dict[str, List[int]] = {language: [] for language in self.partitions}
+            for row, (chunk_id, text, metadata) in enumerate(zip(page['ids'], page['documents'], page['metadatas'])):
+                language = self.partition_of((metadata or {}).get('language') or detect_language(text))
+                wanted[language].add(chunk_id)
+                if chunk_id not in existing[language]:
+                    new_rows[language].append(row)
+                    added[language] += 1
+                elif existing[language][chunk_id] != (metadata or {}):
+                    new_rows[language].append(row)
+                    updated[language] += 1
+
+            for language, rows in new_rows.items():
+                if not rows:
+                    continue
+                partition = self.partitions[language]
+                texts = [page['documents'][row] for row in rows]
+                if partition['embedder'] is self.default_embedder:
+                    embeddings = np.asarray(page['embeddings'], dtype=np.float32)[rows]
+                else:
+                    embeddings = partition['embedder'].encode(texts)
+                partition['store'].add(
+                    ids=[page['ids'][row] for row in rows],
+                    embeddings=embeddings,
+                    documents=texts,
+                    metadatas=[page['metadatas'][row] for row in rows],
+                )
+
+        summary = {}
+        for language, partition in self.partitions.items():
+            stale = sorted(set(existing[language]) - wanted[language])
+            for i in range(0, len(stale), batch_size):
+                partition['store'].delete(ids=stale[i:i + batch_size])
+            partition['store'].snapshot()
+            if partition['numpy'] is not None and (added[language] or updated[language] or stale):
+                self._rebuild_numpy(partition)
+            summary[language] = {
+                'chunks': len(wanted[language]),
+                'added': added[language],
+                'updated': updated[language],
+                'deleted': len(stale),
+            }
+
+        summary['elapsed_s'] = round(time.perf_counter() - start, 2)
+        logger.info(f"✅ Synced language partitions of {self.collection_name}: {summary}")
+        return summary
+
+    # ─── Query ───────────────────────────────────────────────────────────────
+
+    def query(
+        self,
+        query: str,
+        top_k: int = 3,
+        query_embedding=None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Search the query's own partition, then the others if recall is low.
+
+        Args:
+            query: Query text (used for routing and, for partitions with
+                   their own model, for encoding)
+            top_k: Hits to return
+            query_embedding: Query vector from the default embedder, if already computed
+            where: Metadata filter
+
+        Returns:
+            (hits best first, {'partitions': searched languages, 'fallback': bool})
+        """
+        route = self.route(query)
+        embeddings = {}
+        if query_embedding is not None:
+            embeddings[self.default_embedder.model_name] = query_embedding
+
+        hits_by_partition = []
+        searched = []
+        for language in route:
+            partition = self.partitions[language]
+            embedder = partition['embedder']
+            if embedder.model_name not in embeddings:
+                embeddings[embedder.model_name] = embedder.encode_query(query)
+            index = partition['numpy']
+            if index is not None and index.embeddings is not None:
+                index.refresh_if_changed()
+                hits = index.query(embeddings[embedder.model_name], top_k, where=where)
+            else:
+                hits = partition['store'].query(embeddings[embedder.model_name], top_k, where=where)
+            hits_by_partition.append(hits)
+            searched.append(language)
+            relevant = sum(1 for hits in hits_by_partition for hit in hits if hit['relevance_score'] > self.min_relevance)
+            if relevant >= self.min_results:
+                break
+
+        fallback = len(searched) > 1
+        with self._stats_lock:
+            self.queries[route[0]] = self.queries.get(route[0], 0) + 1
+            self.fallbacks += fallback
+
+        merged = [hit for hits in hits_by_partition for hit in hits]
+        if len({self.partitions[language]['embedder'].model_name for language in searched}) == 1:
+            # One model: scores are comparable, so rank across partitions
+            merged.sort(key=lambda hit: hit['relevance_score'], reverse=True)
+        return merged[:top_k], {'partitions': searched, 'fallback': fallback}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            queries = dict(self.queries)
+            fallbacks = self.fallbacks
+        return {
+            'partitions': {
+                language: {
+                    'collection': f"{self.collection_name}__{language}",
+                    'chunks': partition['store'].count(),
+                    'embedding_model': partition['embedder'].model_name,
+                    'numpy_index': partition['numpy'] is not None,
+                }
+                for language, partition in self.partitions.items()
+            },
+            'queries_by_language': queries,
+            'fallbacks': fallbacks,
+        }
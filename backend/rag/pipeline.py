@@ -5,6 +5,9 @@ Orchestrates retrieval and generation for teaching strategies.
 import logging
 from typing import List, Dict, Any
 
+from django.conf import settings
+
+from .chunk_classifier import build_chunk_filter
 from .retriever import get_retriever, NCFRetriever
 from .gemini_client import get_gemini_client, GeminiClient
 
@@ -74,8 +77,18 @@ class RAGPipeline:
                 # Build search query
                 search_query = f"{grade} {subject} {query}"
                 
-                # Retrieve documents
-                documents = self.retriever.retrieve(search_query, top_k=top_k_docs)
+                # Retrieve documents tagged for this grade and subject, widening to
+                # the whole collection when too few match
+                where = None
+                if getattr(settings, 'RAG_FILTER_BY_CLASS', True) and self.retriever.has_chunk_tags():
+                    where = build_chunk_filter(grade, subject)
+                documents = self.retriever.retrieve(search_query, top_k=top_k_docs, filter_metadata=where)
+                if where is not None and len(documents) < getattr(settings, 'RAG_FILTER_MIN_RESULTS', 2):
+                    seen = {doc['id'] for doc in documents}
+                    documents += [
+                        doc for doc in self.retriever.retrieve(search_query, top_k=top_k_docs)
+                        if doc['id'] not in seen
+                    ][:top_k_docs - len(documents)]
                 
                 if documents:
                     # Format context for LLM
@@ -0,0 +1,190 @@
+"""
+Shiksha Saathi - Cross-Encoder Reranker
+Rescores over-fetched retrieval candidates with a small CPU cross-encoder,
+within a latency budget.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from sentence_transformers import CrossEncoder
+
+from .concurrency import get_executor
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Reorders retrieval hits by a cross-encoder's (query, chunk) relevance.
+
+    All candidates are scored in one batched predict call on a small
+    dedicated pool. The call is bounded by budget_ms: the candidate list is
+    first trimmed to what the measured per-pair cost fits in the budget, and
+    if the scores are still not back in time (model busy under load) the
+    hits are returned in their original vector order. A queued call that
+    timed out is cancelled, so a backlog does not keep the model busy.
+
+    Usage:
+        reranker = get_reranker()
+        hits = reranker.rerank("bachche fractions nahi samajh rahe", hits, top_k=3)
+    """
+
+    # Weight of the newest measurement in the per-pair cost average
+    COST_SMOOTHING = 0.2
+
+    def __init__(
+        self,
+        model_name: str,
+        budget_ms: float = 250.0,
+        max_length: int = 256,
+        batch_size: int = 32,
+        workers: int = 1,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.workers = workers
+
+        logger.info(f"Loading cross-encoder: {model_name}...")
+        start = time.perf_counter()
+        self.model = CrossEncoder(model_name, max_length=max_length)
+        logger.info(f"✅ Cross-encoder ready ({time.perf_counter() - start:.1f}s)")
+
+        self.ms_per_pair: Optional[float] = None
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.reranked = 0
+        self.pairs_scored = 0
+        self.trimmed = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.score_ms_total = 0.0
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Cross-encoder scores for (query, text) pairs in one batched forward pass"""
+        start = time.perf_counter()
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._stats_lock:
+            per_pair = elapsed_ms / max(1, len(texts))
+            if self.ms_per_pair is None:
+                self.ms_per_pair = per_pair
+            else:
+                self.ms_per_pair += self.COST_SMOOTHING * (per_pair - self.ms_per_pair)
+            self.pairs_scored += len(texts)
+            self.score_ms_total += elapsed_ms
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+
+    def rerank(
+        self,
+        query: str,
+        hits: List[Dict[str, Any]],
+        top_k: int,
+        budget_ms: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Best top_k hits by cross-encoder score.
+
+        Args:
+            query: Query text
+            hits: Candidates in vector order, each with a 'text' field
+            top_k: Number of hits to keep
+            budget_ms: Latency budget (defaults to the reranker setting)
+
+        Returns:
+            Reranked hits with a 'rerank_score' field, or the first top_k hits
+            unchanged if the budget did not allow reranking
+        """
+        budget_ms = budget_ms or self.budget_ms
+        with self._stats_lock:
+            self.calls += 1
+            ms_per_pair = self.ms_per_pair
+
+        if len(hits) <= 1:
+            return hits[:top_k]
+
+        candidates = hits
+        if ms_per_pair:
+            affordable = int(budget_ms / ms_per_pair)
+            if affordable < min(top_k, len(hits)):
+                with self._stats_lock:
+                    self.skipped += 1
+                logger.warning(f"⏱️ Rerank skipped: ~{ms_per_pair:.1f}ms/pair does not fit a {budget_ms:.0f}ms budget")
+                return hits[:top_k]
+            if affordable < len(hits):
+                candidates = hits[:affordable]
+                with self._stats_lock:
+                    self.trimmed += 1
+
+        executor = get_executor(self.workers, pool='rerank')
+        future = executor.submit(self.score, query, [hit['text'] for hit in candidates])
+        try:
+            scores = future.result(timeout=budget_ms / 1000)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            logger.warning(f"⏱️ Rerank exceeded its {budget_ms:.0f}ms budget - keeping vector order")
+            return hits[:top_k]
+        except Exception as e:
+            with self._stats_lock:
+                self.errors += 1
+            logger.error(f"❌ Rerank failed: {type(e).__name__}: {e}")
+            return hits[:top_k]
+
+        with self._stats_lock:
+            self.reranked += 1
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        return [{**candidates[i], 'rerank_score': float(scores[i])} for i in order]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Model, budget and outcome counters for monitoring"""
+        with self._stats_lock:
+            return {
+                'model': self.model_name,
+                'budget_ms': self.budget_ms,
+                'calls': self.calls,
+                'reranked': self.reranked,
+                'trimmed': self.trimmed,
+                'skipped': self.skipped,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'ms_per_pair': round(self.ms_per_pair, 3) if self.ms_per_pair else None,
+                'avg_score_ms': round(self.score_ms_total / self.reranked, 2) if self.reranked else 0.0,
+                'pairs_scored': self.pairs_scored,
+            }
+
+
+# One reranker per model name per process
+_rerankers: Dict[str, CrossEncoderReranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(model_name: Optional[str] = None) -> CrossEncoderReranker:
+    """Get singleton reranker (defaults to settings.RAG_RERANK_MODEL)"""
+    model_name = model_name or getattr(settings, 'RAG_RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    reranker = _rerankers.get(model_name)
+    if reranker is None:
+        with _rerankers_lock:
+            reranker = _rerankers.get(model_name)
+            if reranker is None:
+                reranker = CrossEncoderReranker(
+                    model_name,
+                    budget_ms=getattr(settings, 'RAG_RERANK_BUDGET_MS', 250.0),
+                    max_length=getattr(settings, 'RAG_RERANK_MAX_LENGTH', 256),
+                    batch_size=getattr(settings, 'RAG_RERANK_BATCH_SIZE', 32),
+                    workers=getattr(settings, 'RAG_RERANK_WORKERS', 1),
+                )
+                _rerankers[model_name] = reranker
+    return reranker
@@ -3,13 +3,17 @@ Shiksha Saathi - RAG Retriever
 Retrieves relevant NCF content for teacher queries.
 """
 import logging
+import time
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-import chromadb
-from chromadb.config import Settings
 from django.conf import settings
 
+from .chunk_classifier import collection_fully_tagged
+from .context_packer import pack_context
+from .embeddings import EmbeddingMismatchError, get_embedding_service
+from .vector_store import CollectionNotFoundError, open_vector_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,41 +33,57 @@ class NCFRetriever:
     ):
         self.persist_directory = persist_directory or settings.CHROMA_PERSIST_DIRECTORY
         self.collection_name = collection_name
-        self.collection = None
+        self.store = None
+        self.embedder = get_embedding_service()
+        self._tagged_state = (False, float('-inf'))
         
         self._init_client()
     
     def _init_client(self):
-        """Initialize ChromaDB client and get collection"""
+        """Open the existing collection on the configured vector store"""
         try:
-            self.client = chromadb.PersistentClient(
-                path=self.persist_directory,
-                settings=Settings(anonymized_telemetry=False),
+            self.store = open_vector_store(
+                self.collection_name, self.persist_directory, self.embedder, create=False
             )
-            
-            # Try to get existing collection
-            try:
-                self.collection = self.client.get_collection(self.collection_name)
-                logger.info(f"Loaded collection: {self.collection_name}")
-            except Exception:
-                logger.warning(f"Collection not found: {self.collection_name}")
-                self.collection = None
-                
+            logger.info(f"Loaded {self.store.backend} collection: {self.collection_name}")
+        except EmbeddingMismatchError as e:
+            logger.error(f"Collection unusable for retrieval: {e}")
+            self.store = None
+        except CollectionNotFoundError:
+            logger.warning(f"Collection not found: {self.collection_name}")
+            self.store = None
         except Exception as e:
-            logger.error(f"ChromaDB initialization error: {e}")
-            self.client = None
-            self.collection = None
+            logger.error(f"Vector store initialization error: {e}")
+            self.store = None
     
     def is_indexed(self) -> bool:
         """Check if the collection exists and has documents"""
-        return self.collection is not None and self.get_document_count() > 0
+        return self.store is not None and self.get_document_count() > 0
+    
+    def has_chunk_tags(self) -> bool:
+        """
+        Whether every chunk carries chunk_classifier tags (grade band, subject).
+        
+        Untagged chunks from older indexes would be dropped by the filters.
+        A negative answer is re-checked once a minute, so a re-index is picked up.
+        """
+        tagged, checked_at = self._tagged_state
+        if tagged or self.store is None or time.monotonic() - checked_at < 60:
+            return tagged
+        try:
+            tagged = collection_fully_tagged(self.store)
+        except Exception as e:
+            logger.warning(f"Could not check chunk tags: {e}")
+            tagged = False
+        self._tagged_state = (tagged, time.monotonic())
+        return tagged
     
     def get_document_count(self) -> int:
         """Get number of documents in collection"""
-        if self.collection is None:
+        if self.store is None:
             return 0
         try:
-            return self.collection.count()
+            return self.store.count()
         except Exception:
             return 0
     
@@ -89,31 +109,29 @@ class NCFRetriever:
             return []
         
         try:
-            # Query ChromaDB
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=top_k,
-                where=filter_metadata,
-            )
+            # Query with the same model the collection was indexed with
+            query_embedding = self.embedder.encode_query(query)
+            hits = self.store.query(query_embedding, top_k=top_k, where=filter_metadata)
             
             # Format results
             documents = []
             
-            if results and results['documents']:
-                for i, doc in enumerate(results['documents'][0]):
-                    metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                    distance = results['distances'][0][i] if results['distances'] else 0
-                    
-                    # Convert distance to similarity score (ChromaDB uses L2 distance)
-                    similarity = 1 / (1 + distance)
-                    
-                    documents.append({
-                        'text': doc,
-                        'metadata': metadata,
-                        'score': similarity,
-                        'page_number': metadata.get('page_number'),
-                        'source': metadata.get('source', 'NCF-FS 2022'),
-                    })
+            for hit in hits:
+                metadata = hit['metadata']
+                
+                # Convert distance to similarity score (stores report squared L2 distance)
+                similarity = 1 / (1 + hit['distance'])
+                
+                documents.append({
+                    'id': hit['id'],
+                    'text': hit['text'],
+                    'metadata': metadata,
+                    'score': similarity,
+                    # Cosine similarity (squared L2 between unit vectors is 2 - 2cos)
+                    'cosine_similarity': 1 - hit['distance'] / 2,
+                    'page_number': metadata.get('page_number'),
+                    'source': metadata.get('source', 'NCF-FS 2022'),
+                })
             
             logger.info(f"Retrieved {len(documents)} documents for query: {query[:50]}...")
             return documents
@@ -130,9 +148,12 @@ class NCFRetriever:
         """
         Format retrieved documents into a context string for the LLM.
         
+        Overlapping chunk spans are removed and documents are chosen by
+        maximal marginal relevance until the token budget is full.
+        
         Args:
             documents: List of retrieved documents
-            max_tokens: Approximate max tokens (chars / 4)
+            max_tokens: Max tokens, counted with the context tokenizer
             
         Returns:
             Formatted context string
@@ -140,24 +161,31 @@ class NCFRetriever:
         if not documents:
             return ""
         
-        context_parts = []
-        total_chars = 0
-        max_chars = max_tokens * 4  # Rough token to char conversion
-        
-        for doc in documents:
-            page = doc.get('page_number', '?')
-            source = doc.get('source', 'NCF')
-            text = doc['text']
-            
-            part = f"[{source}, Page {page}]\n{text}\n"
-            
-            if total_chars + len(part) > max_chars:
-                break
-                
-            context_parts.append(part)
-            total_chars += len(part)
+        vectors = {}
+        ids = [doc['id'] for doc in documents if doc.get('id')]
+        if self.store is not None and ids:
+            try:
+                page = self.store.get(ids=ids, include_embeddings=True)
+                vectors = dict(zip(page['ids'], page['embeddings']))
+            except Exception as e:
+                logger.warning(f"Could not load document embeddings for context packing: {e}")
         
-        return "\n---\n".join(context_parts)
+        passages = [
+            {
+                **doc,
+                'relevance': doc.get('cosine_similarity', doc.get('score', 0.0)),
+                'embedding': vectors.get(doc.get('id')),
+            }
+            for doc in documents
+        ]
+        packed = pack_context(
+            passages,
+            max_tokens=max_tokens,
+            format_passage=lambda doc, text: f"[{doc.get('source', 'NCF')}, Page {doc.get('page_number', '?')}]\n{text}\n",
+            separator="\n---\n",
+            mmr_lambda=getattr(settings, 'RAG_CONTEXT_MMR_LAMBDA', 0.7),
+        )
+        return packed['context']
 
 
 # Singleton retriever instance
@@ -0,0 +1,357 @@
+"""
+Shiksha Saathi - Sparse (BM25) Index
+Array-backed inverted index kept next to the vector index, for keyword and
+hybrid retrieval of short Hindi / Hinglish / English queries.
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .text_utils import tokenize
+from .vector_store import directory_lock, replace_directory
+
+logger = logging.getLogger(__name__)
+
+
+def analyze(text: str) -> List[str]:
+    """Index/query terms: lowercased Latin and Devanagari words, minus digits and 1-letter tokens"""
+    return [token for token in tokenize(text) if len(token) > 1 and not token.isdigit()]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked ID lists: score(id) = sum over lists of 1 / (k + rank).
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts, updated incrementally with the vector index.
+
+    Postings are compact typed arrays per term (int32 row numbers, uint16
+    term frequencies); documents are rows with a length array. Replaced and
+    deleted chunks are tombstoned and compacted away on save when they pile
+    up. On disk the postings are one CSR layout under
+    <persist_directory>/bm25/<collection>/, reloaded by other workers when a
+    newer save appears. A save that finds another worker's newer save on disk
+    reloads it and re-applies its own unsaved adds/deletes on top, under a
+    file lock.
+
+    Usage:
+        bm25 = BM25Index(persist_directory, 'ncf_documents')
+        bm25.add(ids, texts)
+        bm25.save()
+        bm25.search("भिन्न नहीं समझ रहे", top_k=20)
+    """
+
+    COMPACT_RATIO = 0.25
+    REFRESH_SECONDS = 5.0
+
+    def __init__(self, persist_directory: str, collection_name: str, k1: float = 1.2, b: float = 0.75):
+        self.directory = Path(persist_directory) / 'bm25' / collection_name
+        self.collection_name = collection_name
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_mtime = None
+        self._checked_at = time.monotonic()
+
+    def _reset(self):
+        self._terms: Dict[str, int] = {}
+        self._postings_rows: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._doc_ids: List[str] = []
+        self._doc_lens = array('I')
+        self._row_of: Dict[str, int] = {}
+        self._deleted = set()
+        self._live_length = 0
+        self._dirty = False
+        # Chunk ID -> text, or None if deleted, since the last load/save
+        self._changes: Dict[str, Optional[str]] = {}
+        # Cleared or rebuilt locally: the next save replaces whatever is on disk
+        self._replaced = False
+
+    # ─── Writes ──────────────────────────────────────────────────────────────
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]):
+        """Index (or re-index) chunks by ID"""
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                self._delete_one(chunk_id)
+
+                row = len(self._doc_ids)
+                terms = Counter(analyze(text))
+                for term, tf in terms.items():
+                    term_id = self._terms.get(term)
+                    if term_id is None:
+                        term_id = self._terms[term] = len(self._postings_rows)
+                        self._postings_rows.append(array('i'))
+                        self._postings_tfs.append(array('H'))
+                    self._postings_rows[term_id].append(row)
+                    self._postings_tfs[term_id].append(min(tf, 65535))
+
+                length = sum(terms.values())
+                self._doc_ids.append(chunk_id)
+                self._doc_lens.append(length)
+                self._row_of[chunk_id] = row
+                self._live_length += length
+                self._changes[chunk_id] = text
+            self._dirty = True
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            for chunk_id in ids:
+                self._delete_one(chunk_id)
+                self._changes[chunk_id] = None
+            self._dirty = True
+
+    def _delete_one(self, chunk_id: str):
+        row = self._row_of.pop(chunk_id, None)
+        if row is not None:
+            self._deleted.add(row)
+            self._live_length -= self._doc_lens[row]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._replaced = True
+            self._dirty = True
+
+    def _compact(self):
+        """Rebuild postings without tombstoned rows"""
+        if not self._deleted:
+            return
+        new_row = {}
+        for row in range(len(self._doc_ids)):
+            if row not in self._deleted:
+                new_row[row] = len(new_row)
+
+        terms, rows_list, tfs_list = {}, [], []
+        for term, term_id in self._terms.items():
+            rows, tfs = array('i'), array('H')
+            for row, tf in zip(self._postings_rows[term_id], self._postings_tfs[term_id]):
+                if row in new_row:
+                    rows.append(new_row[row])
+                    tfs.append(tf)
+            if rows:
+                terms[term] = len(rows_list)
+                rows_list.append(rows)
+                tfs_list.append(tfs)
+
+        kept = sorted(new_row)
+        self._terms, self._postings_rows, self._postings_tfs = terms, rows_list, tfs_list
+        self._doc_ids = [self._doc_ids[row] for row in kept]
+        self._doc_lens = array('I', (self._doc_lens[row] for row in kept))
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._doc_ids)}
+        self._deleted = set()
+
+    # ─── Persistence ─────────────────────────────────────────────────────────
+
+    def exists(self) -> bool:
+        return (self.directory / 'info.json').exists()
+
+    def _changed_on_disk(self) -> bool:
+        try:
+            return (self.directory / 'info.json').stat().st_mtime != self._loaded_mtime
+        except OSError:
+            return False
+
+    def _merge_from_disk(self):
+        """Reload the index another worker saved and re-apply our unsaved writes on top"""
+        changes = self._changes
+        self.load()
+        upserts = {chunk_id: text for chunk_id, text in changes.items() if text is not None}
+        deletes = [chunk_id for chunk_id, text in changes.items() if text is None]
+        self.add(list(upserts), list(upserts.values()))
+        self.delete(deletes)
+        logger.info(
+            f"BM25 index for {self.collection_name} was saved by another worker - "
+            f"merged {len(upserts)} adds and {len(deletes)} deletes on top"
+        )
+
+    def save(self) -> Dict:
+        """Write the index (CSR postings) atomically, merged with any newer save on disk"""
+        with self._lock, directory_lock(self.directory):
+            if not self._replaced and self._changed_on_disk():
+                self._merge_from_disk()
+            self._compact()
+            tmp_dir = self.directory.with_name(self.directory.name + f".tmp-{os.getpid()}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+
+            terms = sorted(self._terms, key=self._terms.get)
+            lengths = [len(self._postings_rows[self._terms[term]]) for term in terms]
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            rows = np.empty(int(offsets[-1]), dtype=np.int32)
+            tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+            for i, term in enumerate(terms):
+                term_id = self._terms[term]
+                rows[offsets[i]:offsets[i + 1]] = np.frombuffer(self._postings_rows[term_id], dtype=np.int32)
+                tfs[offsets[i]:offsets[i + 1]] = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint16)
+
+            np.save(tmp_dir / 'offsets.npy', offsets)
+            np.save(tmp_dir / 'rows.npy', rows)
+            np.save(tmp_dir / 'tfs.npy', tfs)
+            np.save(tmp_dir / 'doc_lens.npy', np.frombuffer(self._doc_lens, dtype=np.uint32))
+            with open(tmp_dir / 'terms.json', 'w', encoding='utf-8') as f:
+                json.dump(terms, f, ensure_ascii=False)
+            with open(tmp_dir / 'doc_ids.json', 'w', encoding='utf-8') as f:
+                json.dump(self._doc_ids, f, ensure_ascii=False)
+
+            info = {
+                'collection': self.collection_name,
+                'documents': len(self._doc_ids),
+                'terms': len(terms),
+                'postings': int(offsets[-1]),
+                'saved_at': time.time(),
+            }
+            with open(tmp_dir / 'info.json', 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+
+            replace_directory(tmp_dir, self.directory)
+            self._loaded_mtime = (self.directory / 'info.json').stat().st_mtime
+            self._dirty = False
+            self._changes = {}
+            self._replaced = False
+            return info
+
+    def load(self) -> bool:
+        """Load the last save. Returns False if there is none."""
+        with self._lock:
+            if not self.exists():
+                return False
+            info_path = self.directory / 'info.json'
+            offsets = np.load(self.directory / 'offsets.npy')
+            rows = np.load(self.directory / 'rows.npy')
+            tfs = np.load(self.directory / 'tfs.npy')
+            doc_lens = np.load(self.directory / 'doc_lens.npy')
+            with open(self.directory / 'terms.json', 'r', encoding='utf-8') as f:
+                terms = json.load(f)
+            with open(self.directory / 'doc_ids.json', 'r', encoding='utf-8') as f:
+                doc_ids = json.load(f)
+
+            self._reset()
+            self._terms = {term: i for i, term in enumerate(terms)}
+            for i in range(len(terms)):
+                self._postings_rows.append(array('i', rows[offsets[i]:offsets[i + 1]].tobytes()))
+                self._postings_tfs.append(array('H', tfs[offsets[i]:offsets[i + 1]].tobytes()))
+            self._doc_ids = doc_ids
+            self._doc_lens = array('I', doc_lens.astype(np.uint32).tobytes())
+            self._row_of = {chunk_id: row for row, chunk_id in enumerate(doc_ids)}
+            self._live_length = int(doc_lens.sum())
+            self._loaded_mtime = info_path.stat().st_mtime
+            self._checked_at = time.monotonic()
+            return True
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        if self._dirty or now - self._checked_at < self.REFRESH_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = (self.directory / 'info.json').stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            logger.info(f"BM25 index for {self.collection_name} changed on disk - reloading")
+            self.load()
+
+    def rebuild_from_store(self, store, batch_size: int = 1000) -> Dict:
+        """Re-index every chunk of a vector store collection and save"""
+        start = time.perf_counter()
+        with self._lock:
+            self._reset()
+            self._replaced = True
+            total = store.count()
+            for offset in range(0, total, batch_size):
+                page = store.get(limit=batch_size, offset=offset)
+                if not page['ids']:
+                    break
+                self.add(page['ids'], page['documents'])
+            info = self.save()
+        logger.info(
+            f"✅ Built BM25 index for {self.collection_name}: {info['documents']} chunks, "
+            f"{info['terms']} terms ({time.perf_counter() - start:.1f}s)"
+        )
+        return info
+
+    # ─── Query ───────────────────────────────────────────────────────────────
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh_if_changed()
+            return len(self._row_of)
+
+    def search(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """
+        Top-k chunks by BM25 score.
+
+        Returns:
+            (chunk id, score) pairs with score > 0, best first
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            live = len(self._row_of)
+            if live == 0:
+                return []
+
+            doc_lens = np.frombuffer(self._doc_lens, dtype=np.uint32).astype(np.float32)
+            avg_length = max(self._live_length / live, 1.0)
+            norms = self.k1 * (1 - self.b + self.b * doc_lens / avg_length)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+
+            for term in set(analyze(query)):
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    continue
+                rows = np.frombuffer(self._postings_rows[term_id], dtype=np.int32)
+                tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint16).astype(np.float32)
+                df = len(rows)
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                # A term occurs once per row in its postings, so plain fancy-index add is safe
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norms[rows])
+
+            if self._deleted:
+                scores[list(self._deleted)] = 0.0
+
+            matched = np.flatnonzero(scores > 0)
+            if len(matched) == 0:
+                return []
+            k = min(top_k, len(matched))
+            top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self._doc_ids[row], float(scores[row])) for row in top]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            postings = sum(len(rows) for rows in self._postings_rows)
+            return {
+                'documents': len(self._row_of),
+                'terms': len(self._terms),
+                'postings': postings,
+                'tombstones': len(self._deleted),
+                # int32 row + uint16 tf per posting
+                'postings_bytes': postings * 6,
+                'unsaved_changes': self._dirty,
+            }
@@ -0,0 +1,107 @@
+"""
+Shiksha Saathi - Streaming Helpers
+Incremental parsing of streamed Gemini JSON so strategies can be sent as soon as they close.
+"""
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class StrategyStreamParser:
+    """
+    Incremental parser for {"strategies": [ {...}, {...} ]} arriving in chunks.
+
+    Each strategy object is returned by feed() as soon as its closing brace
+    arrives, without waiting for the rest of the document. Braces inside
+    strings (and escaped quotes) are handled. Anything outside the array,
+    such as markdown fences, is ignored.
+
+    Usage:
+        parser = StrategyStreamParser()
+        for chunk in response:
+            for strategy in parser.feed(chunk.text):
+                send(strategy)
+    """
+
+    def __init__(self, array_key: str = "strategies"):
+        self.array_key = array_key
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+        self._last_key = None
+        self._string_start = None
+        self.emitted = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Consume the next chunk of model output.
+
+        Returns:
+            Strategy objects completed by this chunk (possibly empty)
+        """
+        self._buffer += text or ""
+        completed = []
+
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        # String directly inside the top-level object - remember it as the last key
+                        self._last_key = self._buffer[self._string_start + 1:self._pos]
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                self._stack.append(char)
+                if char == "{" and self._in_target_array(depth=len(self._stack) - 1):
+                    self._object_start = self._pos
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._object_start is not None and self._in_target_array(depth=len(self._stack)):
+                    strategy = self._parse_object(self._buffer[self._object_start:self._pos + 1])
+                    self._object_start = None
+                    if strategy is not None:
+                        completed.append(strategy)
+
+            self._pos += 1
+
+        self.emitted += len(completed)
+        return completed
+
+    def _in_target_array(self, depth: int) -> bool:
+        """True if the container at stack index depth-1 is the strategies array"""
+        return (
+            depth == 2
+            and self._stack[:2] == ["{", "["]
+            and self._last_key == self.array_key
+        )
+
+    @staticmethod
+    def _parse_object(raw: str):
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed strategy: {e}")
+            return None
+        return value if isinstance(value, dict) else None
+
+    @property
+    def text(self) -> str:
+        """Full text received so far"""
+        return self._buffer
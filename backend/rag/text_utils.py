@@ -0,0 +1,140 @@
+"""
+Shiksha Saathi - Text Utilities
+Lightweight, dependency-free text helpers for Hindi, English and Hinglish queries.
+"""
+import re
+from typing import List, Optional
+
+# Unicode-aware word pattern; keeps Devanagari combining marks attached to their letters
+WORD_PATTERN = re.compile(r"[\w\u0900-\u097F]+", re.UNICODE)
+
+ENGLISH_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 'be', 'been',
+    'am', 'i', 'me', 'my', 'we', 'our', 'you', 'your', 'they', 'them', 'their',
+    'he', 'she', 'it', 'its', 'this', 'that', 'these', 'those', 'to', 'of', 'in',
+    'on', 'at', 'for', 'with', 'from', 'by', 'about', 'as', 'into', 'how', 'what',
+    'why', 'when', 'which', 'who', 'do', 'does', 'did', 'doing', 'not', 'no',
+    'dont', 'don', 't', 'cant', 'can', 'cannot', 'could', 'should', 'would', 'will',
+    'help', 'please', 'need', 'want', 'get', 'getting', 'make', 'very', 'so',
+    'some', 'any', 'all', 'still', 'even', 'just', 'now', 'today', 'right',
+    'too', 'much', 'many', 'more', 'most', 'again', 'there', 'here', 'have', 'has',
+    'students', 'student', 'children', 'child', 'kids', 'class', 'classroom',
+    'understand', 'understanding', 'understood', 'teach', 'teaching', 'learn',
+    'learning', 'able', 'grade', 'problem', 'trouble', 'struggling', 'struggle',
+}
+
+HINDI_STOPWORDS = {
+    'है', 'हैं', 'था', 'थे', 'थी', 'हो', 'होता', 'होती', 'होते', 'नहीं', 'ना', 'न',
+    'रहे', 'रहा', 'रही', 'के', 'की', 'का', 'को', 'में', 'मे', 'से', 'पर', 'और',
+    'या', 'यह', 'ये', 'वह', 'वे', 'क्या', 'कैसे', 'क्यों', 'कब', 'कौन', 'भी',
+    'तो', 'ही', 'एक', 'कुछ', 'सब', 'मैं', 'हम', 'मुझे', 'आप', 'बच्चे', 'बच्चों',
+    'छात्र', 'कक्षा', 'समझ', 'समझा', 'समझते', 'समझाएं', 'समझाऊं', 'पढ़ाएं',
+    'पढ़ाऊं', 'सकते', 'सकता', 'सकती', 'पा', 'रहें', 'कर', 'करें', 'करना', 'लिए',
+}
+
+# Romanized Hindi filler words common in Hinglish queries
+HINGLISH_STOPWORDS = {
+    'hai', 'hain', 'nahi', 'nahin', 'rahe', 'raha', 'rahi', 'ke', 'ki', 'ka', 'ko',
+    'mein', 'me', 'se', 'par', 'aur', 'ya', 'yeh', 'ye', 'woh', 'kya', 'kaise',
+    'kyun', 'bhi', 'toh', 'to', 'hi', 'ek', 'kuch', 'sab', 'bacche', 'bachche',
+    'baccho', 'samajh', 'samaj', 'kar', 'karo', 'karna', 'liye', 'pa', 'paa',
+}
+
+STOPWORDS = ENGLISH_STOPWORDS | HINDI_STOPWORDS | HINGLISH_STOPWORDS
+
+DEVANAGARI_PATTERN = re.compile(r"[\u0900-\u097F]")
+LATIN_PATTERN = re.compile(r"[a-zA-Z]")
+
+# Romanized Hindi words that are not also common English words
+HINGLISH_MARKERS = HINGLISH_STOPWORDS - {'to', 'me', 'hi', 'pa', 'par', 'ya', 'ye', 'ek', 'ki', 'ka', 'ko', 'se'}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into word tokens (Latin and Devanagari)"""
+    return WORD_PATTERN.findall((text or "").lower())
+
+
+def detect_language(text: str) -> str:
+    """
+    Classify text by script and function words.
+
+    Returns:
+        'hi' (mostly Devanagari), 'hinglish' (romanized Hindi) or 'en'
+    """
+    devanagari = len(DEVANAGARI_PATTERN.findall(text or ""))
+    latin = len(LATIN_PATTERN.findall(text or ""))
+    if devanagari == 0 and latin == 0:
+        return 'en'
+    if devanagari >= latin:
+        return 'hi'
+
+    tokens = tokenize(text)
+    markers = sum(1 for token in tokens if token in HINGLISH_MARKERS)
+    # One marker is enough in a short query; longer text needs a steady share
+    if markers and markers >= max(1, len(tokens) // 10):
+        return 'hinglish'
+    return 'en'
+
+
+def extract_keywords(text: str, max_keywords: int = 4) -> List[str]:
+    """
+    Pick content words from a question, in order of appearance.
+
+    Args:
+        text: Free-text question
+        max_keywords: Maximum number of keywords to keep
+
+    Returns:
+        De-duplicated keywords with stopwords, numbers and 1-letter tokens removed
+    """
+    keywords = []
+    for token in tokenize(text):
+        if token in STOPWORDS or token.isdigit() or len(token) < 2:
+            continue
+        if token not in keywords:
+            keywords.append(token)
+        if len(keywords) >= max_keywords:
+            break
+    return keywords
+
+
+def parse_grade(grade: str) -> Optional[int]:
+    """
+    Extract a numeric grade from values like "4", "Class 4" or "कक्षा ४".
+
+    Returns:
+        Grade number, or None if none found
+    """
+    match = re.search(r"\d+", grade or "")
+    return int(match.group()) if match else None
+
+
+def build_youtube_query(question: str, subject: str = "", grade: str = "") -> str:
+    """
+    Build a short YouTube search query locally, without an LLM round-trip.
+
+    Example:
+        build_youtube_query("बच्चे भिन्न नहीं समझ रहे", "Math", "4")
+        -> "भिन्न math class 4 teaching"
+
+    Args:
+        question: Teacher's question
+        subject: Subject being taught
+        grade: Grade level
+
+    Returns:
+        Query of roughly 3-6 words
+    """
+    keywords = extract_keywords(question, max_keywords=3)
+
+    parts = list(keywords)
+    subject_words = tokenize(subject)
+    if subject_words and not any(word in keywords for word in subject_words):
+        parts.append(" ".join(subject_words))
+
+    grade_number = parse_grade(grade)
+    if grade_number is not None:
+        parts.append(f"class {grade_number}")
+
+    parts.append("teaching")
+    return " ".join(parts)
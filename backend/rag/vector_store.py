@@ -0,0 +1,791 @@
+"""
+Shiksha Saathi - Vector Stores
+One interface over the vector database, with ChromaDB and FAISS (CPU) backends.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .embeddings import EmbeddingMismatchError, get_embedding_service
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# A filter matching at most this many rows is scored exactly instead of via the ANN index
+EXACT_FILTER_MAX_ROWS = 4096
+
+
+class CollectionNotFoundError(LookupError):
+    """Raised when opening a collection that does not exist (with create=False)"""
+
+
+def matches_where(metadata: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a ChromaDB-style metadata filter against one metadata dict.
+
+    Supports {'field': value}, {'field': {'$eq'|'$ne'|'$in'|'$nin'|'$gt'|'$gte'|'$lt'|'$lte': value}}
+    and the '$and' / '$or' combinators.
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for op, expected in condition.items():
+            if op == '$eq':
+                ok = value == expected
+            elif op == '$ne':
+                ok = value != expected
+            elif op == '$in':
+                ok = value in expected
+            elif op == '$nin':
+                ok = value not in expected
+            elif value is None:
+                ok = False
+            elif op == '$gt':
+                ok = value > expected
+            elif op == '$gte':
+                ok = value >= expected
+            elif op == '$lt':
+                ok = value < expected
+            elif op == '$lte':
+                ok = value <= expected
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if not ok:
+                return False
+    return True
+
+
+def replace_directory(tmp_dir: Path, directory: Path):
+    """
+    Swap a freshly written directory into place with renames.
+
+    Readers holding files of the old directory open (e.g. mmaps) keep working;
+    if another process swapped in its own build first, ours is discarded.
+    """
+    old_dir = directory.with_name(directory.name + f".old-{os.getpid()}")
+    try:
+        if directory.exists():
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+    except OSError as e:
+        logger.info(f"{directory.name} was replaced concurrently ({e})")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+@contextmanager
+def directory_lock(directory: Path) -> Iterator[None]:
+    """
+    Exclusive cross-process lock for rewriting 'directory' (<directory>.lock).
+
+    Held around read-merge-write cycles so concurrent writers apply their
+    changes on top of each other instead of the last one winning.
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    with open(directory.with_name(directory.name + '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class VectorStore:
+    """
+    Interface shared by all vector store backends.
+
+    Results use ChromaDB's conventions: 'distance' is squared L2 between
+    normalized vectors and 'relevance_score' is 1 - distance (= 2*cos - 1).
+    """
+
+    backend = 'base'
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ):
+        """Insert or replace (upsert) chunks by ID"""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Delete chunks by ID and/or metadata filter"""
+        raise NotImplementedError
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include_embeddings: bool = False,
+    ) -> Dict[str, List]:
+        """
+        Fetch stored chunks.
+
+        Returns:
+            {'ids', 'documents', 'metadatas'} plus 'embeddings' when requested
+        """
+        raise NotImplementedError
+
+    def query(
+        self,
+        embedding: Sequence[float],
+        top_k: int = 3,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Nearest chunks to an embedding.
+
+        Returns:
+            List of {'id', 'text', 'metadata', 'distance', 'relevance_score'}, best first
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Persist the current state so other processes (and restarts) see it"""
+        raise NotImplementedError
+
+    def drop(self):
+        """Delete the collection and everything persisted for it"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': self.backend, 'collection': self.collection_name, 'count': self.count()}
+
+
+# ─── ChromaDB ────────────────────────────────────────────────────────────────
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore over a ChromaDB collection (persisted by the client on every write)"""
+
+    backend = 'chroma'
+
+    def __init__(self, client, collection):
+        super().__init__(collection.name)
+        self.client = client
+        self.collection = collection
+
+    def add(self, ids, embeddings, documents, metadatas):
+        # Normalized like the FAISS store, so distances mean the same on both
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=vectors.tolist(),
+            documents=list(documents),
+            metadatas=list(metadatas),
+        )
+
+    def delete(self, ids=None, where=None):
+        if ids is not None and len(ids) == 0:
+            return
+        self.collection.delete(ids=list(ids) if ids is not None else None, where=where or None)
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include_embeddings=False):
+        if ids is not None and len(ids) == 0:
+            page = {'ids': [], 'documents': [], 'metadatas': []}
+            if include_embeddings:
+                page['embeddings'] = np.zeros((0, 0), dtype=np.float32)
+            return page
+
+        include = ['documents', 'metadatas'] + (['embeddings'] if include_embeddings else [])
+        result = self.collection.get(
+            ids=list(ids) if ids is not None else None,
+            where=where or None,
+            limit=limit,
+            offset=offset or None,
+            include=include,
+        )
+        page = {
+            'ids': list(result['ids']),
+            'documents': list(result['documents'] or []),
+            'metadatas': [metadata or {} for metadata in (result['metadatas'] or [])],
+        }
+        if include_embeddings:
+            page['embeddings'] = np.asarray(result['embeddings'], dtype=np.float32)
+        return page
+
+    def query(self, embedding, top_k=3, where=None):
+        results = self.collection.query(
+            query_embeddings=[_normalize(np.asarray(embedding, dtype=np.float32)).tolist()],
+            n_results=top_k,
+            where=where or None,
+        )
+        hits = []
+        if results['documents'] and len(results['documents'][0]) > 0:
+            for i, document in enumerate(results['documents'][0]):
+                distance = results['distances'][0][i] if results['distances'] else 1.0
+                hits.append({
+                    'id': results['ids'][0][i],
+                    'text': document,
+                    'metadata': results['metadatas'][0][i] or {},
+                    'distance': distance,
+                    'relevance_score': 1 - distance,
+                })
+        return hits
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def snapshot(self) -> Dict[str, Any]:
+        # PersistentClient writes through; nothing to do
+        return {'backend': self.backend, 'count': self.count()}
+
+    def drop(self):
+        self.client.delete_collection(self.collection_name)
+
+
+# ─── FAISS ───────────────────────────────────────────────────────────────────
+
+
+class FaissVectorStore(VectorStore):
+    """
+    VectorStore on a FAISS CPU index over normalized vectors (inner product).
+
+    index_type selects the latency/recall trade-off:
+        flat - exact search (IndexFlatIP)
+        ivf  - inverted lists; nprobe of nlist clusters are searched (IndexIVFFlat)
+        hnsw - graph search; ef_search candidates explored (IndexHNSWFlat)
+
+    Vectors, documents and metadata are kept alongside the index; deleted and
+    replaced rows are tombstoned and dropped when the index is compacted.
+    Metadata filters are evaluated here: small filtered sets are scored
+    exactly, larger ones by over-fetching from the index.
+
+    State lives in memory until snapshot() writes it to
+    <persist_directory>/faiss/<collection>/; other processes reload a newer
+    snapshot on their next query. Reads and writes share one lock. Writes
+    since the last load are also kept by chunk ID, so a snapshot taken after
+    another process saved reloads that version and re-applies them on top
+    (under a file lock) instead of overwriting it.
+    """
+
+    backend = 'faiss'
+
+    # Compact when this share of rows is tombstoned
+    COMPACT_RATIO = 0.25
+    REFRESH_SECONDS = 5.0
+
+    def __init__(
+        self,
+        persist_directory: str,
+        collection_name: str,
+        dimension: int,
+        embedding_model: str,
+        index_type: str = 'flat',
+        nlist: int = 256,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_construction: int = 80,
+        ef_search: int = 64,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("VECTOR_STORE_BACKEND='faiss' requires the faiss-cpu package") from e
+        if index_type not in ('flat', 'ivf', 'hnsw'):
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+        super().__init__(collection_name)
+        self._faiss = faiss
+        self.directory = Path(persist_directory) / 'faiss' / collection_name
+        self.dimension = dimension
+        self.embedding_model = embedding_model
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.metadata = metadata or {}
+
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_mtime = None
+        self._checked_at = time.monotonic()
+
+    def _reset(self):
+        self._vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._deleted = set()
+        self._index = None
+        self._dirty = False
+        # Chunk ID -> (vector, document, metadata), or None if deleted, since the last load/snapshot
+        self._changes: Dict[str, Optional[Tuple[np.ndarray, str, Dict[str, Any]]]] = {}
+        # Dropped locally: the next snapshot replaces whatever is on disk
+        self._replaced = False
+
+    # ─── Persistence ─────────────────────────────────────────────────────────
+
+    def exists(self) -> bool:
+        return (self.directory / 'info.json').exists()
+
+    def _changed_on_disk(self) -> bool:
+        try:
+            return (self.directory / 'info.json').stat().st_mtime != self._loaded_mtime
+        except OSError:
+            return False
+
+    def _merge_from_disk(self):
+        """Reload the snapshot another process wrote and re-apply our unsaved writes on top"""
+        changes = self._changes
+        self.load()
+        upserts = [(chunk_id, change) for chunk_id, change in changes.items() if change is not None]
+        deletes = [chunk_id for chunk_id, change in changes.items() if change is None]
+        if upserts:
+            self.add(
+                [chunk_id for chunk_id, _ in upserts],
+                np.stack([vector for _, (vector, _, _) in upserts]),
+                [document for _, (_, document, _) in upserts],
+                [metadata for _, (_, _, metadata) in upserts],
+            )
+        if deletes:
+            self.delete(ids=deletes)
+        logger.info(
+            f"FAISS collection {self.collection_name} was saved by another process - "
+            f"merged {len(upserts)} upserts and {len(deletes)} deletes on top"
+        )
+
+    def load(self):
+        """
+        Load the last snapshot.
+
+        Raises:
+            EmbeddingMismatchError: If the snapshot was built with another model
+        """
+        with self._lock:
+            info_path = self.directory / 'info.json'
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            if info.get('embedding_model') != self.embedding_model or info.get('dimension') != self.dimension:
+                raise EmbeddingMismatchError(
+                    f"FAISS collection '{self.collection_name}' was indexed with {info.get('embedding_model')} "
+                    f"({info.get('dimension')} dims) but the loaded model is {self.embedding_model} "
+                    f"({self.dimension} dims); re-index the collection"
+                )
+            with open(self.directory / 'records.json', 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+            self._reset()
+            self._vectors = np.load(self.directory / 'vectors.npy')
+            self._ids = records['ids']
+            self._documents = records['documents']
+            self._metadatas = records['metadatas']
+            self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self.metadata = info.get('metadata', self.metadata)
+
+            index_path = self.directory / 'index.faiss'
+            if info.get('index_type') == self.index_type and index_path.exists():
+                self._index = self._faiss.read_index(str(index_path))
+                self._apply_search_params(self._index)
+            self._loaded_mtime = info_path.stat().st_mtime
+            self._checked_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock, directory_lock(self.directory):
+            if not self._replaced and self._changed_on_disk():
+                self._merge_from_disk()
+            self._compact()
+            index = self._ensure_index()
+
+            tmp_dir = self.directory.with_name(self.directory.name + f".tmp-{os.getpid()}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+
+            np.save(tmp_dir / 'vectors.npy', self._vectors)
+            with open(tmp_dir / 'records.json', 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'ids': self._ids, 'documents': self._documents, 'metadatas': self._metadatas},
+                    f,
+                    ensure_ascii=False,
+                )
+            if index is not None:
+                self._faiss.write_index(index, str(tmp_dir / 'index.faiss'))
+
+            info = {
+                'backend': self.backend,
+                'collection': self.collection_name,
+                'index_type': self.index_type,
+                'count': len(self._ids),
+                'dimension': self.dimension,
+                'embedding_model': self.embedding_model,
+                'metadata': self.metadata,
+                'snapshot_at': time.time(),
+            }
+            with open(tmp_dir / 'info.json', 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+
+            replace_directory(tmp_dir, self.directory)
+            self._loaded_mtime = (self.directory / 'info.json').stat().st_mtime
+            self._dirty = False
+            self._changes = {}
+            self._replaced = False
+            logger.info(f"💾 FAISS snapshot of {self.collection_name}: {info['count']} vectors ({self.index_type})")
+            return info
+
+    def _refresh_if_changed(self):
+        """Pick up a snapshot written by another process (never discards local writes)"""
+        now = time.monotonic()
+        if self._dirty or now - self._checked_at < self.REFRESH_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = (self.directory / 'info.json').stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            logger.info(f"FAISS collection {self.collection_name} changed on disk - reloading")
+            self.load()
+
+    def drop(self):
+        with self._lock:
+            self._reset()
+            self._replaced = True
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ─── Index maintenance ───────────────────────────────────────────────────
+
+    def _apply_search_params(self, index):
+        if self.index_type == 'ivf':
+            index.nprobe = min(self.nprobe, index.nlist)
+        elif self.index_type == 'hnsw':
+            index.hnsw.efSearch = self.ef_search
+
+    def _build_index(self, vectors: np.ndarray):
+        faiss = self._faiss
+        if self.index_type == 'flat':
+            index = faiss.IndexFlatIP(self.dimension)
+        elif self.index_type == 'hnsw':
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+        else:
+            # ~39 training points per list keeps k-means from warning about tiny clusters
+            nlist = max(1, min(self.nlist, len(vectors) // 39))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        self._apply_search_params(index)
+        if len(vectors):
+            index.add(vectors)
+        return index
+
+    def _flush_pending(self):
+        if self._pending:
+            self._vectors = np.vstack([self._vectors] + self._pending)
+            self._pending = []
+
+    def _ensure_index(self):
+        """Index covering every row (tombstones included), built on first use"""
+        self._flush_pending()
+        if self._index is None and len(self._vectors):
+            start = time.perf_counter()
+            self._index = self._build_index(self._vectors)
+            logger.info(
+                f"Built FAISS {self.index_type} index for {self.collection_name}: "
+                f"{len(self._vectors)} vectors in {time.perf_counter() - start:.2f}s"
+            )
+        return self._index
+
+    def _compact(self):
+        """Drop tombstoned rows; the index is rebuilt on next use"""
+        self._flush_pending()
+        if not self._deleted:
+            return
+        keep = [row for row in range(len(self._ids)) if row not in self._deleted]
+        self._vectors = self._vectors[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._documents = [self._documents[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._deleted = set()
+        self._index = None
+
+    # ─── Writes ──────────────────────────────────────────────────────────────
+
+    def add(self, ids, embeddings, documents, metadatas):
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension))
+        with self._lock:
+            # Upsert: a replaced row (or an earlier duplicate in this batch) becomes a tombstone
+            first_row = len(self._ids)
+            for offset, chunk_id in enumerate(ids):
+                row = self._row_of.get(chunk_id)
+                if row is not None:
+                    self._deleted.add(row)
+                self._row_of[chunk_id] = first_row + offset
+            self._ids.extend(ids)
+            self._documents.extend(documents)
+            self._metadatas.extend(dict(metadata or {}) for metadata in metadatas)
+            for offset, chunk_id in enumerate(ids):
+                self._changes[chunk_id] = (
+                    vectors[offset], self._documents[first_row + offset], self._metadatas[first_row + offset],
+                )
+            self._pending.append(vectors)
+
+            if self._index is not None:
+                if self.index_type == 'ivf' and self._index.ntotal * 2 < first_row + len(ids):
+                    # Grew past twice the training set: retrain on next use
+                    self._index = None
+                else:
+                    self._index.add(vectors)
+            self._dirty = True
+            self._maybe_compact()
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            rows = set()
+            for chunk_id in ids or []:
+                row = self._row_of.get(chunk_id)
+                if row is not None:
+                    rows.add(row)
+            if where:
+                rows.update(row for row in self._live_rows() if matches_where(self._metadatas[row], where))
+            for row in rows:
+                self._deleted.add(row)
+                self._row_of.pop(self._ids[row], None)
+                self._changes[self._ids[row]] = None
+            if rows:
+                self._dirty = True
+                self._maybe_compact()
+
+    def _maybe_compact(self):
+        if len(self._deleted) > self.COMPACT_RATIO * max(1, len(self._ids)):
+            self._compact()
+
+    # ─── Reads ───────────────────────────────────────────────────────────────
+
+    def _live_rows(self) -> List[int]:
+        return [row for row in range(len(self._ids)) if row not in self._deleted]
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh_if_changed()
+            return len(self._ids) - len(self._deleted)
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include_embeddings=False):
+        with self._lock:
+            self._refresh_if_changed()
+            self._flush_pending()
+            if ids is not None:
+                rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+            else:
+                rows = self._live_rows()
+            if where:
+                rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+            rows = rows[offset:offset + limit if limit is not None else None]
+
+            page = {
+                'ids': [self._ids[row] for row in rows],
+                'documents': [self._documents[row] for row in rows],
+                'metadatas': [self._metadatas[row] for row in rows],
+            }
+            if include_embeddings:
+                page['embeddings'] = self._vectors[rows]
+            return page
+
+    def _hit(self, row: int, similarity: float) -> Dict[str, Any]:
+        return {
+            'id': self._ids[row],
+            'text': self._documents[row],
+            'metadata': self._metadatas[row],
+            'distance': 2 - 2 * similarity,
+            'relevance_score': 2 * similarity - 1,
+        }
+
+    def query(self, embedding, top_k=3, where=None):
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(1, self.dimension))
+        with self._lock:
+            self._refresh_if_changed()
+            index = self._ensure_index()
+            if index is None:
+                return []
+
+            if where:
+                candidates = [row for row in self._live_rows() if matches_where(self._metadatas[row], where)]
+                if len(candidates) <= EXACT_FILTER_MAX_ROWS:
+                    # Exact scoring of the filtered rows beats fishing them out of the ANN results
+                    scores = self._vectors[candidates] @ query[0]
+                    order = np.argsort(-scores)[:top_k]
+                    return [self._hit(candidates[i], float(scores[i])) for i in order]
+                allowed = set(candidates)
+            else:
+                allowed = None
+
+            # Over-fetch past tombstones (and filtered-out rows), widening until satisfied
+            fetch = top_k + len(self._deleted)
+            while True:
+                fetch = min(fetch, index.ntotal)
+                scores, rows = index.search(query, fetch)
+                hits = []
+                for score, row in zip(scores[0], rows[0]):
+                    if row < 0 or row in self._deleted or (allowed is not None and row not in allowed):
+                        continue
+                    hits.append(self._hit(int(row), float(score)))
+                    if len(hits) == top_k:
+                        return hits
+                if fetch >= index.ntotal:
+                    return hits
+                fetch *= 4
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'collection': self.collection_name,
+                'index_type': self.index_type,
+                'count': len(self._ids) - len(self._deleted),
+                'tombstones': len(self._deleted),
+                'dimension': self.dimension,
+                'unsaved_changes': self._dirty,
+                'params': {
+                    'nlist': self.nlist,
+                    'nprobe': self.nprobe,
+                    'hnsw_m': self.hnsw_m,
+                    'ef_search': self.ef_search,
+                },
+            }
+
+
+# ─── Factory ─────────────────────────────────────────────────────────────────
+
+
+def open_vector_store(
+    collection_name: str,
+    persist_directory: Optional[str] = None,
+    embedder=None,
+    backend: Optional[str] = None,
+    create: bool = True,
+    recreate: bool = False,
+    verify: bool = True,
+    metadata: Optional[Dict[str, Any]] = None,
+    **backend_options,
+) -> VectorStore:
+    """
+    Open (or create) a collection on the configured vector store backend.
+
+    Args:
+        collection_name: Collection to open
+        persist_directory: Storage root (defaults to settings.CHROMA_PERSIST_DIRECTORY)
+        embedder: EmbeddingService whose model the collection must match
+        backend: 'chroma' or 'faiss' (defaults to settings.VECTOR_STORE_BACKEND)
+        create: Create the collection when missing
+        recreate: Drop any existing collection and start empty
+        verify: Check the stored embedding model (EmbeddingMismatchError on mismatch)
+        metadata: Extra collection metadata when creating
+        **backend_options: Overrides for FAISS index settings (index_type, nprobe, ...)
+
+    Raises:
+        CollectionNotFoundError: If missing and create is False
+        EmbeddingMismatchError: If verify is set and the collection uses another model
+    """
+    persist_directory = persist_directory or settings.CHROMA_PERSIST_DIRECTORY
+    embedder = embedder or get_embedding_service()
+    backend = backend or getattr(settings, 'VECTOR_STORE_BACKEND', 'chroma')
+    Path(persist_directory).mkdir(parents=True, exist_ok=True)
+
+    if backend == 'chroma':
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False),
+        )
+        if recreate:
+            try:
+                client.delete_collection(collection_name)
+            except Exception:
+                pass
+            return ChromaVectorStore(client, embedder.create_collection(client, collection_name, metadata))
+
+        try:
+            collection = client.get_collection(name=collection_name)
+        except Exception as e:
+            if not create:
+                raise CollectionNotFoundError(f"Collection not found: {collection_name}") from e
+            logger.info(f"Creating collection {collection_name} for {embedder.model_name}")
+            return ChromaVectorStore(client, embedder.create_collection(client, collection_name, metadata))
+
+        if verify:
+            embedder.check_collection(collection)
+        return ChromaVectorStore(client, collection)
+
+    if backend == 'faiss':
+        options = {
+            'index_type': getattr(settings, 'FAISS_INDEX_TYPE', 'flat'),
+            'nlist': getattr(settings, 'FAISS_IVF_NLIST', 256),
+            'nprobe': getattr(settings, 'FAISS_IVF_NPROBE', 16),
+            'hnsw_m': getattr(settings, 'FAISS_HNSW_M', 32),
+            'ef_construction': getattr(settings, 'FAISS_HNSW_EF_CONSTRUCTION', 80),
+            'ef_search': getattr(settings, 'FAISS_HNSW_EF_SEARCH', 64),
+            **backend_options,
+        }
+        store = FaissVectorStore(
+            persist_directory,
+            collection_name,
+            dimension=embedder.dimension,
+            embedding_model=embedder.model_name,
+            metadata={**(metadata or {}), **embedder.collection_metadata()},
+            **options,
+        )
+        if recreate:
+            store.drop()
+        elif store.exists():
+            if not verify:
+                # Open as stored, e.g. to report on a collection built with another model
+                info = json.loads((store.directory / 'info.json').read_text(encoding='utf-8'))
+                store.embedding_model = info['embedding_model']
+                store.dimension = info['dimension']
+            store.load()
+        elif not create:
+            raise CollectionNotFoundError(f"Collection not found: {collection_name}")
+        return store
+
+    raise ValueError(f"Unknown vector store backend: {backend}")